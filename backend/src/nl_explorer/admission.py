@@ -0,0 +1,219 @@
+"""
+Admission control for LLM chat turns.
+
+Bounds concurrent ``/chat`` turns globally and per user, queues the excess
+in a bounded wait queue with a deadline, and grants free slots round-robin
+across users so one user with many tabs (or a script) cannot starve
+everyone else. An optional per-user token budget (token bucket refilled
+continuously) rejects users who exceed their tokens-per-minute allowance.
+Buckets that have refilled are dropped, so idle users cost no memory.
+
+Limits are per worker process; size them for the number of threads each
+Superset worker runs.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque, OrderedDict
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+from flask import current_app
+
+DEFAULTS: dict[str, Any] = {
+    "max_concurrent": 32,
+    "max_concurrent_per_user": 4,
+    "max_queue": 64,
+    "queue_timeout": 15.0,
+    "tokens_per_minute_per_user": None,
+}
+
+
+class AdmissionRejected(Exception):
+    """Raised when a chat turn cannot be admitted; maps to HTTP 429."""
+
+    def __init__(self, message: str, retry_after: float = 1.0) -> None:
+        super().__init__(message)
+        self.retry_after = max(1, int(retry_after + 0.999))
+
+
+class _Waiter:
+    __slots__ = ("user", "granted")
+
+    def __init__(self, user: str) -> None:
+        self.user = user
+        self.granted = False
+
+
+class AdmissionController:
+    """Concurrency limiter with per-user fairness and token budgets."""
+
+    def __init__(
+        self,
+        max_concurrent: int = DEFAULTS["max_concurrent"],
+        max_concurrent_per_user: int = DEFAULTS["max_concurrent_per_user"],
+        max_queue: int = DEFAULTS["max_queue"],
+        queue_timeout: float = DEFAULTS["queue_timeout"],
+        tokens_per_minute_per_user: int | None = DEFAULTS["tokens_per_minute_per_user"],
+    ) -> None:
+        self.max_concurrent = max_concurrent
+        self.max_concurrent_per_user = max_concurrent_per_user
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.tokens_per_minute = tokens_per_minute_per_user
+        self._cond = threading.Condition()
+        self._active_total = 0
+        self._active: dict[str, int] = {}
+        # Users with waiters, in round-robin order; each has a FIFO of waiters
+        self._queues: OrderedDict[str, deque[_Waiter]] = OrderedDict()
+        self._queued = 0
+        self._buckets: dict[str, tuple[float, float]] = {}
+        self._buckets_swept = time.monotonic()
+
+    # -- token budget ---------------------------------------------------- #
+
+    def _refilled(self, user: str, now: float) -> float:
+        assert self.tokens_per_minute
+        tokens, last = self._buckets.get(user, (float(self.tokens_per_minute), now))
+        return min(float(self.tokens_per_minute), tokens + (now - last) * self.tokens_per_minute / 60)
+
+    def _sweep_buckets(self, now: float) -> None:
+        """Drop buckets that have refilled; a full bucket is the same as no bucket."""
+        if now - self._buckets_swept < 60:
+            return
+        self._buckets_swept = now
+        full = float(self.tokens_per_minute or 0)
+        for user in [u for u in self._buckets if self._refilled(u, now) >= full]:
+            del self._buckets[user]
+
+    def _tokens_available(self, user: str, now: float) -> float:
+        self._sweep_buckets(now)
+        tokens = self._refilled(user, now)
+        self._buckets[user] = (tokens, now)
+        return tokens
+
+    def record_usage(self, user: str, tokens: int) -> None:
+        """Charge ``tokens`` LLM tokens to ``user``'s budget."""
+        if not self.tokens_per_minute or tokens <= 0:
+            return
+        with self._cond:
+            available = self._tokens_available(user, time.monotonic())
+            self._buckets[user] = (available - tokens, time.monotonic())
+
+    # -- scheduling ------------------------------------------------------ #
+
+    def _dispatch(self) -> None:
+        """Grant free slots to queued waiters, one per user per pass (round-robin)."""
+        progress = True
+        while progress and self._queues and self._active_total < self.max_concurrent:
+            progress = False
+            for user in list(self._queues):
+                if self._active_total >= self.max_concurrent:
+                    break
+                if self._active.get(user, 0) >= self.max_concurrent_per_user:
+                    continue
+                queue = self._queues[user]
+                waiter = queue.popleft()
+                waiter.granted = True
+                self._queued -= 1
+                self._active_total += 1
+                self._active[user] = self._active.get(user, 0) + 1
+                # Move the user to the back of the rotation
+                del self._queues[user]
+                if queue:
+                    self._queues[user] = queue
+                progress = True
+        self._cond.notify_all()
+
+    def _remove(self, waiter: _Waiter) -> None:
+        queue = self._queues.get(waiter.user)
+        if queue and waiter in queue:
+            queue.remove(waiter)
+            self._queued -= 1
+            if not queue:
+                del self._queues[waiter.user]
+
+    def acquire(self, user: str) -> None:
+        """
+        Block until ``user`` may start a chat turn.
+
+        Raises:
+            AdmissionRejected: If the user is over budget, the queue is full,
+                or no slot frees up within ``queue_timeout``.
+        """
+        with self._cond:
+            now = time.monotonic()
+            if self.tokens_per_minute:
+                available = self._tokens_available(user, now)
+                if available <= 0:
+                    raise AdmissionRejected(
+                        "Token budget exceeded, please retry shortly.",
+                        retry_after=-available * 60 / self.tokens_per_minute,
+                    )
+
+            waiter = _Waiter(user)
+            self._queues.setdefault(user, deque()).append(waiter)
+            self._queued += 1
+            self._dispatch()
+            if waiter.granted:
+                return
+            if self._queued > self.max_queue:
+                self._remove(waiter)
+                raise AdmissionRejected("Too many concurrent requests, please retry shortly.")
+
+            deadline = now + self.queue_timeout
+            while not waiter.granted:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._remove(waiter)
+                    raise AdmissionRejected("Timed out waiting for capacity, please retry shortly.")
+                self._cond.wait(remaining)
+
+    def release(self, user: str) -> None:
+        """Free the slot held by ``user`` and hand it to the next waiter."""
+        with self._cond:
+            if self._active.get(user, 0) > 0:
+                self._active_total -= 1
+                self._active[user] -= 1
+                if not self._active[user]:
+                    del self._active[user]
+            self._dispatch()
+
+    @contextmanager
+    def admit(self, user: str) -> Iterator[None]:
+        """Context manager around ``acquire``/``release``."""
+        self.acquire(user)
+        try:
+            yield
+        finally:
+            self.release(user)
+
+    def snapshot(self) -> dict[str, int]:
+        """Return current active and queued counts."""
+        with self._cond:
+            return {"active": self._active_total, "queued": self._queued}
+
+
+_controller: AdmissionController | None = None
+_controller_settings: dict[str, Any] | None = None
+_lock = threading.Lock()
+
+
+def get_controller() -> AdmissionController | None:
+    """
+    Return the process-wide controller built from ``NL_EXPLORER_CONFIG["admission"]``.
+
+    Returns None when admission control is disabled (``"admission": False``).
+    """
+    global _controller, _controller_settings
+    raw = current_app.config.get("NL_EXPLORER_CONFIG", {}).get("admission", {})
+    if raw is False:
+        return None
+    settings = {**DEFAULTS, **(raw or {})}
+    with _lock:
+        if _controller is None or settings != _controller_settings:
+            _controller = AdmissionController(**settings)
+            _controller_settings = settings
+        return _controller
@@ -9,18 +9,36 @@ from __future__ import annotations
 
 import json
 import logging
-from typing import Any
+from typing import Any, Callable
 
-from flask import current_app, request, Response, stream_with_context
+from flask import current_app, g, redirect, request, Response, stream_with_context
 from flask_appbuilder.api import BaseApi, expose, permission_name, protect, safe
 
-from nl_explorer import context_builder, llm_service
+from nl_explorer import (
+    admission,
+    batch_executor,
+    chart_creator,
+    columnar,
+    column_profiles,
+    context_builder,
+    degradation,
+    intent_router,
+    llm_service,
+    metrics,
+    profiler,
+    serialization,
+    sse,
+    tool_memo,
+    traces,
+)
 from nl_explorer.prompts.system import build_system_prompt
 from nl_explorer.prompts.tools import TOOLS
 from nl_explorer.schemas import (
     ChatRequestSchema,
     ChatResponseSchema,
+    ContextDeltaResponseSchema,
     ContextResponseSchema,
+    ExecuteBatchResponseSchema,
     ExecuteRequestSchema,
     ExecuteResponseSchema,
     PluginConfigResponseSchema,
@@ -28,6 +46,26 @@ from nl_explorer.schemas import (
 
 logger = logging.getLogger(__name__)
 
+# Schemas hold no per-request state; build them and the compiled response
+# dumpers once instead of on every request
+_chat_request_schema = ChatRequestSchema()
+_execute_request_schema = ExecuteRequestSchema()
+_execute_response_schema = ExecuteResponseSchema()
+_execute_batch_response_schema = ExecuteBatchResponseSchema()
+_plugin_config_response_schema = PluginConfigResponseSchema()
+_chat_response_dumper = serialization.FastDumper(ChatResponseSchema())
+_context_response_dumper = serialization.FastDumper(ContextResponseSchema())
+_context_delta_response_dumper = serialization.FastDumper(ContextDeltaResponseSchema())
+
+
+def _allowed_schemas(req: dict[str, Any]) -> list[str] | None:
+    """Return the org-level schema allow list from the request's page context."""
+    org = (req.get("page_context") or {}).get("org")
+    if not isinstance(org, dict):
+        return None
+    allowed = org.get("allowed_schemas")
+    return [str(s) for s in allowed] if isinstance(allowed, list) and allowed else None
+
 
 class NLExplorerRestApi(BaseApi):
     """NL Explorer REST API — registered via appbuilder.add_api()."""
@@ -45,12 +83,59 @@ class NLExplorerRestApi(BaseApi):
     @protect()
     @safe
     @permission_name("read")
+    @profiler.profiled
     def get_context(self) -> Response:
-        """Return datasets available to the current user for the chat UI."""
+        """
+        Return datasets available to the current user for the chat UI.
+
+        The response carries the catalogue version as an ETag; a matching
+        ``If-None-Match`` gets a 304. The version last served to the user is
+        cached for ``context_version_ttl`` seconds and checked first, so a
+        client polling an unchanged catalogue gets its 304 without the
+        catalogue being rebuilt. With ``?since=<version>`` only datasets
+        added, changed or removed since that version are returned (falls back
+        to the full list if that version is no longer known).
+        """
         cfg = current_app.config.get("NL_EXPLORER_CONFIG", {})
         max_datasets = cfg.get("max_datasets_in_context", context_builder.DEFAULT_MAX_DATASETS)
+        user_id = getattr(getattr(g, "user", None), "id", None)
+        if user_id is not None and request.if_none_match:
+            cached = context_builder.cached_catalogue_version(user_id, max_datasets)
+            if cached is not None and request.if_none_match.contains(cached):
+                resp = Response(status=304)
+                resp.set_etag(cached)
+                resp.headers["Cache-Control"] = "private, no-cache"
+                return resp
+
         ctx = context_builder.get_user_context(max_datasets=max_datasets)
-        return self.response(200, **ContextResponseSchema().dump(ctx))
+        column_profiles.schedule_profiling([ds["id"] for ds in ctx["datasets"]])
+
+        version, fingerprints = context_builder.catalogue_snapshot(ctx["datasets"])
+        if user_id is not None:
+            context_builder.remember_catalogue_version(
+                user_id,
+                max_datasets,
+                version,
+                timeout=cfg.get("context_version_ttl", context_builder.DEFAULT_CATALOGUE_VERSION_TTL),
+            )
+        if request.if_none_match.contains(version):
+            resp = Response(status=304)
+        else:
+            since = request.args.get("since")
+            delta = (
+                context_builder.catalogue_delta(ctx["datasets"], fingerprints, since)
+                if since
+                else None
+            )
+            if delta is not None:
+                resp = self._dump_response(
+                    200, _context_delta_response_dumper, {"version": version, "since": since, **delta}
+                )
+            else:
+                resp = self._dump_response(200, _context_response_dumper, {"version": version, **ctx})
+        resp.set_etag(version)
+        resp.headers["Cache-Control"] = "private, no-cache"
+        return resp
 
     # ------------------------------------------------------------------ #
     # POST /api/v1/nl_explorer/chat
@@ -60,27 +145,76 @@ class NLExplorerRestApi(BaseApi):
     @protect()
     @safe
     @permission_name("read")
+    @profiler.profiled
     def chat(self) -> Response:
         """Send a natural language message and receive an LLM response."""
         body = request.get_json(force=True) or {}
-        req = ChatRequestSchema().load(body)
+        req = _chat_request_schema.load(body)
 
         cfg = current_app.config.get("NL_EXPLORER_CONFIG", {})
-        max_datasets = cfg.get("max_datasets_in_context", context_builder.DEFAULT_MAX_DATASETS)
+        # Budgets for this turn, reduced by the degradation ladder under load
+        budget = degradation.current_settings(cfg)
 
         ctx = context_builder.get_user_context(
             dataset_id=req.get("dataset_id"),
-            max_datasets=max_datasets,
+            dashboard_id=req.get("dashboard_id"),
+            max_datasets=budget["max_datasets"],
+            allowed_schemas=_allowed_schemas(req),
         )
+
         try:
             from superset.utils.core import get_user
 
             user = get_user()
             current_user_name = f"{user.first_name} {user.last_name}".strip() if user else None
         except Exception:
+            user = None
             current_user_name = None
+        user_key = str(user.id) if user is not None else (request.remote_addr or "anonymous")
 
-        system_prompt = build_system_prompt(ctx, current_user=current_user_name, page_context=req.get("page_context", {}))
+        controller = admission.get_controller()
+        if controller is not None:
+            try:
+                controller.acquire(user_key)
+            except admission.AdmissionRejected as exc:
+                metrics.inc("nl_explorer_chat_rejected_total")
+                resp = self.response(429, message=str(exc))
+                resp.headers["Retry-After"] = str(exc.retry_after)
+                return resp
+        metrics.gauge_add("nl_explorer_chats_in_flight", 1)
+
+        def release() -> None:
+            metrics.gauge_add("nl_explorer_chats_in_flight", -1)
+            if controller is not None:
+                controller.release(user_key)
+
+        trace = traces.begin(req, ctx)
+        # Fast-path answers hold an admission slot and are traced like LLM turns
+        if cfg.get("fast_path_router", True):
+            try:
+                routed = intent_router.route(
+                    req["message"],
+                    ctx["datasets"],
+                    allowed_schemas=_allowed_schemas(req),
+                    max_datasets=budget["max_datasets"],
+                )
+            except Exception:
+                release()
+                traces.end(trace)
+                raise
+            if routed is not None:
+                try:
+                    return self._fast_path_response(routed, req)
+                finally:
+                    release()
+                    traces.end(trace)
+
+        system_prompt = build_system_prompt(
+            ctx,
+            current_user=current_user_name,
+            page_context=req.get("page_context", {}),
+            max_columns_per_dataset=budget["max_columns"],
+        )
 
         messages: list[dict[str, Any]] = [{"role": "system", "content": system_prompt}]
         for turn in req.get("conversation", []):
@@ -88,17 +222,49 @@ class NLExplorerRestApi(BaseApi):
         messages.append({"role": "user", "content": req["message"]})
 
         if req.get("stream"):
-            return self._stream_chat(messages, req)
+            usage: dict[str, int] = {}
+
+            def on_close() -> None:
+                # The slot is held until the stream finishes; the turn's tokens are charged then
+                if controller is not None:
+                    controller.record_usage(user_key, sum(usage.values()))
+                release()
+                traces.end(trace)
 
-        return self._sync_chat(messages, req)
+            return self._stream_chat(messages, req, on_close=on_close, model=budget["model"], usage=usage)
 
-    def _sync_chat(self, messages: list[dict], req: dict) -> Response:
+        try:
+            return self._sync_chat(
+                messages,
+                req,
+                user_key=user_key,
+                max_tool_rounds=budget["max_tool_rounds"],
+                model=budget["model"],
+            )
+        finally:
+            release()
+            traces.end(trace)
+
+    def _sync_chat(
+        self,
+        messages: list[dict],
+        req: dict,
+        user_key: str | None = None,
+        max_tool_rounds: int = degradation.DEFAULT_MAX_TOOL_ROUNDS,
+        model: str | None = None,
+    ) -> Response:
         """Run a synchronous (non-streaming) chat turn with tool call loop."""
-        MAX_TOOL_ROUNDS = 5
+        controller = admission.get_controller()
+        memo = tool_memo.ToolMemo()
 
-        for _ in range(MAX_TOOL_ROUNDS):
-            result = llm_service.chat(messages=messages, tools=TOOLS, stream=False)
+        for _ in range(max_tool_rounds):
+            result = llm_service.chat(messages=messages, tools=TOOLS, stream=False, model=model)
             assert isinstance(result, dict)
+            if controller is not None and user_key is not None:
+                usage = result.get("usage") or {}
+                controller.record_usage(
+                    user_key, usage.get("prompt_tokens", 0) + usage.get("completion_tokens", 0)
+                )
 
             tool_calls = result.get("tool_calls", [])
             if not tool_calls:
@@ -124,7 +290,7 @@ class NLExplorerRestApi(BaseApi):
             # Each tool result must reference the matching tool_call_id so that
             # Bedrock receives exactly one toolResult per toolUse block.
             for tc in tool_calls:
-                raw = llm_service.dispatch_tool_call(tc["name"], tc["arguments"])
+                raw = memo.dispatch(tc["name"], tc["arguments"], allowed_schemas=_allowed_schemas(req))
                 messages.append({
                     "role": "tool",
                     "tool_call_id": tc["id"],
@@ -142,25 +308,78 @@ class NLExplorerRestApi(BaseApi):
             "actions": [],
             "conversation": conversation_out,
         }
-        return self.response(200, **ChatResponseSchema().dump(response_payload))
+        return self._dump_response(200, _chat_response_dumper, response_payload)
+
+    def _dump_response(self, code: int, dumper: serialization.FastDumper, payload: dict[str, Any]) -> Response:
+        """Like ``self.response(code, **schema.dump(payload))``, through the compiled fast path."""
+        data, exact = dumper.dump(payload)
+        body = serialization.encode(data) if exact else None
+        if body is None:
+            return self.response(code, **data)
+        return current_app.response_class(body, status=code, content_type="application/json; charset=utf-8")
+
+    def _fast_path_response(self, routed: dict[str, Any], req: dict) -> Response:
+        """Return a fast-path router answer in the same shape as an LLM turn."""
+        if req.get("stream"):
+
+            def generate():  # type: ignore[return]
+                yield f'data: {json.dumps({"type": "text", "content": routed["message"]})}\n\n'
+                yield "data: [DONE]\n\n"
+
+            return Response(
+                stream_with_context(generate()),
+                mimetype="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            )
 
-    def _stream_chat(self, messages: list[dict], req: dict) -> Response:
-        """Return an SSE streaming response."""
+        conversation_out = [
+            {"role": turn["role"], "content": turn["content"]}
+            for turn in req.get("conversation", [])
+            if turn["role"] in ("user", "assistant")
+        ]
+        conversation_out.append({"role": "user", "content": req["message"]})
+        conversation_out.append({"role": "assistant", "content": routed["message"]})
+        response_payload = {
+            "message": routed["message"],
+            "actions": routed["actions"],
+            "conversation": conversation_out,
+        }
+        return self._dump_response(200, _chat_response_dumper, response_payload)
+
+    def _stream_chat(
+        self,
+        messages: list[dict],
+        req: dict,
+        on_close: Callable[[], None] | None = None,
+        model: str | None = None,
+        usage: dict[str, int] | None = None,
+    ) -> Response:
+        """Return an SSE streaming response; ``on_close`` runs when the stream ends and ``usage`` is filled."""
 
         def generate():  # type: ignore[return]
             try:
-                gen = llm_service.chat(messages=messages, tools=TOOLS, stream=True)
+                gen = llm_service.chat(messages=messages, tools=TOOLS, stream=True, model=model, usage=usage)
                 for chunk in gen:  # type: ignore[union-attr]
                     yield chunk
             except Exception as exc:
                 logger.exception("Streaming chat error")
                 yield f'data: {json.dumps({"type": "error", "content": str(exc)})}\n\n'
 
-        return Response(
-            stream_with_context(generate()),
-            mimetype="text/event-stream",
-            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
-        )
+        headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        body: Any = generate()
+        cfg = current_app.config.get("NL_EXPLORER_CONFIG", {})
+        if cfg.get("stream_compression", False) and sse.accepts_gzip(request.headers.get("Accept-Encoding")):
+            body = sse.gzip_stream(body)
+            headers["Content-Encoding"] = "gzip"
+            headers["Vary"] = "Accept-Encoding"
+
+        resp = Response(stream_with_context(body), mimetype="text/event-stream", headers=headers)
+        metrics.gauge_add("nl_explorer_sse_streams_open", 1)
+        # Called by the WSGI server once the stream is finished or the client disconnects
+        resp.call_on_close(lambda: metrics.gauge_add("nl_explorer_sse_streams_open", -1))
+        if on_close is not None:
+            resp.call_on_close(on_close)
+        return resp
 
     # ------------------------------------------------------------------ #
     # POST /api/v1/nl_explorer/execute
@@ -170,21 +389,109 @@ class NLExplorerRestApi(BaseApi):
     @protect()
     @safe
     @permission_name("write")
+    @profiler.profiled
     def execute(self) -> Response:
-        """Execute a structured action (create chart, dashboard, run SQL)."""
+        """
+        Execute a structured action (create chart, dashboard, run SQL).
+
+        Accepts either a single ``action`` or an ordered ``actions`` batch with
+        ``depends_on`` hints; see ``batch_executor`` for the execution order.
+        A single ``run_sql`` action returns an Arrow IPC stream instead of JSON
+        when the client prefers ``application/vnd.apache.arrow.stream``.
+        """
         body = request.get_json(force=True) or {}
-        req = ExecuteRequestSchema().load(body)
+        req = _execute_request_schema.load(body)
+
+        if "actions" in req:
+            cfg = current_app.config.get("NL_EXPLORER_CONFIG", {})
+            results = batch_executor.execute_actions(
+                req["actions"],
+                max_workers=cfg.get("execute_max_workers", batch_executor.DEFAULT_MAX_WORKERS),
+            )
+            response_payload = {"success": all(r["success"] for r in results), "results": results}
+            return self.response(200, **_execute_batch_response_schema.dump(response_payload))
+
         action = req["action"]
 
-        result = llm_service.dispatch_tool_call(action["type"], action.get("payload", {}))
-        payload = json.loads(result.get("content", "{}"))
+        result = llm_service.execute_tool(action["type"], action.get("payload", {}))
+        if (
+            isinstance(result, columnar.ColumnarResult)
+            and columnar.arrow_available()
+            and request.accept_mimetypes.best_match(
+                ["application/json", columnar.ARROW_STREAM_MIMETYPE], default="application/json"
+            ) == columnar.ARROW_STREAM_MIMETYPE
+        ):
+            return Response(result.to_arrow_stream(), mimetype=columnar.ARROW_STREAM_MIMETYPE)
+        payload = columnar.as_payload(result)
 
         response_payload = {
             "success": "error" not in payload,
             "result": payload,
             "error": payload.get("error"),
         }
-        return self.response(200, **ExecuteResponseSchema().dump(response_payload))
+        return self.response(200, **_execute_response_schema.dump(response_payload))
+
+    # ------------------------------------------------------------------ #
+    # GET /api/v1/nl_explorer/preview/<key>
+    # ------------------------------------------------------------------ #
+
+    @expose("/preview/<key>", methods=("GET",))
+    @protect()
+    @safe
+    @permission_name("read")
+    def preview(self, key: str) -> Response:
+        """Redirect a short preview key (local cache fallback) to its Explore URL."""
+        url = chart_creator.resolve_preview_url(key)
+        if url is None:
+            return self.response_404()
+        return redirect(url)  # type: ignore[return-value]
+
+    # ------------------------------------------------------------------ #
+    # GET /api/v1/nl_explorer/metrics
+    # ------------------------------------------------------------------ #
+
+    @expose("/metrics", methods=("GET",))
+    @protect()
+    @safe
+    @permission_name("admin")
+    def get_metrics(self) -> Response:
+        """Return NL Explorer metrics of all workers in Prometheus text format."""
+        # can_admin is synced to Alpha and Gamma too, so check for an admin explicitly
+        if not profiler.is_admin():
+            return self.response_403()
+        return Response(metrics.render(), mimetype="text/plain; version=0.0.4; charset=utf-8")
+
+    # ------------------------------------------------------------------ #
+    # GET /api/v1/nl_explorer/profiles
+    # ------------------------------------------------------------------ #
+
+    @expose("/profiles", methods=("GET",))
+    @protect()
+    @safe
+    @permission_name("admin")
+    def get_profiles(self) -> Response:
+        """List stored request profiles, newest first."""
+        # Profiles can contain SQL and user data; can_admin alone also reaches Alpha and Gamma
+        if not profiler.is_admin():
+            return self.response_403()
+        return self.response(200, result=profiler.list_profiles())
+
+    @expose("/profiles/<profile_id>", methods=("GET",))
+    @protect()
+    @safe
+    @permission_name("admin")
+    def get_profile(self, profile_id: str) -> Response:
+        """Download a profile as folded stacks (flamegraph.pl / speedscope input)."""
+        if not profiler.is_admin():
+            return self.response_403()
+        folded = profiler.read_profile(profile_id)
+        if folded is None:
+            return self.response_404()
+        return Response(
+            folded,
+            mimetype="text/plain",
+            headers={"Content-Disposition": f"attachment; filename={profile_id}.folded"},
+        )
 
     # ------------------------------------------------------------------ #
     # GET /api/v1/nl_explorer/config
@@ -204,4 +511,4 @@ class NLExplorerRestApi(BaseApi):
                 "max_datasets_in_context", context_builder.DEFAULT_MAX_DATASETS
             ),
         }
-        return self.response(200, **PluginConfigResponseSchema().dump(payload))
+        return self.response(200, **_plugin_config_response_schema.dump(payload))
@@ -0,0 +1,156 @@
+"""
+Executes a batch of structured actions for the ``/execute`` endpoint.
+
+Actions may declare ``depends_on`` hints (IDs of earlier actions). The batch
+runs in waves: every action whose dependencies have finished is ready, and
+the read-only ones in a wave run concurrently on a thread pool. Each
+mutating action also waits for the mutating action before it, so writes run
+one after another in request order even when one of them depends on a read.
+A payload value of
+``{"$ref": "<action_id>.<field>"}`` is replaced by that field of the
+referenced action's result, e.g. the ``chart_id`` of a chart created earlier
+in the same batch.
+"""
+
+from __future__ import annotations
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from flask import copy_current_request_context, g, has_request_context
+
+from nl_explorer import columnar, llm_service
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 4
+
+
+def _run_action(action: dict[str, Any], payload: dict[str, Any]) -> dict[str, Any]:
+    result = columnar.as_payload(llm_service.execute_tool(action["type"], payload))
+    if isinstance(result, dict) and "error" in result:
+        return {"success": False, "result": result, "error": result["error"]}
+    return {"success": True, "result": result, "error": None}
+
+
+def _with_request_context(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """Wrap ``fn`` to run in a copy of the current request context on another thread."""
+    if not has_request_context():
+        return fn
+    # g is per app context, so the logged-in user has to be carried over explicitly
+    carried = {k: getattr(g, k) for k in ("user", "_login_user") if hasattr(g, k)}
+
+    @copy_current_request_context
+    def wrapper(*args: Any) -> Any:
+        for key, value in carried.items():
+            setattr(g, key, value)
+        return fn(*args)
+
+    return wrapper
+
+
+def _resolve_refs(value: Any, results: dict[str, dict[str, Any]]) -> Any:
+    """Replace ``{"$ref": "id.path"}`` placeholders with values from earlier results."""
+    if isinstance(value, dict):
+        if set(value) == {"$ref"}:
+            action_id, _, path = str(value["$ref"]).partition(".")
+            resolved: Any = results[action_id]["result"]
+            for part in filter(None, path.split(".")):
+                resolved = resolved[int(part)] if isinstance(resolved, list) else resolved[part]
+            return resolved
+        return {k: _resolve_refs(v, results) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_resolve_refs(v, results) for v in value]
+    return value
+
+
+def _failure(error: str) -> dict[str, Any]:
+    return {"success": False, "result": {}, "error": error}
+
+
+def execute_actions(
+    actions: list[dict[str, Any]],
+    max_workers: int = DEFAULT_MAX_WORKERS,
+) -> list[dict[str, Any]]:
+    """
+    Execute an ordered list of actions.
+
+    Args:
+        actions: Dicts with "type", optional "payload", "id" (defaults to
+            ``#<index>``) and "depends_on" (list of action IDs).
+        max_workers: Thread pool size for concurrent read-only actions.
+
+    Returns:
+        One result dict per action, in request order, with "id", "type",
+        "success", "result" and "error".
+    """
+    ordered = [
+        {**a, "id": str(a["id"]) if a.get("id") is not None else f"#{idx}"} for idx, a in enumerate(actions)
+    ]
+    # Results are kept by position so that duplicate ids cannot merge them
+    results: list[dict[str, Any] | None] = [None] * len(ordered)
+    ids = [a["id"] for a in ordered]
+    position = {action_id: idx for idx, action_id in enumerate(ids) if ids.count(action_id) == 1}
+
+    deps: list[list[int]] = []
+    after: list[int | None] = []  # previous mutating action, for ordering only
+    previous_write: int | None = None
+    for idx, action in enumerate(ordered):
+        declared = [str(d) for d in action.get("depends_on") or []]
+        deps.append([position[d] for d in declared if d in position])
+        read_only = action["type"] in llm_service.READ_ONLY_TOOLS
+        after.append(None if read_only else previous_write)
+        if not read_only:
+            previous_write = idx
+        if action["id"] not in position:
+            results[idx] = _failure(f"Duplicate action id '{action['id']}'")
+        elif any(d not in position for d in declared):
+            unknown = [d for d in declared if d not in position]
+            results[idx] = _failure(f"Unknown dependencies: {', '.join(unknown)}")
+
+    def by_id() -> dict[str, dict[str, Any]]:
+        return {action_id: results[idx] for action_id, idx in position.items() if results[idx] is not None}
+
+    pending = [idx for idx in range(len(ordered)) if results[idx] is None]
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="nl-explorer-exec") as pool:
+        while pending:
+            ready, waiting = [], []
+            for idx in pending:
+                done = all(results[d] is not None for d in deps[idx]) and (
+                    after[idx] is None or results[after[idx]] is not None
+                )
+                (ready if done else waiting).append(idx)
+            if not ready:
+                # Remaining actions depend on each other in a cycle
+                for idx in waiting:
+                    results[idx] = _failure("Dependency cycle")
+                break
+
+            finished = by_id()
+            futures = {}
+            for idx in ready:
+                action = ordered[idx]
+                failed = [ids[d] for d in deps[idx] if not results[d]["success"]]
+                if failed:
+                    results[idx] = _failure(f"Skipped: dependency {', '.join(failed)} failed")
+                    continue
+                try:
+                    payload = _resolve_refs(action.get("payload") or {}, finished)
+                except (KeyError, IndexError, TypeError, ValueError) as exc:
+                    results[idx] = _failure(f"Unresolved $ref: {exc}")
+                    continue
+                if action["type"] in llm_service.READ_ONLY_TOOLS:
+                    futures[idx] = pool.submit(_with_request_context(_run_action), action, payload)
+                else:
+                    results[idx] = _run_action(action, payload)
+
+            for idx, future in futures.items():
+                try:
+                    results[idx] = future.result()
+                except Exception as exc:  # noqa: BLE001
+                    logger.exception("Batched action %s failed", ids[idx])
+                    results[idx] = _failure(str(exc))
+            pending = waiting
+
+    return [{"id": a["id"], "type": a["type"], **results[idx]} for idx, a in enumerate(ordered)]  # type: ignore[dict-item]
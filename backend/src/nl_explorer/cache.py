@@ -0,0 +1,118 @@
+"""
+Small cache facade shared by the NL Explorer modules.
+
+Uses Superset's configured cache (``CACHE_CONFIG``) when running inside
+Superset with a real backend, so entries are shared between workers. Falls back
+to a process-local TTL cache otherwise (tests, scripts, or the default
+``NullCache`` configuration).
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+from nl_explorer import metrics
+
+logger = logging.getLogger(__name__)
+
+# Module-level import with fallback so the module can be imported without Superset.
+try:
+    from superset.extensions import cache_manager
+except ImportError:
+    cache_manager = None  # type: ignore[assignment]
+
+KEY_PREFIX = "nl_explorer:"
+DEFAULT_TIMEOUT = 300
+
+
+class LocalCache:
+    """Thread-safe in-process TTL cache with LRU eviction."""
+
+    def __init__(self, max_entries: int = 4096) -> None:
+        self._max_entries = max_entries
+        self._data: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at and expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, timeout: int | None = None) -> bool:
+        expires_at = time.monotonic() + timeout if timeout else 0.0
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self._max_entries:
+                self._data.popitem(last=False)
+        return True
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            return self._data.pop(key, None) is not None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+_local_cache = LocalCache()
+
+
+def _backend() -> Any:
+    """Return Superset's cache when it is usable, else the local fallback."""
+    if cache_manager is not None:
+        try:
+            cache = cache_manager.cache
+            if type(getattr(cache, "cache", None)).__name__ != "NullCache":
+                return cache
+        except Exception:  # noqa: BLE001
+            logger.debug("Superset cache unavailable, using local cache", exc_info=True)
+    return _local_cache
+
+
+def shared() -> bool:
+    """True if values go to Superset's cache, False if only this process can read them back."""
+    return _backend() is not _local_cache
+
+
+def get(key: str) -> Any:
+    """Return the cached value for ``key`` or None."""
+    try:
+        value = _backend().get(KEY_PREFIX + key)
+    except Exception:  # noqa: BLE001
+        logger.warning("Cache get failed for %s", key, exc_info=True)
+        value = None
+    metrics.inc(
+        "nl_explorer_cache_requests_total",
+        kind=key.split(":", 1)[0],
+        result="miss" if value is None else "hit",
+    )
+    return value
+
+
+def set(key: str, value: Any, timeout: int = DEFAULT_TIMEOUT) -> None:  # noqa: A001
+    """Store ``value`` under ``key`` for ``timeout`` seconds."""
+    try:
+        _backend().set(KEY_PREFIX + key, value, timeout=timeout)
+    except Exception:  # noqa: BLE001
+        logger.warning("Cache set failed for %s", key, exc_info=True)
+
+
+def delete(key: str) -> None:
+    """Remove ``key`` from the cache."""
+    try:
+        _backend().delete(KEY_PREFIX + key)
+    except Exception:  # noqa: BLE001
+        logger.warning("Cache delete failed for %s", key, exc_info=True)
@@ -9,10 +9,16 @@ from __future__ import annotations
 
 import json
 import logging
+import secrets
 from typing import Any
+from urllib.parse import urlencode
 
 from flask import current_app
 
+from nl_explorer import cache, context_builder
+from nl_explorer.chart_templates import expand_template
+from nl_explorer.form_data_validator import validate_form_data
+
 logger = logging.getLogger(__name__)
 
 # Module-level imports with fallback so tests can patch directly.
@@ -36,6 +42,49 @@ try:
 except ImportError:
     DashboardDAO = None  # type: ignore[assignment]
 
+try:
+    from superset.utils.decorators import transaction
+except ImportError:
+    transaction = None  # type: ignore[assignment]
+
+try:
+    from superset.utils.core import DatasourceType
+except ImportError:
+    DatasourceType = None  # type: ignore[assignment,misc]
+
+try:
+    from superset.commands.explore.form_data.create import CreateFormDataCommand
+    from superset.commands.explore.form_data.parameters import CommandParameters
+except ImportError:
+    try:
+        from superset.explore.form_data.commands.create import CreateFormDataCommand
+        from superset.explore.form_data.commands.parameters import CommandParameters
+    except ImportError:
+        CreateFormDataCommand = CommandParameters = None  # type: ignore[assignment,misc]
+
+# TTL for previews kept in the local cache stand-in (Superset's own explore
+# form_data store uses EXPLORE_FORM_DATA_CACHE_CONFIG instead).
+DEFAULT_PREVIEW_TTL = 24 * 60 * 60
+
+
+def _validation_error(dataset_id: int, viz_type: str, form_data: dict[str, Any]) -> dict[str, Any] | None:
+    """Validate form_data against the cached dataset schema; return an error payload if invalid."""
+    # The existence and access check runs even when form_data validation is off.
+    # Validate against every column: the LLM may use one beyond the prompt's truncated list.
+    schema = context_builder.get_dataset_schema(dataset_id, max_columns=None)
+    if not schema:
+        errors = [{"field": "dataset_id", "message": f"Dataset {dataset_id} not found or not accessible."}]
+    elif not current_app.config.get("NL_EXPLORER_CONFIG", {}).get("validate_form_data", True):
+        return None
+    else:
+        errors = validate_form_data(viz_type, form_data, schema)
+    if not errors:
+        return None
+    return {
+        "error": f"Invalid chart configuration for viz_type '{viz_type}'. Fix the listed fields and retry.",
+        "validation_errors": errors,
+    }
+
 
 def preview_chart(
     dataset_id: int,
@@ -46,31 +95,86 @@ def preview_chart(
     Generate a Superset Explore URL for previewing a chart configuration
     without saving it permanently.
 
-    Returns a dict with an "explore_url" key.
+    The form_data is stored server-side (Superset's explore form_data store,
+    or the NL Explorer cache as a fallback) so the URL only carries a short key.
+    When neither is shared between workers (Superset's cache is a NullCache),
+    the URL carries the form_data inline instead, since a key stored in one
+    worker's memory would not resolve on the others.
+
+    Returns a dict with an "explore_url" key, or an "error" dict with
+    "validation_errors" if the configuration does not match the dataset.
     """
-    from flask import current_app
+    invalid = _validation_error(dataset_id, viz_type, form_data)
+    if invalid:
+        return invalid
 
     merged_form_data = {
         "datasource": f"{dataset_id}__table",
         "viz_type": viz_type,
         **form_data,
     }
-    params = json.dumps(merged_form_data)
+    base_url = current_app.config.get("WEBDRIVER_BASEURL", "http://localhost:8088/").rstrip("/")
+
+    key = _store_explore_form_data(dataset_id, merged_form_data)
+    if key:
+        # Explore falls back to the bare dataset if the key has expired
+        explore_url = (
+            f"{base_url}/explore/?form_data_key={key}"
+            f"&datasource_type=table&datasource_id={dataset_id}"
+        )
+    elif cache.shared():
+        key = secrets.token_urlsafe(9)
+        ttl = current_app.config.get("NL_EXPLORER_CONFIG", {}).get("preview_cache_ttl", DEFAULT_PREVIEW_TTL)
+        cache.set(f"preview:{key}", merged_form_data, timeout=int(ttl))
+        explore_url = f"{base_url}/api/v1/nl_explorer/preview/{key}"
+    else:
+        explore_url = _inline_explore_url(base_url, dataset_id, merged_form_data)
 
-    base_url = current_app.config.get("WEBDRIVER_BASEURL", "http://localhost:8088/")
-    explore_url = (
-        f"{base_url.rstrip('/')}/explore/"
-        f"?datasource_type=table&datasource_id={dataset_id}"
-        f"&form_data={params}"
-    )
     return {
         "type": "explore_link",
         "explore_url": explore_url,
+        "form_data_key": key,  # None when the form_data is inline
         "dataset_id": dataset_id,
         "viz_type": viz_type,
     }
 
 
+def _store_explore_form_data(dataset_id: int, form_data: dict[str, Any]) -> str | None:
+    """Save form_data in Superset's explore key-value store; return its key, or None if unavailable."""
+    if CreateFormDataCommand is None:
+        return None
+    try:
+        params = CommandParameters(
+            datasource_id=dataset_id,
+            datasource_type=DatasourceType.TABLE,
+            form_data=json.dumps(form_data),
+        )
+        return CreateFormDataCommand(params).run()
+    except Exception:  # noqa: BLE001
+        logger.warning("Explore form_data store unavailable, using local preview cache", exc_info=True)
+        return None
+
+
+def resolve_preview_url(key: str) -> str | None:
+    """Return the full Explore URL for a locally cached preview key, or None if expired."""
+    form_data = cache.get(f"preview:{key}")
+    if form_data is None:
+        return None
+    dataset_id = str(form_data["datasource"]).split("__", 1)[0]
+    base_url = current_app.config.get("WEBDRIVER_BASEURL", "http://localhost:8088/").rstrip("/")
+    return _inline_explore_url(base_url, dataset_id, form_data)
+
+
+def _inline_explore_url(base_url: str, dataset_id: int | str, form_data: dict[str, Any]) -> str:
+    """Explore URL carrying the whole form_data in its query string."""
+    query = urlencode({
+        "datasource_type": "table",
+        "datasource_id": dataset_id,
+        "form_data": json.dumps(form_data),
+    })
+    return f"{base_url}/explore/?{query}"
+
+
 def create_chart(
     slice_name: str,
     datasource_id: int,
@@ -80,8 +184,13 @@ def create_chart(
     """
     Permanently create and save a chart in Superset.
 
-    Returns a dict with the created chart's ID and a link to view it.
+    Returns a dict with the created chart's ID and a link to view it, or an
+    "error" dict with "validation_errors" if the params are invalid.
     """
+    invalid = _validation_error(datasource_id, viz_type, params)
+    if invalid:
+        return invalid
+
     user = get_user()
     command = CreateChartCommand(
         actor=user,
@@ -106,6 +215,39 @@ def create_chart(
     }
 
 
+def chart_from_template(
+    dataset_id: int,
+    template: str,
+    slots: dict[str, Any],
+    slice_name: str | None = None,
+    save: bool = False,
+) -> dict[str, Any]:
+    """
+    Expand a chart template and preview it, or save it when ``save`` is set.
+
+    Measures that name one of the dataset's saved metrics use that metric.
+
+    Returns:
+        The ``preview_chart`` / ``create_chart`` result, including any
+        validation errors.
+    """
+    schema = context_builder.get_dataset_schema(dataset_id)
+    saved_metrics = {m["name"] for m in schema.get("metrics", [])}
+    try:
+        viz_type, form_data = expand_template(template, slots, saved_metrics)
+    except ValueError as exc:
+        return {"error": str(exc)}
+    if save:
+        return create_chart(
+            slice_name=slice_name or template.replace("_", " ").title(),
+            datasource_id=dataset_id,
+            viz_type=viz_type,
+            params=form_data,
+        )
+    result = preview_chart(dataset_id=dataset_id, viz_type=viz_type, form_data=form_data)
+    return {**result, "template": template}
+
+
 def create_dashboard(
     title: str,
     chart_ids: list[int],
@@ -147,6 +289,141 @@ def create_dashboard(
     }
 
 
+def create_charts(specs: list[dict[str, Any]]) -> dict[str, Any]:
+    """
+    Create several charts at once.
+
+    Every spec (``slice_name``, ``datasource_id``, ``viz_type``, ``params``)
+    is validated before anything is written; all charts are then created
+    with Superset's commands in a single transaction, so either all of them
+    are created or none.
+
+    Returns a dict with a "charts" list, or an "error" dict with per-spec
+    "chart_errors" if any spec is invalid.
+    """
+    invalid = _validate_specs(specs)
+    if invalid:
+        return invalid
+    charts, _ = _create_in_transaction(specs)
+    return {"type": "charts_created", "charts": charts}
+
+
+def create_dashboard_with_charts(title: str, specs: list[dict[str, Any]]) -> dict[str, Any]:
+    """
+    Create charts from specs and a dashboard containing them in one transaction.
+
+    Returns the same payload as ``create_dashboard`` plus a "charts" list.
+    """
+    invalid = _validate_specs(specs)
+    if invalid:
+        return invalid
+    charts, dashboard = _create_in_transaction(specs, dashboard_title=title)
+
+    base_url = current_app.config.get("WEBDRIVER_BASEURL", "http://localhost:8088/")
+    return {
+        "type": "dashboard_created",
+        "dashboard_id": dashboard.id,
+        "dashboard_title": dashboard.dashboard_title,
+        "dashboard_url": f"{base_url.rstrip('/')}/superset/dashboard/{dashboard.id}/",
+        "charts": charts,
+    }
+
+
+def _validate_specs(specs: list[dict[str, Any]]) -> dict[str, Any] | None:
+    """Validate every chart spec up front; return an error payload if any is invalid."""
+    if not specs:
+        return {"error": "At least one chart spec is required."}
+    chart_errors = []
+    for idx, spec in enumerate(specs):
+        missing = [k for k in ("slice_name", "datasource_id", "viz_type") if not spec.get(k)]
+        if missing:
+            chart_errors.append({
+                "index": idx,
+                "validation_errors": [{"field": k, "message": f"'{k}' is required."} for k in missing],
+            })
+            continue
+        invalid = _validation_error(spec["datasource_id"], spec["viz_type"], spec.get("params", {}))
+        if invalid:
+            chart_errors.append({"index": idx, "validation_errors": invalid["validation_errors"]})
+    if not chart_errors:
+        return None
+    return {
+        "error": "No charts were created. Fix the listed chart specs and retry.",
+        "chart_errors": chart_errors,
+    }
+
+
+def _create_in_transaction(
+    specs: list[dict[str, Any]],
+    dashboard_title: str | None = None,
+) -> tuple[list[dict[str, Any]], Any]:
+    """
+    Run ``CreateChartCommand`` per spec (and ``CreateDashboardCommand``) with a single commit.
+
+    Superset's ``transaction`` decorator does not commit in nested calls, so
+    the commands' own commits are deferred to the outer one and any failure
+    rolls back every chart. On Superset versions without it each command
+    commits on its own.
+    """
+    user = get_user()
+    owners = [user.id] if user else []
+
+    def create() -> tuple[list[Any], Any]:
+        slices = [
+            CreateChartCommand(
+                actor=user,
+                data={
+                    "slice_name": spec["slice_name"],
+                    "datasource_id": spec["datasource_id"],
+                    "datasource_type": "table",
+                    "viz_type": spec["viz_type"],
+                    "params": json.dumps(spec.get("params", {})),
+                    "owners": list(owners),
+                },
+            ).run()
+            for spec in specs
+        ]
+        dashboard = None
+        if dashboard_title:
+            chart_ids = [s.id for s in slices]
+            dashboard = CreateDashboardCommand(
+                actor=user,
+                data={
+                    "dashboard_title": dashboard_title,
+                    "slug": None,
+                    "owners": list(owners),
+                    "position_json": json.dumps(_build_position_json(chart_ids)),
+                    "css": "",
+                    "json_metadata": "{}",
+                    "published": False,
+                },
+            ).run()
+            DashboardDAO.set_dash_to_charts(dashboard, chart_ids)
+        return slices, dashboard
+
+    if transaction is None:
+        logger.warning("Superset has no transaction decorator; charts are committed one by one")
+        slices, dashboard = create()
+    else:
+        slices, dashboard = transaction()(create)()
+
+    logger.info(
+        "Created charts ids=%s%s",
+        [s.id for s in slices],
+        f" and dashboard id={dashboard.id}" if dashboard else "",
+    )
+    base_url = current_app.config.get("WEBDRIVER_BASEURL", "http://localhost:8088/")
+    charts = [
+        {
+            "chart_id": s.id,
+            "chart_name": s.slice_name,
+            "chart_url": f"{base_url.rstrip('/')}/explore/?slice_id={s.id}",
+        }
+        for s in slices
+    ]
+    return charts, dashboard
+
+
 def _build_position_json(chart_ids: list[int]) -> dict[str, Any]:
     """Build a simple vertical layout position_json for a set of chart IDs."""
     import uuid
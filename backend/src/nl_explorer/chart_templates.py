@@ -0,0 +1,231 @@
+"""
+Parameterised chart templates.
+
+Instead of writing a complete Superset ``form_data`` object, the LLM picks a
+template and fills a few slots by column role:
+
+- ``time``: a temporal column
+- ``dimension`` / ``dimensions`` / ``x`` / ``y``: categorical columns
+- ``measure`` / ``measures``: a saved metric name, ``COUNT(*)``, or an
+  aggregate such as ``SUM(amount)`` or ``COUNT_DISTINCT(user_id)``
+
+Common optional slots: ``filters`` (list of ``{"column", "op", "value"}``),
+``time_range`` (e.g. ``"Last quarter"``, applied to the ``time`` column, so
+it needs that slot too), ``time_grain`` (ISO duration such as ``"P1M"``) and
+``row_limit``. ``chart_creator.chart_from_template``
+expands the template into full form_data and validates it as usual.
+
+This module has no Flask or Superset imports: the tool definitions in
+``prompts/tools.py`` build their description from ``TEMPLATES``.
+"""
+
+from __future__ import annotations
+
+import re
+from collections.abc import Collection
+from typing import Any, Callable
+
+_AGGREGATE_RE = re.compile(
+    r"^(SUM|AVG|MIN|MAX|COUNT|COUNT_DISTINCT)\s*\(\s*(DISTINCT\s+)?([\w.]+|\*)\s*\)$",
+    re.IGNORECASE,
+)
+
+
+def expand_measure(measure: str, saved_metrics: Collection[str] = ()) -> str | dict[str, Any]:
+    """Turn a measure slot into a saved metric name or an adhoc metric; saved metrics win."""
+    text = measure.strip()
+    if text in saved_metrics:
+        return text
+    if re.sub(r"\s+", "", text.lower()) in ("count", "count(*)"):
+        return {"expressionType": "SQL", "sqlExpression": "COUNT(*)", "label": "COUNT(*)"}
+    match = _AGGREGATE_RE.match(text)
+    if not match or match.group(3) == "*":
+        return text
+    aggregate = match.group(1).upper()
+    if match.group(2) and aggregate == "COUNT":
+        aggregate = "COUNT_DISTINCT"
+    column = match.group(3)
+    return {
+        "expressionType": "SIMPLE",
+        "column": {"column_name": column},
+        "aggregate": aggregate,
+        "label": f"{aggregate}({column})",
+    }
+
+
+def _as_list(value: Any) -> list[Any]:
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _common(slots: dict[str, Any]) -> dict[str, Any]:
+    """Filters, time range and row limit shared by every template."""
+    filters = [
+        {
+            "expressionType": "SIMPLE",
+            "clause": "WHERE",
+            "subject": f["column"],
+            "operator": f.get("op", "=="),
+            "comparator": f.get("value"),
+        }
+        for f in _as_list(slots.get("filters"))
+        if isinstance(f, dict) and f.get("column")
+    ]
+    if slots.get("time_range"):
+        filters.append({
+            "expressionType": "SIMPLE",
+            "clause": "WHERE",
+            "subject": slots["time"],
+            "operator": "TEMPORAL_RANGE",
+            "comparator": slots["time_range"],
+        })
+    form_data: dict[str, Any] = {"adhoc_filters": filters}
+    if slots.get("time_range"):
+        form_data["time_range"] = slots["time_range"]
+    if slots.get("row_limit"):
+        form_data["row_limit"] = int(slots["row_limit"])
+    return form_data
+
+
+def _over_time(slots: dict[str, Any], measures: list[Any]) -> dict[str, Any]:
+    return {
+        "x_axis": slots["time"],
+        "time_grain_sqla": slots.get("time_grain", "P1D"),
+        "metrics": measures,
+        "groupby": _as_list(slots.get("dimension")),
+    }
+
+
+def _by_category(slots: dict[str, Any], measures: list[Any]) -> dict[str, Any]:
+    return {
+        "x_axis": slots["dimension"],
+        "metrics": measures,
+        "groupby": _as_list(slots.get("series")),
+    }
+
+
+def _single_metric_by(slots: dict[str, Any], measures: list[Any]) -> dict[str, Any]:
+    return {
+        "metric": measures[0],
+        "groupby": _as_list(slots.get("dimensions") or slots.get("dimension")),
+    }
+
+
+def _kpi_total(slots: dict[str, Any], measures: list[Any]) -> dict[str, Any]:
+    return {"metric": measures[0]}
+
+
+def _kpi_trend(slots: dict[str, Any], measures: list[Any]) -> dict[str, Any]:
+    return {
+        "x_axis": slots["time"],
+        "time_grain_sqla": slots.get("time_grain", "P1D"),
+        "metric": measures[0],
+    }
+
+
+def _table_summary(slots: dict[str, Any], measures: list[Any]) -> dict[str, Any]:
+    return {
+        "query_mode": "aggregate",
+        "groupby": _as_list(slots.get("dimensions") or slots.get("dimension")),
+        "metrics": measures,
+    }
+
+
+def _table_rows(slots: dict[str, Any], measures: list[Any]) -> dict[str, Any]:
+    return {"query_mode": "raw", "all_columns": _as_list(slots.get("columns"))}
+
+
+def _histogram(slots: dict[str, Any], measures: list[Any]) -> dict[str, Any]:
+    return {"all_columns_x": [slots["column"]], "groupby": _as_list(slots.get("dimension"))}
+
+
+def _heatmap(slots: dict[str, Any], measures: list[Any]) -> dict[str, Any]:
+    return {"all_columns_x": slots["x"], "all_columns_y": slots["y"], "metric": measures[0]}
+
+
+def _box_plot(slots: dict[str, Any], measures: list[Any]) -> dict[str, Any]:
+    return {
+        "columns": _as_list(slots.get("dimension")),
+        "metrics": measures,
+        "groupby": _as_list(slots.get("series")),
+    }
+
+
+# builder(slots, expanded measures) -> form_data
+_Builder = Callable[[dict[str, Any], list[Any]], dict[str, Any]]
+
+# template name -> (viz_type, required slots, optional slots, builder, description)
+TEMPLATES: dict[str, tuple[str, tuple[str, ...], tuple[str, ...], _Builder, str]] = {
+    "line_over_time": (
+        "echarts_timeseries_line", ("time", "measures"), ("dimension", "time_grain"), _over_time,
+        "measures over time, one line per dimension value",
+    ),
+    "bar_over_time": (
+        "echarts_timeseries_bar", ("time", "measures"), ("dimension", "time_grain"), _over_time,
+        "measures per time bucket",
+    ),
+    "area_over_time": (
+        "echarts_area", ("time", "measures"), ("dimension", "time_grain"), _over_time,
+        "stacked/cumulative measures over time",
+    ),
+    "bar_by_category": (
+        "echarts_timeseries_bar", ("dimension", "measures"), ("series",), _by_category,
+        "compare measures across a categorical dimension",
+    ),
+    "pie_share": ("pie", ("dimension", "measure"), (), _single_metric_by, "part-to-whole share"),
+    "kpi_total": ("big_number_total", ("measure",), (), _kpi_total, "single KPI number"),
+    "kpi_trend": ("big_number", ("time", "measure"), ("time_grain",), _kpi_trend, "KPI with trend line"),
+    "table_summary": (
+        "table", ("dimensions", "measures"), (), _table_summary, "aggregated table grouped by dimensions",
+    ),
+    "table_rows": ("table", ("columns",), (), _table_rows, "raw rows for the given columns"),
+    "histogram": ("histogram", ("column",), ("dimension",), _histogram, "distribution of a numeric column"),
+    "heatmap": ("heatmap", ("x", "y", "measure"), (), _heatmap, "measure across two dimensions"),
+    "treemap": ("treemap_v2", ("dimensions", "measure"), (), _single_metric_by, "hierarchical proportions"),
+    "funnel": ("funnel", ("dimension", "measure"), (), _single_metric_by, "conversion through stages"),
+    "box_plot": (
+        "echarts_box_plot", ("dimension", "measures"), ("series",), _box_plot, "distribution per dimension value",
+    ),
+}
+
+
+def template_catalogue() -> str:
+    """Compact one-line-per-template summary for the tool description."""
+    lines = []
+    for name, (_, required, optional, _, description) in TEMPLATES.items():
+        opt = f" [{', '.join(optional)}]" if optional else ""
+        lines.append(f"{name}({', '.join(required)}){opt}: {description}")
+    return "; ".join(lines)
+
+
+def expand_template(
+    template: str,
+    slots: dict[str, Any],
+    saved_metrics: Collection[str] = (),
+) -> tuple[str, dict[str, Any]]:
+    """
+    Expand a template into ``(viz_type, form_data)``.
+
+    Measures naming one of ``saved_metrics`` (the dataset's saved metric
+    names) are used as that metric, even ``count``.
+
+    Raises:
+        ValueError: If the template is unknown, required slots are missing,
+            or ``time_range`` is given without the ``time`` column it filters.
+    """
+    if template not in TEMPLATES:
+        raise ValueError(f"Unknown template '{template}'. Available: {', '.join(TEMPLATES)}")
+    viz_type, required, _, build, _ = TEMPLATES[template]
+    # A single "measure" satisfies "measures" and vice versa
+    aliases = {"measures": "measure", "measure": "measures", "dimensions": "dimension"}
+    missing = [s for s in required if not slots.get(s) and not slots.get(aliases.get(s, ""))]
+    if missing:
+        raise ValueError(f"Template '{template}' requires slots: {', '.join(missing)}")
+    if slots.get("time_range") and not slots.get("time"):
+        raise ValueError("Slot 'time_range' needs the 'time' slot: the temporal column to filter on")
+    measures = [expand_measure(str(m), saved_metrics) for m in _as_list(slots.get("measures") or slots.get("measure"))]
+    form_data = build(slots, measures)
+    form_data.update(_common(slots))
+    return viz_type, form_data
+
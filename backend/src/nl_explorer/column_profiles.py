@@ -0,0 +1,273 @@
+"""
+Precomputed per-column profiles for datasets visible to NL Explorer users.
+
+A profile is a compact summary of a column computed from a random sample of
+``profile_sample_rows`` rows (``ORDER BY`` the engine's random function):
+top-K values, min/max, approximate distinct count and null fraction.
+Profiles are computed by a background job and stored in the NL Explorer cache,
+so ``get_dataset_schema`` can hand the LLM filter values and date ranges
+without an extra ``run_sql`` round.
+
+Row-level security applies: the job runs as the user who triggered it, adds
+that user's rendered RLS predicates to the sample query, and the cache key
+includes a hash of those predicates. Users with different RLS filters get
+different profiles; users without any share one.
+"""
+
+from __future__ import annotations
+
+import datetime
+import hashlib
+import logging
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from flask import current_app, g
+
+from nl_explorer import cache, sql_sampling
+
+logger = logging.getLogger(__name__)
+
+# Module-level import with fallback so tests can patch directly.
+try:
+    from superset.daos.dataset import DatasetDAO
+except ImportError:
+    DatasetDAO = None  # type: ignore[assignment,misc]
+
+try:
+    from superset import security_manager
+except ImportError:
+    security_manager = None  # type: ignore[assignment]
+
+DEFAULT_SAMPLE_ROWS = 10_000
+DEFAULT_TOP_K = 10
+DEFAULT_PROFILE_TTL = 24 * 60 * 60
+# Columns with more distinct values than this (in the sample) get no top-K list.
+MAX_TOP_K_CARDINALITY = 1_000
+# Top-K string values are truncated to keep profiles compact in the prompt.
+MAX_VALUE_LENGTH = 64
+
+_executor: ThreadPoolExecutor | None = None
+# (dataset id, username) of queued jobs
+_inflight: set[tuple[int, str]] = set()
+_lock = threading.Lock()
+
+
+def _cache_key(dataset_id: int, predicates: list[str]) -> str:
+    if not predicates:
+        return f"profile:{dataset_id}"
+    digest = hashlib.sha256("\n".join(predicates).encode("utf-8")).hexdigest()[:16]
+    return f"profile:{dataset_id}:rls:{digest}"
+
+
+def _rls_predicates(ds: Any) -> list[str]:
+    """
+    The current user's RLS filters on ``ds`` as rendered SQL predicates.
+
+    Filters sharing a group key are ORed, as in Superset; the returned
+    predicates are ANDed. Sorted, so equal filter sets give equal cache keys.
+    """
+    if security_manager is None:
+        return []
+    filters = security_manager.get_rls_filters(ds)
+    if not filters:
+        return []
+    processor = ds.get_template_processor()
+    groups: dict[str, list[str]] = {}
+    for rls in filters:
+        key = f"group:{rls.group_key}" if getattr(rls, "group_key", None) else f"id:{rls.id}"
+        groups.setdefault(key, []).append(f"({processor.process_template(rls.clause)})")
+    return sorted(
+        clauses[0] if len(clauses) == 1 else f"({' OR '.join(sorted(clauses))})" for clauses in groups.values()
+    )
+
+
+def _settings() -> dict[str, Any]:
+    cfg = current_app.config.get("NL_EXPLORER_CONFIG", {})
+    return {
+        "enabled": cfg.get("column_profiles", False),
+        "sample_rows": int(cfg.get("profile_sample_rows", DEFAULT_SAMPLE_ROWS)),
+        "top_k": int(cfg.get("profile_top_k", DEFAULT_TOP_K)),
+        "ttl": int(cfg.get("profile_cache_ttl", DEFAULT_PROFILE_TTL)),
+    }
+
+
+def get_profiles(dataset_id: int, predicates: list[str] | None = None) -> dict[str, dict[str, Any]] | None:
+    """Return cached column profiles for a dataset under the given RLS predicates, keyed by column name."""
+    return cache.get(_cache_key(dataset_id, predicates or []))
+
+
+def attach_profiles(dataset: dict[str, Any]) -> dict[str, Any]:
+    """
+    Add cached profiles to a serialized dataset from ``context_builder``.
+
+    When no profile is cached yet, a background profiling job is scheduled
+    and the dataset is returned unchanged.
+    """
+    if not _settings()["enabled"] or not dataset.get("id"):
+        return dataset
+    try:
+        ds = DatasetDAO.find_by_id(dataset["id"])
+        if ds is None:
+            return dataset
+        predicates = _rls_predicates(ds)
+    except Exception:  # noqa: BLE001
+        logger.exception("Could not resolve RLS filters of dataset %s; not attaching profiles", dataset["id"])
+        return dataset
+    profiles = get_profiles(dataset["id"], predicates)
+    if profiles is None:
+        schedule_profiling([dataset["id"]])
+        return dataset
+    # Build a new dict: the input may be a cached schema shared across requests
+    return {
+        **dataset,
+        "columns": [
+            {**col, "profile": profiles[col["name"]]} if col["name"] in profiles else col
+            for col in dataset.get("columns", [])
+        ],
+    }
+
+
+def schedule_profiling(dataset_ids: list[int]) -> None:
+    """
+    Queue background profiling of datasets for the current user.
+
+    The job runs as this user so that their RLS filters apply; datasets whose
+    profile is already cached for those filters are skipped by the job.
+    """
+    settings = _settings()
+    if not settings["enabled"]:
+        return
+    app = current_app._get_current_object()  # type: ignore[attr-defined]
+    user = getattr(g, "user", None)
+    username = getattr(user, "username", None) or ""
+
+    global _executor
+    with _lock:
+        pending = [i for i in dataset_ids if (i, username) not in _inflight]
+        if not pending:
+            return
+        _inflight.update((i, username) for i in pending)
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="nl-explorer-profiler")
+
+    for dataset_id in pending:
+        _executor.submit(_run_job, app, dataset_id, user, settings)
+
+
+def _run_job(app: Any, dataset_id: int, user: Any, settings: dict[str, Any]) -> None:
+    username = getattr(user, "username", None) or ""
+    try:
+        # A request context so RLS clauses and Jinja see the user as in a request
+        with app.test_request_context():
+            if user is not None:
+                g.user = user
+            # Access was checked when the job was scheduled
+            ds = DatasetDAO.find_by_id(dataset_id, skip_base_filter=True)
+            if ds is None:
+                return
+            predicates = _rls_predicates(ds)
+            key = _cache_key(dataset_id, predicates)
+            if cache.get(key) is not None:
+                return
+            profiles = profile_dataset(ds, settings["sample_rows"], settings["top_k"], predicates)
+            cache.set(key, profiles, timeout=settings["ttl"])
+            logger.info("Profiled %d columns of dataset %s", len(profiles), dataset_id)
+    except Exception:
+        logger.exception("Failed to profile dataset %s", dataset_id)
+    finally:
+        with _lock:
+            _inflight.discard((dataset_id, username))
+
+
+def profile_dataset(
+    ds: Any,
+    sample_rows: int = DEFAULT_SAMPLE_ROWS,
+    top_k: int = DEFAULT_TOP_K,
+    predicates: list[str] | None = None,
+) -> dict[str, Any]:
+    """
+    Profile each physical column from one query reading a random sample of rows.
+
+    Jinja in a virtual dataset's SQL is rendered with the dataset's template
+    processor, as Superset does for charts. ``predicates`` (rendered RLS
+    filters) are ANDed into the query.
+    """
+    col_names = [c.column_name for c in (ds.columns or []) if not getattr(c, "expression", None)]
+    if not col_names:
+        return {}
+
+    database = ds.database
+    quote = database.quote_identifier
+    if getattr(ds, "sql", None):
+        virtual_sql = ds.get_template_processor().process_template(ds.sql)
+        source = f"({virtual_sql.strip().rstrip(';')}) AS nl_profile_src"
+    else:
+        source = ".".join(quote(p) for p in (ds.schema, ds.table_name) if p)
+    where = f" WHERE {' AND '.join(predicates)}" if predicates else ""
+    shuffle = sql_sampling.random_order(getattr(database.db_engine_spec, "engine", ""))
+    sql = (
+        f"SELECT {', '.join(quote(c) for c in col_names)} FROM {source}{where} "
+        f"ORDER BY {shuffle} LIMIT {int(sample_rows)}"
+    )
+
+    df = database.get_df(sql, catalog=getattr(ds, "catalog", None), schema=ds.schema)
+    columns = list(df.columns)
+    rows = df.values.tolist()
+    return {
+        name: profile_values([row[idx] for row in rows], top_k=top_k)
+        for idx, name in enumerate(columns)
+    }
+
+
+def _is_null(value: Any) -> bool:
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+def _to_json(value: Any) -> Any:
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, (bool, int, float)):
+        return value
+    text = str(value)
+    return text if len(text) <= MAX_VALUE_LENGTH else text[: MAX_VALUE_LENGTH - 1] + "…"
+
+
+def profile_values(values: list[Any], top_k: int = DEFAULT_TOP_K) -> dict[str, Any]:
+    """
+    Summarise a list of sampled column values.
+
+    Returns a dict with ``null_fraction``, ``approx_distinct``, and, where
+    applicable, ``min``/``max`` and ``top_values`` (value/count pairs).
+    """
+    total = len(values)
+    non_null = [v for v in values if not _is_null(v)]
+    counts: dict[Any, int] = {}
+    for v in non_null:
+        key = v if isinstance(v, (str, int, float, bool, datetime.date)) else str(v)
+        counts[key] = counts.get(key, 0) + 1
+
+    profile: dict[str, Any] = {
+        "null_fraction": round(1 - len(non_null) / total, 4) if total else 0.0,
+        "approx_distinct": len(counts),
+        "sample_rows": total,
+    }
+
+    orderable = [
+        v for v in non_null
+        if isinstance(v, (int, float, datetime.date)) and not isinstance(v, bool)
+    ]
+    if orderable and len(orderable) == len(non_null):
+        try:
+            profile["min"] = _to_json(min(orderable))
+            profile["max"] = _to_json(max(orderable))
+        except TypeError:
+            pass
+
+    if counts and len(counts) <= MAX_TOP_K_CARDINALITY and len(counts) < len(non_null):
+        top = sorted(counts.items(), key=lambda kv: kv[1], reverse=True)[:top_k]
+        profile["top_values"] = [{"value": _to_json(v), "count": c} for v, c in top]
+
+    return profile
@@ -0,0 +1,96 @@
+"""
+Columnar query results.
+
+``ColumnarResult`` holds a result set column by column, built straight from a
+DataFrame (one ``tolist()`` per column, which converts a whole numpy column at
+once instead of boxing the frame into one object array) or from DB-API cursor
+rows. ``to_payload`` derives the JSON shape the LLM and ``/execute`` have
+always seen (``columns``, ``rows``, ``row_count``) with a single transpose.
+``to_arrow_stream`` encodes the result as an Arrow IPC stream for
+``/execute`` clients that send ``Accept: application/vnd.apache.arrow.stream``.
+That needs ``pyarrow``, which Superset installs. It is imported on first use
+only: ``llm_service`` imports this module in every worker at startup.
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import json
+from typing import Any, Sequence
+
+ARROW_STREAM_MIMETYPE = "application/vnd.apache.arrow.stream"
+
+
+def arrow_available() -> bool:
+    """True if pyarrow can be imported, without importing it."""
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+class ColumnarResult:
+    """A query result stored as one Python list per column."""
+
+    __slots__ = ("columns", "data", "row_count", "meta", "_frame")
+
+    def __init__(
+        self,
+        columns: list[str],
+        data: list[list[Any]],
+        row_count: int,
+        meta: dict[str, Any] | None = None,
+        frame: Any = None,
+    ) -> None:
+        self.columns = columns
+        self.data = data
+        self.row_count = row_count
+        self.meta = meta or {}
+        self._frame = frame
+
+    @classmethod
+    def from_dataframe(cls, df: Any, limit: int, meta: dict[str, Any] | None = None) -> ColumnarResult:
+        """Take the first ``limit`` rows of a DataFrame; ``row_count`` is the full length."""
+        head = df.head(limit)
+        columns = [str(c) for c in df.columns]
+        data = [head.iloc[:, i].tolist() for i in range(len(columns))]
+        return cls(columns, data, len(df), meta, frame=head)
+
+    @classmethod
+    def from_rows(
+        cls,
+        columns: list[str],
+        rows: Sequence[Sequence[Any]],
+        row_count: int | None = None,
+        meta: dict[str, Any] | None = None,
+    ) -> ColumnarResult:
+        """Build from DB-API rows, e.g. ``cursor.fetchmany(limit)``."""
+        data = [list(col) for col in zip(*rows)] if rows else [[] for _ in columns]
+        return cls(list(columns), data, len(rows) if row_count is None else row_count, meta)
+
+    def rows(self) -> list[tuple[Any, ...]]:
+        return list(zip(*self.data)) if self.data else []
+
+    def to_payload(self) -> dict[str, Any]:
+        """The row-oriented JSON shape returned by ``run_sql``."""
+        return {"columns": self.columns, "rows": self.rows(), "row_count": self.row_count, **self.meta}
+
+    def to_arrow_stream(self) -> bytes:
+        """Encode as an Arrow IPC stream; ``row_count`` and metadata go into the schema metadata."""
+        try:
+            import pyarrow
+            import pyarrow.ipc
+        except ImportError as exc:
+            raise RuntimeError("pyarrow is required for Arrow responses") from exc
+        if self._frame is not None:
+            table = pyarrow.Table.from_pandas(self._frame, preserve_index=False)
+        else:
+            table = pyarrow.table(dict(zip(self.columns, self.data)))
+        metadata = {"row_count": str(self.row_count), **{k: json.dumps(v) for k, v in self.meta.items()}}
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), **metadata})
+        sink = pyarrow.BufferOutputStream()
+        with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+
+def as_payload(result: Any) -> Any:
+    """Return the JSON-ready form of a tool result."""
+    return result.to_payload() if isinstance(result, ColumnarResult) else result
@@ -5,9 +5,16 @@ visible to the currently authenticated user.
 
 from __future__ import annotations
 
+import fnmatch
+import hashlib
+import json
 import logging
 from typing import Any
 
+from flask import current_app, has_app_context
+
+from nl_explorer import cache
+
 logger = logging.getLogger(__name__)
 
 # Lazy import with fallback so the module can be imported without Superset installed.
@@ -17,17 +24,43 @@ try:
 except ImportError:
     DatasetDAO = None  # type: ignore[assignment,misc]
 
+try:
+    from superset.daos.dashboard import DashboardDAO
+except ImportError:
+    DashboardDAO = None  # type: ignore[assignment,misc]
+
+try:
+    from superset.connectors.sqla.models import SqlaTable
+    from superset.extensions import db
+    from superset.models.dashboard import dashboard_slices
+    from superset.models.slice import Slice
+except ImportError:
+    SqlaTable = db = dashboard_slices = Slice = None  # type: ignore[assignment,misc]
+
 # Maximum number of datasets to include in the LLM context window.
 # Operators can override via NL_EXPLORER_CONFIG["max_datasets_in_context"].
 DEFAULT_MAX_DATASETS = 20
 # Maximum columns per dataset included in context.
 DEFAULT_MAX_COLUMNS = 50
+# Maximum columns returned by the get_dataset_schema tool.
+SCHEMA_MAX_COLUMNS = 200
+# How long serialized dataset schemas are cached. Keys include the dataset's
+# changed_on, so edits are picked up immediately.
+DEFAULT_SCHEMA_CACHE_TTL = 600
+# How long catalogue snapshots are kept for ``since=<version>`` delta requests.
+CATALOGUE_SNAPSHOT_TTL = 24 * 60 * 60
+# How long a user's last catalogue version answers ``If-None-Match`` without
+# rebuilding the catalogue. Operators can override via
+# NL_EXPLORER_CONFIG["context_version_ttl"].
+DEFAULT_CATALOGUE_VERSION_TTL = 60
 
 
 def get_user_context(
     dataset_id: int | None = None,
     max_datasets: int = DEFAULT_MAX_DATASETS,
     max_columns: int = DEFAULT_MAX_COLUMNS,
+    dashboard_id: int | None = None,
+    allowed_schemas: list[str] | None = None,
 ) -> dict[str, Any]:
     """
     Return a structured context dict describing datasets available to the
@@ -38,16 +71,38 @@ def get_user_context(
             Explore/Dashboard panel context).
         max_datasets: Maximum number of datasets to include.
         max_columns: Maximum columns per dataset.
+        dashboard_id: If provided (and ``dataset_id`` is not), include every
+            dataset used by this dashboard's charts, with their metrics.
+            Falls back to the generic list if the dashboard yields nothing.
+        allowed_schemas: Optional org-level schema allow list (exact names,
+            from ``page_context["org"]["allowed_schemas"]``). Combined with the
+            ``schema_allowlist``/``schema_denylist`` globs in NL_EXPLORER_CONFIG
+            and applied in the dataset query, so excluded datasets are never
+            loaded.
 
     Returns:
         Dict with "datasets" key containing summarised dataset info.
     """
+    rules = _schema_rules(allowed_schemas)
+    include_metrics = False
     try:
         if dataset_id is not None:
-            datasets = DatasetDAO.find_by_ids([dataset_id])
+            datasets = [
+                ds for ds in DatasetDAO.find_by_ids([dataset_id])
+                if _schema_allowed(getattr(ds, "schema", None), rules)
+            ]
         else:
-            # Fetch all datasets; DatasetDAO respects current user's permissions
-            datasets = DatasetDAO.find_all()[:max_datasets]
+            datasets = []
+            if dashboard_id is not None:
+                datasets = _find_dashboard_datasets(dashboard_id, max_datasets, rules)
+                include_metrics = True
+            if not datasets:
+                include_metrics = False
+                if any(rules.values()):
+                    datasets = _find_datasets(max_datasets, rules)
+                else:
+                    # Fetch all datasets; DatasetDAO respects current user's permissions
+                    datasets = DatasetDAO.find_all()[:max_datasets]
     except Exception:
         logger.exception("Failed to fetch datasets for NL Explorer context")
         return {"datasets": []}
@@ -55,24 +110,250 @@ def get_user_context(
     result = []
     for ds in datasets:
         try:
-            columns = []
-            for col in (ds.columns or [])[:max_columns]:
-                columns.append(
-                    {
-                        "name": col.column_name,
-                        "type": str(col.type) if col.type else "unknown",
-                        "description": col.description or None,
-                    }
-                )
-            result.append(
-                {
-                    "id": ds.id,
-                    "name": ds.table_name,
-                    "description": getattr(ds, "description", None),
-                    "columns": columns,
-                }
-            )
+            result.append(_serialize_dataset(ds, max_columns, include_metrics=include_metrics))
         except Exception:
             logger.exception("Failed to serialize dataset %s for context", getattr(ds, "id", "?"))
 
     return {"datasets": result}
+
+
+def _serialize_dataset(ds: Any, max_columns: int | None, include_metrics: bool = False) -> dict[str, Any]:
+    """Summarise one SqlaTable for the LLM context."""
+    columns = []
+    for col in (ds.columns or [])[:max_columns]:
+        column = {
+            "name": col.column_name,
+            "type": str(col.type) if col.type else "unknown",
+            "description": col.description or None,
+        }
+        # Calculated columns carry a SQL expression the chart can reference by name
+        expression = getattr(col, "expression", None)
+        if isinstance(expression, str) and expression:
+            column["expression"] = expression
+        columns.append(column)
+    serialized = {
+        "id": ds.id,
+        "name": ds.table_name,
+        "description": getattr(ds, "description", None),
+        "columns": columns,
+    }
+    if include_metrics:
+        serialized["metrics"] = [
+            {
+                "name": m.metric_name,
+                "expression": m.expression,
+                "description": m.description or None,
+            }
+            for m in (ds.metrics or [])
+        ]
+    return serialized
+
+
+def get_dataset_schema(
+    dataset_id: int,
+    max_columns: int | None = SCHEMA_MAX_COLUMNS,
+    allowed_schemas: list[str] | None = None,
+) -> dict[str, Any]:
+    """
+    Return the full schema of one dataset: columns (including calculated
+    column expressions) and saved metric definitions.
+
+    Access is checked with a single-row DAO lookup on every call. The
+    serialized schema is cached, keyed by the dataset's ``changed_on``; on a
+    miss columns and metrics are loaded in one batched query.
+
+    ``max_columns=None`` returns every column.
+
+    Returns:
+        Serialized dataset dict, or an empty dict if it is not accessible.
+    """
+    try:
+        ds = DatasetDAO.find_by_id(dataset_id)
+    except Exception:
+        logger.exception("Failed to fetch dataset %s for NL Explorer schema", dataset_id)
+        return {}
+    if ds is None or not _schema_allowed(getattr(ds, "schema", None), _schema_rules(allowed_schemas)):
+        return {}
+
+    changed_on = getattr(ds, "changed_on", None)
+    version = changed_on.isoformat() if hasattr(changed_on, "isoformat") else "0"
+    key = f"schema:{dataset_id}:{version}:{max_columns}"
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    loaded = _load_datasets_with_schema([dataset_id])
+    serialized = _serialize_dataset(loaded[0] if loaded else ds, max_columns, include_metrics=True)
+    cfg = current_app.config.get("NL_EXPLORER_CONFIG", {}) if has_app_context() else {}
+    cache.set(key, serialized, timeout=int(cfg.get("schema_cache_ttl", DEFAULT_SCHEMA_CACHE_TTL)))
+    return serialized
+
+
+def _load_datasets_with_schema(dataset_ids: list[int]) -> list[Any]:
+    """Load datasets with their columns and metrics eager-loaded in one batch."""
+    from sqlalchemy.orm import selectinload
+
+    return (
+        db.session.query(SqlaTable)
+        .filter(SqlaTable.id.in_(dataset_ids))
+        .options(selectinload(SqlaTable.columns), selectinload(SqlaTable.metrics))
+        .all()
+    )
+
+
+def _schema_rules(allowed_schemas: list[str] | None) -> dict[str, list[str]]:
+    """Collect the schema restrictions that apply to the current request."""
+    cfg = current_app.config.get("NL_EXPLORER_CONFIG", {}) if has_app_context() else {}
+    return {
+        "allowed": [str(s) for s in allowed_schemas or []],
+        "allow_globs": [str(g) for g in cfg.get("schema_allowlist") or []],
+        "deny_globs": [str(g) for g in cfg.get("schema_denylist") or []],
+    }
+
+
+def _schema_allowed(schema: str | None, rules: dict[str, list[str]]) -> bool:
+    """Python equivalent of ``_schema_clause`` for an already-loaded dataset."""
+    if rules["allowed"] and schema not in rules["allowed"]:
+        return False
+    if rules["allow_globs"] and not (
+        schema is not None and any(fnmatch.fnmatchcase(schema, g) for g in rules["allow_globs"])
+    ):
+        return False
+    if schema is not None and any(fnmatch.fnmatchcase(schema, g) for g in rules["deny_globs"]):
+        return False
+    return True
+
+
+def _glob_to_like(pattern: str) -> str:
+    """Translate a shell-style glob (``*``, ``?``) into a LIKE pattern escaped with ``\\``."""
+    escaped = pattern.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return escaped.replace("*", "%").replace("?", "_")
+
+
+def _schema_clause(rules: dict[str, list[str]]) -> Any:
+    """Build a SQL filter on ``SqlaTable.schema`` from the schema rules."""
+    from sqlalchemy import and_, not_, or_
+
+    clauses = []
+    if rules["allowed"]:
+        clauses.append(SqlaTable.schema.in_(rules["allowed"]))
+    if rules["allow_globs"]:
+        clauses.append(
+            or_(*[SqlaTable.schema.like(_glob_to_like(g), escape="\\") for g in rules["allow_globs"]])
+        )
+    for glob in rules["deny_globs"]:
+        clauses.append(
+            or_(SqlaTable.schema.is_(None), not_(SqlaTable.schema.like(_glob_to_like(glob), escape="\\")))
+        )
+    return and_(*clauses)
+
+
+def _find_datasets(max_datasets: int, rules: dict[str, list[str]]) -> list[Any]:
+    """Load up to ``max_datasets`` permitted datasets whose schema passes the rules."""
+    query = db.session.query(SqlaTable).filter(_schema_clause(rules))
+    query = _apply_dataset_base_filter(query)
+    return query.order_by(SqlaTable.id).limit(max_datasets).all()
+
+
+def _apply_dataset_base_filter(query: Any) -> Any:
+    """Apply DatasetDAO's permission filter to a hand-built SqlaTable query."""
+    from flask_appbuilder.models.sqla.interface import SQLAInterface
+
+    if DatasetDAO.base_filter:
+        data_model = SQLAInterface(SqlaTable, db.session)
+        query = DatasetDAO.base_filter("id", data_model).apply(query, None)
+    return query
+
+
+def _find_dashboard_datasets(
+    dashboard_id: int,
+    max_datasets: int = DEFAULT_MAX_DATASETS,
+    rules: dict[str, list[str]] | None = None,
+) -> list[Any]:
+    """
+    Load up to ``max_datasets`` datasets used by a dashboard's charts in one batched query.
+
+    Columns and metrics are eager-loaded so serializing them does not issue a
+    query per dataset. Nothing is returned unless the current user can access
+    the dashboard (DashboardDAO's base filter), and only datasets they can
+    access are included.
+    """
+    from sqlalchemy.orm import selectinload
+
+    if DashboardDAO.find_by_id(dashboard_id) is None:
+        return []
+    query = (
+        db.session.query(SqlaTable)
+        .join(Slice, (Slice.datasource_id == SqlaTable.id) & (Slice.datasource_type == "table"))
+        .join(dashboard_slices, dashboard_slices.c.slice_id == Slice.id)
+        .filter(dashboard_slices.c.dashboard_id == dashboard_id)
+        .options(selectinload(SqlaTable.columns), selectinload(SqlaTable.metrics))
+        .distinct()
+    )
+    if rules and any(rules.values()):
+        query = query.filter(_schema_clause(rules))
+    return _apply_dataset_base_filter(query).order_by(SqlaTable.id).limit(max_datasets).all()
+
+
+def dataset_fingerprint(dataset: dict[str, Any]) -> str:
+    """Return a stable content hash of one serialized dataset."""
+    raw = json.dumps(dataset, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()  # noqa: S324
+
+
+def catalogue_snapshot(datasets: list[dict[str, Any]]) -> tuple[str, dict[int, str]]:
+    """
+    Fingerprint a serialized catalogue.
+
+    Returns ``(version, fingerprints)`` where ``fingerprints`` maps dataset ID
+    to its content hash and ``version`` is a hash over all of them. The
+    snapshot is cached under its version so later requests can diff against it.
+    """
+    fingerprints = {ds["id"]: dataset_fingerprint(ds) for ds in datasets}
+    raw = json.dumps(sorted(fingerprints.items()))
+    version = hashlib.sha1(raw.encode("utf-8")).hexdigest()[:20]  # noqa: S324
+    # Versions are content hashes, so an existing snapshot never needs rewriting
+    if cache.get(f"catalogue:{version}") is None:
+        cache.set(f"catalogue:{version}", fingerprints, timeout=CATALOGUE_SNAPSHOT_TTL)
+    return version, fingerprints
+
+
+def _catalogue_version_key(user_id: Any, max_datasets: int) -> str:
+    return f"catalogue_version:{user_id}:{max_datasets}"
+
+
+def cached_catalogue_version(user_id: Any, max_datasets: int) -> str | None:
+    """Return the catalogue version last served to ``user_id``, if still cached."""
+    return cache.get(_catalogue_version_key(user_id, max_datasets))
+
+
+def remember_catalogue_version(user_id: Any, max_datasets: int, version: str, timeout: int) -> None:
+    """Cache the catalogue version served to ``user_id`` for ``timeout`` seconds."""
+    key = _catalogue_version_key(user_id, max_datasets)
+    if cache.get(key) != version:
+        cache.set(key, version, timeout=timeout)
+
+
+def catalogue_delta(
+    datasets: list[dict[str, Any]],
+    fingerprints: dict[int, str],
+    since: str,
+) -> dict[str, Any] | None:
+    """
+    Diff the current catalogue against the snapshot stored for ``since``.
+
+    Returns a dict with "added", "changed" (serialized datasets) and "removed"
+    (dataset IDs), or None if the ``since`` snapshot is unknown or expired.
+    """
+    previous = cache.get(f"catalogue:{since}")
+    if previous is None:
+        return None
+    # Cache backends that serialize to JSON turn integer keys into strings.
+    previous = {int(k): v for k, v in previous.items()}
+    added = [ds for ds in datasets if ds["id"] not in previous]
+    changed = [
+        ds for ds in datasets
+        if ds["id"] in previous and previous[ds["id"]] != fingerprints[ds["id"]]
+    ]
+    removed = sorted(ds_id for ds_id in previous if ds_id not in fingerprints)
+    return {"added": added, "changed": changed, "removed": removed}
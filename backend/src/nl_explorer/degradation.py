@@ -0,0 +1,198 @@
+"""
+Load-adaptive degradation of per-turn context and tool budgets.
+
+Under pressure every chat turn still sends the full dataset catalogue and may
+run five tool rounds against a slow model, so latency compounds until turns
+time out. The controller watches two live signals in this worker:
+
+- the p95 (configurable) of LLM round latencies over the last
+  ``window_seconds`` (time to first chunk for streams), and
+- the admission queue depth (turns waiting for a slot).
+
+When either crosses its high-water mark it steps down one level of a ladder of
+cheaper settings: fewer datasets, fewer columns per dataset, fewer tool
+rounds, optionally a smaller model. When both are back under their low-water
+marks it steps back up. Steps are at least ``step_interval`` seconds apart so
+a level has time to take effect before the next decision.
+
+Level 0 is the configured behaviour. Each ladder entry overrides some of
+``max_datasets``, ``max_columns``, ``max_tool_rounds`` and ``model``; later
+entries should be cheaper than earlier ones. Like admission control, state is
+per worker process.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any
+
+from flask import current_app
+
+from nl_explorer import admission, context_builder, metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_COLUMNS = 20
+DEFAULT_MAX_TOOL_ROUNDS = 5
+
+DEFAULTS: dict[str, Any] = {
+    "ladder": [
+        {"max_datasets": 10, "max_columns": 12},
+        {"max_datasets": 5, "max_columns": 8, "max_tool_rounds": 3},
+        {"max_datasets": 3, "max_columns": 5, "max_tool_rounds": 2},
+    ],
+    "percentile": 95,
+    "latency_high": 15.0,
+    "latency_low": 6.0,
+    "queue_high": 8,
+    "queue_low": 0,
+    "window_seconds": 60.0,
+    "step_interval": 30.0,
+}
+
+
+def base_settings(cfg: dict[str, Any]) -> dict[str, Any]:
+    """The undegraded (level 0) settings from ``NL_EXPLORER_CONFIG``."""
+    return {
+        "max_datasets": cfg.get("max_datasets_in_context", context_builder.DEFAULT_MAX_DATASETS),
+        "max_columns": cfg.get("max_columns_in_context", DEFAULT_MAX_COLUMNS),
+        "max_tool_rounds": cfg.get("max_tool_rounds", DEFAULT_MAX_TOOL_ROUNDS),
+        "model": None,
+    }
+
+
+class DegradationController:
+    """Steps along the ladder from recent LLM latency and admission queue depth."""
+
+    def __init__(
+        self,
+        ladder: list[dict[str, Any]] = DEFAULTS["ladder"],
+        percentile: float = DEFAULTS["percentile"],
+        latency_high: float = DEFAULTS["latency_high"],
+        latency_low: float = DEFAULTS["latency_low"],
+        queue_high: int = DEFAULTS["queue_high"],
+        queue_low: int = DEFAULTS["queue_low"],
+        window_seconds: float = DEFAULTS["window_seconds"],
+        step_interval: float = DEFAULTS["step_interval"],
+    ) -> None:
+        self.ladder = list(ladder)
+        self.percentile = percentile
+        self.latency_high = latency_high
+        self.latency_low = latency_low
+        self.queue_high = queue_high
+        self.queue_low = queue_low
+        self.window_seconds = window_seconds
+        self.step_interval = step_interval
+        self.level = 0
+        self._changed_at = float("-inf")
+        self._latencies: deque[tuple[float, float]] = deque()
+        self._lock = threading.Lock()
+
+    def _expire(self, now: float) -> None:
+        while self._latencies and self._latencies[0][0] < now - self.window_seconds:
+            self._latencies.popleft()
+
+    def record_latency(self, seconds: float) -> None:
+        """Record the latency of one LLM round."""
+        now = time.monotonic()
+        with self._lock:
+            self._latencies.append((now, seconds))
+            self._expire(now)
+
+    def latency(self) -> float | None:
+        """Percentile of the LLM round latencies in the window, or None without samples."""
+        with self._lock:
+            self._expire(time.monotonic())
+            values = sorted(v for _, v in self._latencies)
+        if not values:
+            return None
+        return values[min(len(values) - 1, int(len(values) * self.percentile / 100))]
+
+    def update(self, queued: int) -> int:
+        """Re-evaluate the level given the current admission queue depth and return it."""
+        latency = self.latency()
+        now = time.monotonic()
+        with self._lock:
+            if now - self._changed_at < self.step_interval:
+                return self.level
+            pressure = queued >= self.queue_high or (latency is not None and latency >= self.latency_high)
+            calm = queued <= self.queue_low and (latency is None or latency < self.latency_low)
+            if pressure and self.level < len(self.ladder):
+                step = 1
+            elif calm and self.level > 0:
+                step = -1
+            else:
+                return self.level
+            self.level += step
+            self._changed_at = now
+            level = self.level
+        metrics.inc("nl_explorer_degradation_steps_total", direction="down" if step > 0 else "up")
+        logger.warning(
+            "NL Explorer degradation level %d (p%s latency %s, queued %d)",
+            level,
+            self.percentile,
+            f"{latency:.1f}s" if latency is not None else "n/a",
+            queued,
+        )
+        return level
+
+    def settings(self, base: dict[str, Any], level: int | None = None) -> dict[str, Any]:
+        """Apply the overrides of all ladder entries up to ``level`` on top of ``base``."""
+        level = self.level if level is None else level
+        merged = dict(base)
+        for entry in self.ladder[:level]:
+            merged.update(entry)
+        # A degraded level never widens the configured budgets
+        for key in ("max_datasets", "max_columns", "max_tool_rounds"):
+            merged[key] = min(merged[key], base[key])
+        return merged
+
+
+_controller: DegradationController | None = None
+_controller_settings: dict[str, Any] | None = None
+_lock = threading.Lock()
+
+
+def get_controller() -> DegradationController | None:
+    """
+    Return the process-wide controller built from ``NL_EXPLORER_CONFIG["degradation"]``.
+
+    Returns None when degradation is not configured (the default).
+    """
+    global _controller, _controller_settings
+    raw = current_app.config.get("NL_EXPLORER_CONFIG", {}).get("degradation")
+    if raw is None or raw is False:
+        return None
+    settings = {**DEFAULTS, **(raw if isinstance(raw, dict) else {})}
+    with _lock:
+        if _controller is None or settings != _controller_settings:
+            _controller = DegradationController(**settings)
+            _controller_settings = settings
+        return _controller
+
+
+def record_latency(seconds: float) -> None:
+    """Feed an LLM round latency to the controller, if degradation is enabled."""
+    controller = get_controller()
+    if controller is not None:
+        controller.record_latency(seconds)
+
+
+def current_settings(cfg: dict[str, Any]) -> dict[str, Any]:
+    """
+    Return the budgets for a new chat turn.
+
+    Keys: ``max_datasets``, ``max_columns``, ``max_tool_rounds``, ``model``
+    (None for the configured providers) and ``level``.
+    """
+    base = base_settings(cfg)
+    controller = get_controller()
+    if controller is None:
+        return {**base, "level": 0}
+    admission_controller = admission.get_controller()
+    queued = admission_controller.snapshot()["queued"] if admission_controller is not None else 0
+    level = controller.update(queued)
+    return {**controller.settings(base, level), "level": level}
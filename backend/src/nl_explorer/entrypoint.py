@@ -33,6 +33,10 @@ def register(app) -> None:  # type: ignore[type-arg]
     """Register the NL Explorer blueprint and REST API with a Flask app."""
     _inject_template_loader(app)
 
+    from nl_explorer import metrics
+
+    metrics.configure(app.config.get("NL_EXPLORER_CONFIG", {}).get("metrics_dir"))
+
     try:
         from nl_explorer.blueprint import create_blueprint
 
@@ -52,3 +56,9 @@ def register(app) -> None:  # type: ignore[type-arg]
     except Exception:
         logger.exception("Failed to register NL Explorer REST API")
         raise
+
+    if app.config.get("NL_EXPLORER_CONFIG", {}).get("preload_llm", False):
+        from nl_explorer import llm_service
+
+        llm_service.preload()
+        logger.info("NL Explorer preloaded LLM dependencies")
@@ -0,0 +1,163 @@
+"""
+Local validation of LLM-generated chart ``form_data``.
+
+Checks a chart configuration against the per-``viz_type`` required fields
+and against the dataset schema from ``context_builder.get_dataset_schema``
+(columns, calculated columns and saved metrics) before a preview link or a
+saved chart is produced. Errors are returned to the model within the same
+tool round, instead of surfacing when the user opens Explore.
+"""
+
+from __future__ import annotations
+
+import difflib
+from typing import Any
+
+# Fields that reference dataset columns (a name, an adhoc column, or a list of them).
+COLUMN_FIELDS = (
+    "x_axis",
+    "groupby",
+    "columns",
+    "all_columns",
+    "all_columns_x",
+    "all_columns_y",
+    "granularity_sqla",
+    "column",
+    "series",
+    "entity",
+)
+# Fields that reference metrics (a saved metric name, an adhoc metric, or a list of them).
+METRIC_FIELDS = (
+    "metrics",
+    "metric",
+    "percent_metrics",
+    "timeseries_limit_metric",
+    "secondary_metric",
+    "x",
+    "y",
+    "size",
+)
+
+SIMPLE_AGGREGATES = {"SUM", "AVG", "COUNT", "COUNT_DISTINCT", "MIN", "MAX"}
+
+# Required fields per viz_type in CHART_TYPE_GUIDE. Each entry is a tuple of
+# alternative field names; at least one of them must be set.
+VIZ_REQUIREMENTS: dict[str, list[tuple[str, ...]]] = {
+    "echarts_timeseries_line": [("metrics",), ("x_axis", "granularity_sqla")],
+    "echarts_timeseries_bar": [("metrics",), ("x_axis", "granularity_sqla")],
+    "echarts_area": [("metrics",), ("x_axis", "granularity_sqla")],
+    "table": [("metrics", "groupby", "all_columns")],
+    "pie": [("metric",), ("groupby",)],
+    "scatter": [("metrics",), ("x_axis", "granularity_sqla")],
+    "echarts_box_plot": [("metrics",), ("columns",)],
+    "big_number_total": [("metric",)],
+    "big_number": [("metric",), ("x_axis", "granularity_sqla")],
+    "histogram": [("column", "all_columns_x")],
+    "heatmap": [("metric",), ("x_axis", "all_columns_x"), ("groupby", "all_columns_y")],
+    "treemap_v2": [("metric",), ("groupby",)],
+    "funnel": [("metric",), ("groupby",)],
+}
+
+
+def _is_set(value: Any) -> bool:
+    return value not in (None, "", [], {})
+
+
+def _as_list(value: Any) -> list[Any]:
+    return value if isinstance(value, list) else [value]
+
+
+def _unknown(kind: str, name: str, known: list[str]) -> str:
+    message = f"Unknown {kind} '{name}'."
+    close = difflib.get_close_matches(name, known, n=3)
+    if close:
+        message += f" Did you mean: {', '.join(close)}?"
+    return message
+
+
+def validate_form_data(
+    viz_type: str,
+    form_data: dict[str, Any],
+    schema: dict[str, Any],
+) -> list[dict[str, str]]:
+    """
+    Validate a chart configuration.
+
+    Args:
+        viz_type: Superset visualisation type.
+        form_data: Chart form_data as produced by the LLM.
+        schema: Serialized dataset from ``context_builder.get_dataset_schema``.
+
+    Returns:
+        List of ``{"field": ..., "message": ...}`` errors; empty when valid.
+    """
+    errors: list[dict[str, str]] = []
+    if not isinstance(form_data, dict):
+        return [{"field": "form_data", "message": "form_data must be a JSON object."}]
+
+    for alternatives in VIZ_REQUIREMENTS.get(viz_type, []):
+        if not any(_is_set(form_data.get(f)) for f in alternatives):
+            errors.append({
+                "field": alternatives[0],
+                "message": f"'{' or '.join(alternatives)}' is required for viz_type '{viz_type}'.",
+            })
+
+    column_names = [c["name"] for c in schema.get("columns", [])]
+    metric_names = [m["name"] for m in schema.get("metrics", [])]
+    known_columns = set(column_names)
+
+    for field in COLUMN_FIELDS:
+        if not _is_set(form_data.get(field)):
+            continue
+        for idx, col in enumerate(_as_list(form_data[field])):
+            # Adhoc columns (dicts with sqlExpression) are free-form SQL; skip them
+            if isinstance(col, str) and col not in known_columns:
+                path = field if not isinstance(form_data[field], list) else f"{field}[{idx}]"
+                errors.append({"field": path, "message": _unknown("column", col, column_names)})
+
+    for field in METRIC_FIELDS:
+        if not _is_set(form_data.get(field)):
+            continue
+        for idx, metric in enumerate(_as_list(form_data[field])):
+            path = field if not isinstance(form_data[field], list) else f"{field}[{idx}]"
+            message = _check_metric(metric, metric_names, column_names)
+            if message:
+                errors.append({"field": path, "message": message})
+
+    for idx, flt in enumerate(form_data.get("adhoc_filters") or []):
+        if isinstance(flt, dict) and flt.get("expressionType", "SIMPLE") == "SIMPLE":
+            subject = flt.get("subject")
+            if not subject or subject not in known_columns:
+                errors.append({
+                    "field": f"adhoc_filters[{idx}].subject",
+                    "message": _unknown("column", str(subject), column_names),
+                })
+            if not flt.get("operator"):
+                errors.append({"field": f"adhoc_filters[{idx}].operator", "message": "Filter operator is required."})
+
+    return errors
+
+
+def _check_metric(metric: Any, metric_names: list[str], column_names: list[str]) -> str | None:
+    """Return an error message for one metric reference, or None if it is valid."""
+    if isinstance(metric, str):
+        if metric in metric_names:
+            return None
+        hint = " Use a saved metric name or an adhoc metric object." if not metric_names else ""
+        return _unknown("saved metric", metric, metric_names) + hint
+    if not isinstance(metric, dict):
+        return "Metric must be a saved metric name or an adhoc metric object."
+
+    expression_type = metric.get("expressionType", "SIMPLE")
+    if expression_type == "SQL":
+        return None if metric.get("sqlExpression") else "Adhoc SQL metric needs a 'sqlExpression'."
+    column = metric.get("column") or {}
+    column_name = column.get("column_name") if isinstance(column, dict) else column
+    if not column_name or column_name not in column_names:
+        return _unknown("column", str(column_name), column_names)
+    if str(metric.get("aggregate", "")).upper() not in SIMPLE_AGGREGATES:
+        return (
+            f"Unsupported aggregate '{metric.get('aggregate')}'. "
+            f"Use one of: {', '.join(sorted(SIMPLE_AGGREGATES))}."
+        )
+    return None
@@ -0,0 +1,191 @@
+"""
+Deterministic fast path for simple chat requests.
+
+Recognises a few high-frequency intents with anchored regular expressions
+and a local lookup over the user's dataset names:
+
+- "what datasets do I have"        -> list_datasets
+- "show me the columns of orders"  -> get_dataset_schema
+- "open orders in explore"         -> Explore link for the dataset
+
+Matched requests are answered by calling ``llm_service.dispatch_tool_call``
+directly and formatting the result, without an LLM round. Anything that does
+not match exactly (or names an ambiguous dataset) returns None and goes to
+the LLM as usual. Hits and misses are counted in ``metrics``
+(``nl_explorer_fast_path_total`` by intent, ``nl_explorer_fast_path_misses_total``)
+and per process, see ``stats()``.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import re
+import threading
+from typing import Any
+
+from flask import current_app
+
+from nl_explorer import context_builder, llm_service, metrics
+
+logger = logging.getLogger(__name__)
+
+# Log the hit rate every this many routed-or-missed requests.
+STATS_LOG_INTERVAL = 100
+# Maximum columns/datasets listed in a fast-path answer.
+MAX_LISTED = 50
+
+_DS = r"(?:the\s+)?(?P<name>[\w.\- ]+?)(?:\s+(?:dataset|table))?"
+_PATTERNS: list[tuple[str, re.Pattern[str]]] = [
+    ("list_datasets", re.compile(
+        r"^(?:what|which)\s+(?:datasets|data\s*sets|tables)\s+"
+        r"(?:do\s+i\s+have|are\s+(?:there|available)|can\s+i\s+(?:use|see|access))"
+        r"(?:\s+access\s+to)?$"
+    )),
+    ("list_datasets", re.compile(r"^(?:list|show)(?:\s+me)?(?:\s+(?:all|my|the))?\s+(?:datasets|tables)$")),
+    ("dataset_schema", re.compile(
+        rf"^(?:show(?:\s+me)?|list|what\s+are)\s+(?:the\s+)?(?:columns|fields|schema)\s+(?:of|in|for)\s+{_DS}$"
+    )),
+    ("dataset_schema", re.compile(rf"^describe\s+{_DS}$")),
+    ("open_explore", re.compile(rf"^(?:open|explore|show)\s+{_DS}\s+in\s+explore$")),
+    ("open_explore", re.compile(rf"^explore\s+{_DS}$")),
+]
+
+_lock = threading.Lock()
+_stats: dict[str, Any] = {"requests": 0, "hits": {}}
+
+
+def _normalise(text: str) -> str:
+    text = re.sub(r"[?!.]+$", "", text.strip().lower())
+    text = re.sub(r"\s+", " ", text)
+    return text.replace("'", "").replace('"', "").replace("`", "")
+
+
+def _name_key(name: str) -> str:
+    return re.sub(r"[\s_\-.]+", "", name.lower())
+
+
+def _find_dataset(name: str, datasets: list[dict[str, Any]]) -> dict[str, Any] | None:
+    """Return the single dataset whose name matches ``name``, ignoring case and separators."""
+    key = _name_key(name)
+    matches = [ds for ds in datasets if _name_key(str(ds.get("name", ""))) == key]
+    return matches[0] if len(matches) == 1 else None
+
+
+def _record(intent: str | None) -> None:
+    if intent:
+        metrics.inc("nl_explorer_fast_path_total", intent=intent)
+    else:
+        metrics.inc("nl_explorer_fast_path_misses_total")
+    with _lock:
+        _stats["requests"] += 1
+        if intent:
+            _stats["hits"][intent] = _stats["hits"].get(intent, 0) + 1
+        total = _stats["requests"]
+        hits = sum(_stats["hits"].values())
+    if total % STATS_LOG_INTERVAL == 0:
+        logger.info("NL Explorer fast-path router: %d/%d requests routed (%.1f%%)", hits, total, 100 * hits / total)
+
+
+def stats() -> dict[str, Any]:
+    """Return per-process router counters and the overall hit rate."""
+    with _lock:
+        hits = dict(_stats["hits"])
+        total = _stats["requests"]
+    return {"requests": total, "hits": hits, "hit_rate": sum(hits.values()) / total if total else 0.0}
+
+
+def route(
+    message: str,
+    datasets: list[dict[str, Any]],
+    allowed_schemas: list[str] | None = None,
+    max_datasets: int = context_builder.DEFAULT_MAX_DATASETS,
+) -> dict[str, Any] | None:
+    """
+    Try to answer ``message`` without the LLM.
+
+    Args:
+        message: The user's message.
+        datasets: Serialized datasets from ``context_builder`` used to resolve
+            dataset names.
+        allowed_schemas: Org schema restriction passed on to the dataset tools.
+        max_datasets: The turn's dataset budget; caps the dataset list answer.
+
+    Returns:
+        Dict with "intent", "message" and "actions", or None if the request
+        should go to the LLM.
+    """
+    text = _normalise(message)
+    result = None
+    for intent, pattern in _PATTERNS:
+        match = pattern.match(text)
+        if not match:
+            continue
+        if intent == "list_datasets":
+            result = _answer_list(allowed_schemas, max_datasets)
+        else:
+            ds = _find_dataset(match.group("name"), datasets)
+            if ds is None:
+                break
+            if intent == "dataset_schema":
+                result = _answer_schema(ds, allowed_schemas)
+            else:
+                result = _answer_explore(ds)
+        if result is not None:
+            result["intent"] = intent
+        break
+    _record(result["intent"] if result else None)
+    return result
+
+
+def _dispatch(tool_name: str, arguments: dict[str, Any], allowed_schemas: list[str] | None) -> Any:
+    raw = llm_service.dispatch_tool_call(tool_name, arguments, allowed_schemas=allowed_schemas)
+    payload = json.loads(raw["content"])
+    if isinstance(payload, dict) and "error" in payload:
+        return None
+    return payload
+
+
+def _answer_list(allowed_schemas: list[str] | None, max_datasets: int) -> dict[str, Any] | None:
+    # Not the list_datasets tool: it uses the default cap, not this turn's budget
+    try:
+        datasets = context_builder.get_user_context(max_datasets=max_datasets, allowed_schemas=allowed_schemas)[
+            "datasets"
+        ]
+    except Exception:  # noqa: BLE001
+        logger.exception("Fast-path dataset list failed; passing the request to the LLM")
+        return None
+    if not datasets:
+        return {"message": "You don't have access to any datasets yet.", "actions": []}
+    # The list is capped at max_datasets, so its length is not the number the user can access
+    shown = datasets[:MAX_LISTED]
+    lines = [f"Here are {len(shown)} of your datasets:" if len(shown) > 1 else "Here is one of your datasets:"]
+    for ds in shown:
+        desc = f" — {ds['description']}" if ds.get("description") else ""
+        lines.append(f"- **{ds['name']}** (ID {ds['id']}){desc}")
+    return {"message": "\n".join(lines), "actions": []}
+
+
+def _answer_schema(ds: dict[str, Any], allowed_schemas: list[str] | None) -> dict[str, Any] | None:
+    schema = _dispatch("get_dataset_schema", {"dataset_id": ds["id"]}, allowed_schemas)
+    if not schema:
+        return None
+    columns = schema.get("columns", [])
+    lines = [f"**{schema['name']}** (ID {schema['id']}) has {len(columns)} columns:"]
+    for col in columns[:MAX_LISTED]:
+        lines.append(f"- `{col['name']}` ({col['type']})")
+    if len(columns) > MAX_LISTED:
+        lines.append(f"- … and {len(columns) - MAX_LISTED} more")
+    if schema.get("metrics"):
+        lines.append("")
+        lines.append("Saved metrics: " + ", ".join(f"`{m['name']}`" for m in schema["metrics"][:MAX_LISTED]))
+    return {"message": "\n".join(lines), "actions": []}
+
+
+def _answer_explore(ds: dict[str, Any]) -> dict[str, Any]:
+    base_url = current_app.config.get("WEBDRIVER_BASEURL", "http://localhost:8088/").rstrip("/")
+    url = f"{base_url}/explore/?datasource_type=table&datasource_id={ds['id']}"
+    return {
+        "message": f"[Open **{ds['name']}** in Explore]({url})",
+        "actions": [{"type": "explore_link", "payload": {"explore_url": url, "dataset_id": ds["id"]}}],
+    }
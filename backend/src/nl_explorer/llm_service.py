@@ -12,17 +12,44 @@ from __future__ import annotations
 
 import json
 import logging
+import time
 from collections.abc import Generator
 from typing import Any
 
-# Module-level import so tests can patch nl_explorer.llm_service.litellm
-try:
-    import litellm
-except ImportError:
-    litellm = None  # type: ignore[assignment]
+from nl_explorer import admission, columnar, degradation, metrics, providers, sse, traces
+
+# litellm takes hundreds of milliseconds and tens of MB to import, and this
+# module is imported by every Superset web and Celery worker at startup, so it
+# is only imported on first use (or by preload()). Tests patch
+# nl_explorer.llm_service.litellm directly.
+litellm: Any = None
 
 logger = logging.getLogger(__name__)
 
+# Tools that do not modify Superset state; safe to run concurrently.
+READ_ONLY_TOOLS = frozenset({"list_datasets", "get_dataset_schema", "run_sql", "preview_chart"})
+
+
+def _litellm() -> Any:
+    """Return the litellm module, importing it on first use."""
+    global litellm
+    if litellm is None:
+        import litellm as _module
+
+        litellm = _module
+    return litellm
+
+
+def preload() -> None:
+    """
+    Import heavy dependencies eagerly.
+
+    Called from ``entrypoint.register`` when ``preload_llm`` is set, so that
+    with ``gunicorn --preload`` the modules are loaded once in the master and
+    shared copy-on-write by the forked workers.
+    """
+    _litellm()
+
 
 def _get_config() -> dict[str, Any]:
     """Read NL_EXPLORER_CONFIG from the Flask app config."""
@@ -31,47 +58,83 @@ def _get_config() -> dict[str, Any]:
     return current_app.config.get("NL_EXPLORER_CONFIG", {})
 
 
+def _pool_size(cfg: dict[str, Any], n_providers: int) -> int:
+    """One LLM thread per provider for every turn admission control lets run at once."""
+    limits = cfg.get("admission", {})
+    if limits is False:
+        return providers.DEFAULT_MAX_WORKERS
+    return int({**admission.DEFAULTS, **(limits or {})}["max_concurrent"]) * n_providers
+
+
 def chat(
     messages: list[dict[str, Any]],
     tools: list[dict] | None = None,
     stream: bool = False,
+    model: str | None = None,
+    usage: dict[str, int] | None = None,
 ) -> dict[str, Any] | Generator[str, None, None]:
     """
     Send a chat request to the configured LLM via LiteLLM.
 
+    With several ``providers`` configured the request is hedged and falls
+    back across them, see ``nl_explorer.providers``.
+
     Args:
         messages: List of OpenAI-format message dicts (role + content).
         tools: Optional list of tool definitions for function calling.
         stream: If True, returns a generator of SSE-formatted strings.
+        model: Optional model that replaces the first provider's model, e.g. a
+            smaller one chosen by ``nl_explorer.degradation``; the other
+            providers stay as fallbacks.
+        usage: For streams, filled with ``prompt_tokens`` and
+            ``completion_tokens`` as the stream is consumed. The provider's
+            reported usage is used when the final chunk carries it, an
+            estimate otherwise.
 
     Returns:
-        If stream=False: dict with "message" and "tool_calls" keys.
+        If stream=False: dict with "message", "tool_calls" and "usage" keys.
         If stream=True: generator of SSE event strings.
     """
     cfg = _get_config()
-    model = cfg.get("model", "gpt-4o")
-    api_key = cfg.get("api_key")
-    api_base = cfg.get("api_base")  # For Ollama / custom endpoints
     max_tokens = cfg.get("max_tokens", 4096)
 
     kwargs: dict[str, Any] = {
-        "model": model,
         "messages": messages,
         "max_tokens": max_tokens,
         "stream": stream,
     }
-    if api_key:
-        kwargs["api_key"] = api_key
-    if api_base:
-        kwargs["api_base"] = api_base
     if tools:
         kwargs["tools"] = tools
         kwargs["tool_choice"] = "auto"
 
+    provider_list = providers.configured_providers(cfg)
+    if model:
+        provider_list[0] = {**provider_list[0], "model": model}
+
+    # model/api_key/api_base come from the provider that answers first
+    started = time.perf_counter()
+    response, provider = providers.complete(
+        _litellm().completion,
+        kwargs,
+        provider_list,
+        hedging=cfg.get("hedging"),
+        max_workers=_pool_size(cfg, len(provider_list)),
+    )
+    elapsed = time.perf_counter() - started
+    metrics.observe("nl_explorer_llm_round_seconds", elapsed, stream=stream)
+    degradation.record_latency(elapsed)
     if stream:
-        return _stream_response(litellm.completion(**kwargs))
+        event = traces.record_llm(messages, True, elapsed)
+        return _stream_response(
+            response,
+            interval_ms=cfg.get("stream_frame_interval_ms", sse.DEFAULT_FRAME_INTERVAL_MS),
+            max_bytes=cfg.get("stream_frame_max_bytes", sse.DEFAULT_FRAME_MAX_BYTES),
+            record=event["chunks"] if event is not None else None,
+            usage=usage,
+            messages=messages,
+            model=provider["model"],
+        )
 
-    response = litellm.completion(**kwargs)
     choice = response.choices[0]
     msg = choice.message
 
@@ -86,37 +149,130 @@ def chat(
                 }
             )
 
-    return {
+    usage = getattr(response, "usage", None)
+    prompt_tokens = int(getattr(usage, "prompt_tokens", 0) or 0)
+    completion_tokens = int(getattr(usage, "completion_tokens", 0) or 0)
+    metrics.inc("nl_explorer_llm_tokens_total", prompt_tokens, kind="prompt")
+    metrics.inc("nl_explorer_llm_tokens_total", completion_tokens, kind="completion")
+    result = {
         "message": msg.content or "",
         "tool_calls": tool_calls,
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens},
     }
+    traces.record_llm(messages, False, elapsed, result)
+    return result
+
+
+def _count_tokens(model: str | None, **content: Any) -> int:
+    """Token count of ``messages=`` or ``text=`` for ``model``, roughly 4 characters per token if unknown."""
+    try:
+        return int(_litellm().token_counter(model=model, **content))
+    except Exception:  # noqa: BLE001
+        return len(json.dumps(content, default=str)) // 4
+
+
+def _reported_tokens(usage: Any) -> dict[str, int] | None:
+    """The usage a provider attached to a stream chunk, if any."""
+    prompt = getattr(usage, "prompt_tokens", None)
+    completion = getattr(usage, "completion_tokens", None)
+    if isinstance(prompt, int) and isinstance(completion, int):
+        return {"prompt_tokens": prompt, "completion_tokens": completion}
+    return None
+
+
+def _stream_response(
+    response: Any,
+    interval_ms: float = sse.DEFAULT_FRAME_INTERVAL_MS,
+    max_bytes: int = sse.DEFAULT_FRAME_MAX_BYTES,
+    record: list[str] | None = None,
+    usage: dict[str, int] | None = None,
+    messages: list[dict[str, Any]] | None = None,
+    model: str | None = None,
+) -> Generator[str, None, None]:
+    """
+    Convert a LiteLLM streaming response to coalesced SSE-formatted strings.
+
+    Deltas are also appended to ``record`` when given (trace recording).
+    Token usage goes to ``usage`` when given; the prompt is counted up front
+    so an abandoned stream is still charged for it.
+    """
+    key = traces.pseudonym_key() if record is not None else None
+    if usage is not None:
+        usage.update(prompt_tokens=_count_tokens(model, messages=messages or []), completion_tokens=0)
 
+    def deltas() -> Generator[str, None, None]:
+        text: list[str] = []
+        reported = None
+        try:
+            for chunk in response:
+                reported = _reported_tokens(getattr(chunk, "usage", None)) or reported
+                delta = chunk.choices[0].delta if chunk.choices else None
+                if delta and delta.content:
+                    if record is not None:
+                        record.append(traces.pseudonym(delta.content, key))
+                    text.append(delta.content)
+                    yield delta.content
+        finally:
+            if usage is not None:
+                usage.update(reported or {"completion_tokens": _count_tokens(model, text="".join(text))})
+                metrics.inc("nl_explorer_llm_tokens_total", usage["prompt_tokens"], kind="prompt")
+                metrics.inc("nl_explorer_llm_tokens_total", usage["completion_tokens"], kind="completion")
 
-def _stream_response(response: Any) -> Generator[str, None, None]:
-    """Convert a LiteLLM streaming response to SSE-formatted strings."""
-    for chunk in response:
-        delta = chunk.choices[0].delta if chunk.choices else None
-        if delta and delta.content:
-            data = json.dumps({"type": "text", "content": delta.content})
-            yield f"data: {data}\n\n"
-    yield "data: [DONE]\n\n"
+    yield from sse.coalesce(deltas(), interval_ms=interval_ms, max_bytes=max_bytes)
 
 
-def dispatch_tool_call(tool_name: str, arguments: dict[str, Any]) -> dict[str, Any]:
+def dispatch_tool_call(
+    tool_name: str,
+    arguments: dict[str, Any],
+    allowed_schemas: list[str] | None = None,
+) -> dict[str, Any]:
     """
     Dispatch a tool call from the LLM to the appropriate executor.
 
+    ``allowed_schemas`` restricts the dataset tools to the org's schemas.
+
     Returns a dict suitable for appending to the conversation as a tool message.
     """
-    from nl_explorer import chart_creator, context_builder
+    result = execute_tool(tool_name, arguments, allowed_schemas=allowed_schemas)
+    return {
+        "role": "tool",
+        "name": tool_name,
+        "content": json.dumps(columnar.as_payload(result)),
+    }
+
+
+def execute_tool(
+    tool_name: str,
+    arguments: dict[str, Any],
+    allowed_schemas: list[str] | None = None,
+) -> Any:
+    """
+    Run a tool and return its unserialized result.
 
+    Query results are ``ColumnarResult`` objects, everything else is a
+    JSON-ready dict or list; failures are ``{"error": ...}`` dicts. Arguments
+    are checked against the tool's parameter schema first, so malformed calls
+    fail before any database work with ``validation_errors``.
+    """
+    from nl_explorer import chart_creator, column_profiles, context_builder, tool_schemas
+
+    started = time.perf_counter()
     try:
-        if tool_name == "list_datasets":
-            ctx = context_builder.get_user_context()
+        invalid = tool_schemas.validate_arguments(tool_name, arguments)
+        if invalid:
+            result = {
+                "error": f"Invalid arguments for {tool_name}. Fix the listed fields and call it again.",
+                "validation_errors": invalid,
+            }
+        elif tool_name == "list_datasets":
+            ctx = context_builder.get_user_context(allowed_schemas=allowed_schemas)
             result = ctx["datasets"]
         elif tool_name == "get_dataset_schema":
-            ctx = context_builder.get_user_context(dataset_id=arguments["dataset_id"], max_columns=200)
-            result = ctx["datasets"][0] if ctx["datasets"] else {}
+            result = context_builder.get_dataset_schema(
+                arguments["dataset_id"], allowed_schemas=allowed_schemas
+            )
+            if result:
+                result = column_profiles.attach_profiles(result)
         elif tool_name == "run_sql":
             result = _run_sql(arguments)
         elif tool_name == "preview_chart":
@@ -125,6 +281,14 @@ def dispatch_tool_call(tool_name: str, arguments: dict[str, Any]) -> dict[str, A
                 viz_type=arguments["viz_type"],
                 form_data=arguments.get("form_data", {}),
             )
+        elif tool_name == "chart_from_template":
+            result = chart_creator.chart_from_template(
+                dataset_id=arguments["dataset_id"],
+                template=arguments["template"],
+                slots=arguments.get("slots", {}),
+                slice_name=arguments.get("slice_name"),
+                save=bool(arguments.get("save", False)),
+            )
         elif tool_name == "create_chart":
             result = chart_creator.create_chart(
                 slice_name=arguments["slice_name"],
@@ -132,6 +296,14 @@ def dispatch_tool_call(tool_name: str, arguments: dict[str, Any]) -> dict[str, A
                 viz_type=arguments["viz_type"],
                 params=arguments.get("params", {}),
             )
+        elif tool_name == "create_charts":
+            if arguments.get("dashboard_title"):
+                result = chart_creator.create_dashboard_with_charts(
+                    title=arguments["dashboard_title"],
+                    specs=arguments["charts"],
+                )
+            else:
+                result = chart_creator.create_charts(specs=arguments["charts"])
         elif tool_name == "create_dashboard":
             result = chart_creator.create_dashboard(
                 title=arguments["title"],
@@ -143,17 +315,28 @@ def dispatch_tool_call(tool_name: str, arguments: dict[str, Any]) -> dict[str, A
         logger.exception("Tool call %s failed", tool_name)
         result = {"error": str(exc)}
 
-    return {
-        "role": "tool",
-        "name": tool_name,
-        "content": json.dumps(result),
-    }
+    elapsed = time.perf_counter() - started
+    metrics.observe("nl_explorer_tool_seconds", elapsed, tool=tool_name)
+    if isinstance(result, dict) and "error" in result:
+        metrics.inc("nl_explorer_tool_errors_total", tool=tool_name)
+    if traces.current() is not None:
+        traces.record_tool(tool_name, arguments, columnar.as_payload(result), elapsed)
+    return result
 
 
-def _run_sql(arguments: dict[str, Any]) -> dict[str, Any]:
-    """Execute SQL directly via the database engine."""
+def _run_sql(arguments: dict[str, Any]) -> columnar.ColumnarResult | dict[str, Any]:
+    """
+    Execute SQL directly via the database engine.
+
+    With ``sample`` set, every table is read through a sample of that many
+    percent (``true`` uses ``sql_sample_percent``, default 1) and the result
+    is labelled with the sampling rate and method. ``scale_factor`` is only
+    given for single-table queries; samples of several tables compound.
+    """
     from superset.daos.database import DatabaseDAO
 
+    from nl_explorer import sql_sampling
+
     database_id = arguments["database_id"]
     sql = arguments["sql"]
     limit = int(arguments.get("limit", 100))
@@ -162,17 +345,50 @@ def _run_sql(arguments: dict[str, Any]) -> dict[str, Any]:
     if not database:
         return {"error": f"Database {database_id} not found"}
 
-    # Append a LIMIT clause if not already present
-    if "limit" not in sql.lower():
-        sql = f"{sql.rstrip(';')} LIMIT {limit}"
+    sampling: dict[str, Any] = {}
+    unsampled_sql = sql
+    sample = arguments.get("sample")
+    if sample:
+        percent = (
+            float(_get_config().get("sql_sample_percent", sql_sampling.DEFAULT_SAMPLE_PERCENT))
+            if sample is True
+            else float(sample)
+        )
+        engine = getattr(database.db_engine_spec, "engine", "")
+        sampled = sql_sampling.sample_sql(sql, engine, percent) if 0 < percent < 100 else None
+        if sampled is not None:
+            sql = sampled.sql
+            sampling = {"sampled": True, "sample_percent": percent, "sampled_tables": sampled.tables}
+            if sampled.tables == 1:
+                sampling["scale_factor"] = 100 / percent
+                sampling["note"] = f"Computed on a ~{percent:g}% sample; scale counts and sums by {100 / percent:g}."
+            else:
+                # Independent samples compound: a join of two 1% samples keeps ~0.01% of the matches
+                sampling["scale_factor"] = None
+                sampling["note"] = (
+                    f"Each of {sampled.tables} tables was sampled independently at ~{percent:g}%, so joined "
+                    f"rows keep roughly {percent:g}%^{sampled.tables} of the matches. Counts and sums cannot "
+                    "be scaled; use the result for shape and values only, or rerun without sample for totals."
+                )
+        else:
+            sampling = {"sampled": False, "note": "Sampling is not supported for this query; ran on the full data."}
+
+    def with_limit(query: str) -> str:
+        # Append a LIMIT clause if not already present
+        return query if "limit" in query.lower() else f"{query.rstrip(';')} LIMIT {limit}"
 
     try:
-        df = database.get_df(sql)
-        return {
-            "columns": list(df.columns),
-            "rows": df.head(limit).values.tolist(),
-            "row_count": len(df),
-        }
+        try:
+            df = database.get_df(with_limit(sql))
+        except Exception as exc:  # noqa: BLE001
+            if not sampling.get("sampled"):
+                raise
+            # e.g. TABLESAMPLE on a view, or a table without a sampling key
+            logger.info("Sampled query failed, running it unsampled: %s", exc)
+            sampling = {"sampled": False, "note": "The database rejected the sampled query; ran on the full data."}
+            df = database.get_df(with_limit(unsampled_sql))
+        metrics.inc("nl_explorer_sql_rows_total", min(len(df), limit))
+        return columnar.ColumnarResult.from_dataframe(df, limit, meta=sampling)
     except Exception as exc:  # noqa: BLE001
         logger.exception("SQL execution failed: %s", exc)
         return {"error": str(exc)}
@@ -0,0 +1,321 @@
+"""
+Prometheus metrics for NL Explorer, aggregated across gunicorn workers.
+
+Each worker process keeps its samples in memory and writes them to
+``<metrics_dir>/nl_explorer_<pid>_<start>.json`` (atomically, from a
+background thread every ``FLUSH_INTERVAL`` seconds while samples changed,
+and at exit), so recording a sample never touches the disk. ``<start>`` is the process start
+time from ``/proc``, so a new process that reuses a pid gets its own file and
+is not mistaken for the old one. A scrape of ``GET /metrics`` on any worker
+sums the files of all workers. Gauges are only summed for worker processes
+that are still alive.
+
+Files of exited workers are retired at startup and when a worker exits:
+their counters and histograms are folded into ``nl_explorer_exited.json`` so
+totals never go backwards, their gauges are dropped, and the file is deleted.
+
+The directory is ``metrics_dir`` from ``NL_EXPLORER_CONFIG``, else
+``$PROMETHEUS_MULTIPROC_DIR``, else ``<tmp>/nl_explorer_metrics``.
+"""
+
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Any
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = 1.0
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# name -> (type, help)
+METRICS: dict[str, tuple[str, str]] = {
+    "nl_explorer_chats_in_flight": ("gauge", "Chat turns currently being processed"),
+    "nl_explorer_sse_streams_open": ("gauge", "Streaming chat responses currently open"),
+    "nl_explorer_sse_deltas_total": ("counter", "Text deltas received from the LLM in streamed responses"),
+    "nl_explorer_sse_frames_total": ("counter", "SSE text frames sent in streamed responses"),
+    "nl_explorer_sse_bytes_total": ("counter", "SSE bytes sent in streamed responses, by encoding"),
+    "nl_explorer_chat_rejected_total": ("counter", "Chat turns rejected by admission control"),
+    "nl_explorer_llm_round_seconds": ("histogram", "LLM call latency (time to first chunk when streaming)"),
+    "nl_explorer_llm_tokens_total": ("counter", "LLM tokens used, by kind"),
+    "nl_explorer_tool_seconds": ("histogram", "Tool call latency by tool"),
+    "nl_explorer_tool_errors_total": ("counter", "Tool calls that returned an error, by tool"),
+    "nl_explorer_cache_requests_total": ("counter", "NL Explorer cache lookups, by result"),
+    "nl_explorer_sql_rows_total": ("counter", "Rows returned by run_sql"),
+    "nl_explorer_fast_path_total": ("counter", "Chat turns answered by the fast-path router, by intent"),
+    "nl_explorer_fast_path_misses_total": ("counter", "Chat turns the fast-path router passed to the LLM"),
+    "nl_explorer_degradation_steps_total": ("counter", "Degradation ladder steps, by direction"),
+}
+
+_lock = threading.Lock()
+# family -> {sample key (name + rendered labels) -> value}
+_values: dict[str, dict[str, float]] = {}
+_dirty = False
+_closed = False
+# pid of the process whose flusher thread is running; threads do not survive a fork
+_flusher_pid: int | None = None
+_dir: str | None = None
+
+
+EXITED_FILE = "nl_explorer_exited.json"
+
+_start: tuple[int, int] | None = None
+
+
+def configure(metrics_dir: str | None = None) -> None:
+    """Set the shared metrics directory and retire files of exited workers (called from ``entrypoint.register``)."""
+    global _dir
+    _dir = metrics_dir
+    retire()
+
+
+def metrics_dir() -> str:
+    return _dir or os.environ.get("PROMETHEUS_MULTIPROC_DIR") or os.path.join(
+        tempfile.gettempdir(), "nl_explorer_metrics"
+    )
+
+
+def _labels(labels: dict[str, Any]) -> str:
+    if not labels:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in sorted(labels.items())
+    )
+    return "{" + body + "}"
+
+
+def _add(family: str, key: str, value: float) -> None:
+    samples = _values.setdefault(family, {})
+    samples[key] = samples.get(key, 0.0) + value
+
+
+def _updated() -> None:
+    global _dirty, _flusher_pid
+    _dirty = True
+    pid = os.getpid()
+    if _flusher_pid == pid:
+        return
+    with _lock:
+        if _flusher_pid == pid:
+            return
+        _flusher_pid = pid
+    threading.Thread(target=_flush_loop, name="nl-explorer-metrics", daemon=True).start()
+
+
+def _flush_loop() -> None:
+    while not _closed:
+        time.sleep(FLUSH_INTERVAL)
+        flush()
+
+
+def inc(name: str, value: float = 1, **labels: Any) -> None:
+    """Increment a counter."""
+    with _lock:
+        _add(name, name + _labels(labels), value)
+    _updated()
+
+
+def gauge_add(name: str, delta: float, **labels: Any) -> None:
+    """Move a gauge up or down by ``delta``."""
+    with _lock:
+        _add(name, name + _labels(labels), delta)
+    _updated()
+
+
+def observe(name: str, value: float, **labels: Any) -> None:
+    """Record ``value`` in a histogram."""
+    with _lock:
+        for bound in DEFAULT_BUCKETS:
+            _add(name, f"{name}_bucket" + _labels({**labels, "le": bound}), 1 if value <= bound else 0)
+        _add(name, f"{name}_bucket" + _labels({**labels, "le": "+Inf"}), 1)
+        _add(name, f"{name}_sum" + _labels(labels), value)
+        _add(name, f"{name}_count" + _labels(labels), 1)
+    _updated()
+
+
+def _process_start(pid: int) -> int | None:
+    """Start time of ``pid`` in clock ticks since boot, or None where ``/proc`` is unavailable."""
+    try:
+        with open(f"/proc/{pid}/stat") as fh:
+            # Field 22; the command name (field 2) may contain spaces, so split after it
+            return int(fh.read().rsplit(")", 1)[1].split()[19])
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _own_start() -> int:
+    """This process's start token, recomputed after a fork."""
+    global _start
+    pid = os.getpid()
+    if _start is None or _start[0] != pid:
+        _start = (pid, _process_start(pid) or time.time_ns())
+    return _start[1]
+
+
+def _own_file() -> str:
+    return f"nl_explorer_{os.getpid()}_{_own_start()}.json"
+
+
+def flush() -> None:
+    """Write this process's samples to the shared directory."""
+    global _dirty
+    with _lock:
+        if not _dirty or _closed:
+            return
+        payload = json.dumps({"pid": os.getpid(), "start": _own_start(), "values": _values})
+        _dirty = False
+    directory = metrics_dir()
+    path = os.path.join(directory, _own_file())
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp_")
+        with os.fdopen(fd, "w") as fh:
+            fh.write(payload)
+        os.replace(tmp, path)
+    except OSError:
+        logger.warning("Could not write NL Explorer metrics to %s", directory, exc_info=True)
+
+
+def _alive(pid: int, start: int | None = None) -> bool:
+    """True if ``pid`` is running and, when known, is the process that started at ``start``."""
+    if pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    current = _process_start(pid)
+    return start is None or current is None or current == start
+
+
+def _worker_files(directory: str) -> list[str]:
+    try:
+        return [
+            n for n in os.listdir(directory)
+            if n.startswith("nl_explorer_") and n.endswith(".json") and n != EXITED_FILE
+        ]
+    except FileNotFoundError:
+        return []
+
+
+def _read(path: str) -> dict[str, Any] | None:
+    try:
+        with open(path) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def retire(exiting: bool = False) -> None:
+    """
+    Fold the files of exited workers into ``EXITED_FILE`` and delete them.
+
+    With ``exiting`` this process's own file is retired too (at exit).
+    """
+    directory = metrics_dir()
+    names = _worker_files(directory)
+    own = _own_file()
+    if not names or fcntl is None:
+        return
+    try:
+        with open(os.path.join(directory, ".lock"), "w") as lock:
+            # Serialize with other workers retiring at the same time
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            exited_path = os.path.join(directory, EXITED_FILE)
+            exited = _read(exited_path) or {"values": {}}
+            retired = []
+            for filename in names:
+                data = _read(os.path.join(directory, filename))
+                if data is None:
+                    continue
+                if not (exiting and filename == own) and _alive(int(data.get("pid", 0)), data.get("start")):
+                    continue
+                for family, samples in data.get("values", {}).items():
+                    if METRICS.get(family, ("counter",))[0] == "gauge":
+                        continue
+                    target = exited["values"].setdefault(family, {})
+                    for key, value in samples.items():
+                        target[key] = target.get(key, 0.0) + value
+                retired.append(filename)
+            if not retired:
+                return
+            fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp_")
+            with os.fdopen(fd, "w") as fh:
+                json.dump(exited, fh)
+            os.replace(tmp, exited_path)
+            for filename in retired:
+                os.remove(os.path.join(directory, filename))
+    except OSError:
+        logger.warning("Could not retire NL Explorer metrics files in %s", directory, exc_info=True)
+
+
+def _at_exit() -> None:
+    global _closed
+    flush()
+    # Once retired, a late write by the flusher would be folded in a second time
+    with _lock:
+        _closed = True
+    retire(exiting=True)
+
+
+atexit.register(_at_exit)
+
+
+def collect() -> dict[str, dict[str, float]]:
+    """Sum the samples of all worker processes."""
+    flush()
+    totals: dict[str, dict[str, float]] = {}
+    directory = metrics_dir()
+    names = _worker_files(directory)
+    if os.path.exists(os.path.join(directory, EXITED_FILE)):
+        names.append(EXITED_FILE)
+    for filename in names:
+        data = _read(os.path.join(directory, filename))
+        if data is None:
+            continue
+        alive = _alive(int(data.get("pid", 0)), data.get("start"))
+        for family, samples in data.get("values", {}).items():
+            if METRICS.get(family, ("counter",))[0] == "gauge" and not alive:
+                continue
+            target = totals.setdefault(family, {})
+            for key, value in samples.items():
+                target[key] = target.get(key, 0.0) + value
+    # The directory is not writable: report this process only
+    if not names:
+        with _lock:
+            totals = {f: dict(s) for f, s in _values.items()}
+    return totals
+
+
+def _format(value: float) -> str:
+    return str(int(value)) if value == int(value) else repr(value)
+
+
+def render() -> str:
+    """Render all metrics in the Prometheus text exposition format."""
+    totals = collect()
+    lines: list[str] = []
+    for family, (kind, help_text) in METRICS.items():
+        samples = totals.get(family)
+        if not samples and kind != "gauge":
+            continue
+        lines.append(f"# HELP {family} {help_text}")
+        lines.append(f"# TYPE {family} {kind}")
+        # Insertion order keeps histogram buckets in ascending order
+        for key, value in (samples or {family: 0.0}).items():
+            lines.append(f"{key} {_format(value)}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,167 @@
+"""
+Opt-in sampling profiler for NL Explorer API requests.
+
+A profiled request gets a sampler thread that reads the request thread's
+stack from ``sys._current_frames()`` every ``profile_interval_ms`` and
+counts collapsed stacks. Because the profiler only samples, the request
+itself is not slowed by tracing. The result is written in the "folded"
+format used by ``flamegraph.pl`` and speedscope: one ``frame;frame;frame
+count`` line per stack, root first.
+
+A request is profiled when a random draw falls under
+``profile_sample_rate``, or when an admin sends ``X-NL-Explorer-Profile: 1``.
+Profiles go into a ring of at most ``profile_max_files`` files in
+``profile_dir``. Admins can list and download them through ``/profiles``.
+"""
+
+from __future__ import annotations
+
+import functools
+import logging
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Any, Callable
+
+from flask import current_app, request
+
+try:
+    from superset import security_manager
+except ImportError:
+    security_manager = None  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-NL-Explorer-Profile"
+DEFAULT_INTERVAL_MS = 5
+DEFAULT_MAX_FILES = 50
+_ID_RE = re.compile(r"^[\w.-]+$")
+
+
+class Sampler(threading.Thread):
+    """Samples the stack of one thread until stopped."""
+
+    def __init__(self, thread_id: int, interval: float) -> None:
+        super().__init__(name="nl-explorer-profiler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(names))] += 1
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+
+def _config() -> dict[str, Any]:
+    return current_app.config.get("NL_EXPLORER_CONFIG", {})
+
+
+def profile_dir() -> str:
+    return _config().get("profile_dir") or os.path.join(tempfile.gettempdir(), "nl_explorer_profiles")
+
+
+def is_admin() -> bool:
+    """True if the current user is a Superset admin; False when that cannot be determined."""
+    if security_manager is None:
+        return False
+    try:
+        return bool(security_manager.is_admin())
+    except Exception:  # noqa: BLE001
+        return False
+
+
+def _should_profile() -> bool:
+    if request.headers.get(PROFILE_HEADER) == "1" and is_admin():
+        return True
+    rate = float(_config().get("profile_sample_rate", 0.0))
+    return rate > 0 and random.random() < rate
+
+
+def _save(endpoint: str, duration: float, stacks: Counter[str]) -> None:
+    """Write a folded profile and drop the oldest files beyond the ring size."""
+    directory = profile_dir()
+    endpoint = re.sub(r"[^\w.-]", "", endpoint)
+    profile_id = f"{int(time.time() * 1000)}_{endpoint}_{int(duration * 1000)}ms_{uuid.uuid4().hex[:8]}"
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, profile_id + ".folded"), "w") as fh:
+            for stack, count in stacks.most_common():
+                fh.write(f"{stack} {count}\n")
+        files = sorted(n for n in os.listdir(directory) if n.endswith(".folded"))
+        for name in files[: max(0, len(files) - int(_config().get("profile_max_files", DEFAULT_MAX_FILES)))]:
+            os.remove(os.path.join(directory, name))
+    except OSError:
+        logger.warning("Could not write profile to %s", directory, exc_info=True)
+
+
+def profiled(func: Callable[..., Any]) -> Callable[..., Any]:
+    """Decorator sampling an API method when profiling is enabled for the request."""
+
+    @functools.wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        if not _should_profile():
+            return func(*args, **kwargs)
+        interval = float(_config().get("profile_interval_ms", DEFAULT_INTERVAL_MS)) / 1000
+        sampler = Sampler(threading.get_ident(), interval)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            sampler.stop()
+            _save(func.__name__, time.perf_counter() - started, sampler.stacks)
+
+    return wrapper
+
+
+def list_profiles() -> list[dict[str, Any]]:
+    """Return stored profiles, newest first."""
+    try:
+        names = sorted((n for n in os.listdir(profile_dir()) if n.endswith(".folded")), reverse=True)
+    except FileNotFoundError:
+        return []
+    profiles = []
+    for name in names:
+        profile_id = name[: -len(".folded")]
+        created, _, rest = profile_id.partition("_")
+        try:
+            endpoint, duration, _ = rest.rsplit("_", 2)
+        except ValueError:
+            continue
+        profiles.append({
+            "id": profile_id,
+            "endpoint": endpoint,
+            "created": int(created) / 1000,
+            "duration_ms": int(duration.removesuffix("ms")),
+        })
+    return profiles
+
+
+def read_profile(profile_id: str) -> str | None:
+    """Return the folded stacks of a profile, or None if it does not exist."""
+    if not _ID_RE.match(profile_id):
+        return None
+    try:
+        with open(os.path.join(profile_dir(), profile_id + ".folded")) as fh:
+            return fh.read()
+    except FileNotFoundError:
+        return None
@@ -31,6 +31,7 @@ def build_system_prompt(
     context: dict[str, Any],
     current_user: str | None = None,
     page_context: dict[str, Any] | None = None,
+    max_columns_per_dataset: int = 20,
 ) -> str:
     """
     Build the LLM system prompt with dataset context and instructions.
@@ -42,16 +43,22 @@ def build_system_prompt(
             via postMessage.  Keys: page, dashboard, datasource, user, org.
             The ``org`` sub-dict may contain ``system_prompt_suffix`` and
             ``allowed_schemas`` set via COMMON_BOOTSTRAP_OVERRIDES_FUNC.
+        max_columns_per_dataset: Columns (and metrics) listed per dataset; the
+            rest are available through ``get_dataset_schema``.
     """
     page_context = page_context or {}
     datasets = context.get("datasets", [])
 
     dataset_summary_lines = []
     for ds in datasets:
-        col_names = ", ".join(c["name"] for c in ds.get("columns", [])[:20])
+        col_names = ", ".join(c["name"] for c in ds.get("columns", [])[:max_columns_per_dataset])
         desc = f" — {ds['description']}" if ds.get("description") else ""
+        metric_line = ""
+        if ds.get("metrics"):
+            metric_names = ", ".join(m["name"] for m in ds["metrics"][:max_columns_per_dataset])
+            metric_line = f"\n    Metrics: {metric_names}"
         dataset_summary_lines.append(
-            f"  • [{ds['id']}] {ds['name']}{desc}\n    Columns: {col_names}"
+            f"  • [{ds['id']}] {ds['name']}{desc}\n    Columns: {col_names}{metric_line}"
         )
 
     dataset_block = "\n".join(dataset_summary_lines) if dataset_summary_lines else "  (none available)"
@@ -80,8 +87,10 @@ You have access to the following tools:
 - list_datasets: see all available datasets
 - get_dataset_schema: inspect columns and metrics for a dataset
 - run_sql: execute SQL for data exploration (respects user permissions)
+- chart_from_template: preview (or save) a chart by picking a template and filling a few slots
 - preview_chart: generate an Explore link to preview a chart configuration
 - create_chart: permanently save a chart (ask for confirmation first)
+- create_charts: save several charts at once, optionally with a new dashboard (ask for confirmation first)
 - create_dashboard: create a dashboard from chart IDs (ask for confirmation first)
 
 Available datasets (as of this session):
@@ -91,8 +100,8 @@ Available datasets (as of this session):
 
 Guidelines:
 - Always confirm with the user before permanently creating charts or dashboards.
-- When the user asks to visualise something, start with preview_chart to show an Explore link.
+- When the user asks to visualise something, start with chart_from_template (or preview_chart if no template fits) to show an Explore link.
 - For ambiguous requests, ask a clarifying question rather than guessing.
-- When running SQL, keep queries efficient — use LIMIT when exploring.
+- When running SQL, keep queries efficient — use LIMIT when exploring, and set sample for rough answers on large tables.
 - Be concise but helpful. Explain what you are doing and why.
 {org_block}"""
@@ -6,6 +6,8 @@ Each tool maps to an action that the NL Explorer backend can execute.
 
 from __future__ import annotations
 
+from nl_explorer.chart_templates import TEMPLATES, template_catalogue
+
 TOOLS: list[dict] = [
     {
         "type": "function",
@@ -33,7 +35,10 @@ TOOLS: list[dict] = [
             "name": "get_dataset_schema",
             "description": (
                 "Get detailed schema for a specific dataset including all columns, "
-                "data types, and available metrics."
+                "data types, calculated column expressions, and saved metrics. Saved "
+                "metric names can be used directly in chart 'metrics'. Columns may include a 'profile' "
+                "with top values, min/max, approximate distinct count and null "
+                "fraction; use it for filter values instead of running SQL."
             ),
             "parameters": {
                 "type": "object",
@@ -68,6 +73,15 @@ TOOLS: list[dict] = [
                         "description": "Maximum rows to return (default 100).",
                         "default": 100,
                     },
+                    "sample": {
+                        "type": ["boolean", "number"],
+                        "description": (
+                            "Run on a random sample of each table for fast exploratory answers on large "
+                            "tables: true for the default rate, or a percentage such as 0.5. Results are "
+                            "labelled sampled; multiply counts and sums by scale_factor when it is set "
+                            "(single-table queries only)."
+                        ),
+                    },
                 },
                 "required": ["sql", "database_id"],
             },
@@ -80,7 +94,9 @@ TOOLS: list[dict] = [
             "description": (
                 "Generate an Explore link (interactive chart builder URL) for a chart "
                 "configuration without permanently saving it. Use this to let the user "
-                "preview and refine a chart before saving."
+                "preview and refine a chart before saving. Column and metric names are "
+                "checked against the dataset; invalid configs return 'validation_errors' "
+                "to fix before retrying."
             ),
             "parameters": {
                 "type": "object",
@@ -109,6 +125,42 @@ TOOLS: list[dict] = [
             },
         },
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "chart_from_template",
+            "description": (
+                "Build a chart from a named template by filling a few slots; the backend "
+                "expands it into full form_data. Prefer this over preview_chart/create_chart "
+                "whenever a template fits. Measures are saved metric names, COUNT(*), or "
+                "AGG(column) with AGG in SUM, AVG, MIN, MAX, COUNT_DISTINCT. Templates "
+                "(required slots) [optional slots]: " + template_catalogue() + ". "
+                "All templates also accept filters, time_range (with the time slot), row_limit."
+            ),
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "dataset_id": {"type": "integer", "description": "Superset dataset ID."},
+                    "template": {"type": "string", "enum": list(TEMPLATES)},
+                    "slots": {
+                        "type": "object",
+                        "description": (
+                            "Slot values, e.g. {\"time\": \"order_date\", \"measures\": [\"SUM(amount)\"], "
+                            "\"dimension\": \"region\", \"filters\": [{\"column\": \"country\", "
+                            "\"op\": \"==\", \"value\": \"US\"}], \"time_range\": \"Last year\"}."
+                        ),
+                    },
+                    "save": {
+                        "type": "boolean",
+                        "description": "Save the chart permanently instead of previewing (only after user confirms).",
+                        "default": False,
+                    },
+                    "slice_name": {"type": "string", "description": "Chart name when saving."},
+                },
+                "required": ["dataset_id", "template", "slots"],
+            },
+        },
+    },
     {
         "type": "function",
         "function": {
@@ -141,6 +193,42 @@ TOOLS: list[dict] = [
             },
         },
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "create_charts",
+            "description": (
+                "Permanently create several charts in one step, optionally together with "
+                "a new dashboard containing them. All specs are validated first and "
+                "saved in a single transaction. Prefer this over repeated create_chart "
+                "calls. Use only after the user confirms."
+            ),
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "charts": {
+                        "type": "array",
+                        "description": "Chart specs, in dashboard order.",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "slice_name": {"type": "string", "description": "Chart name."},
+                                "datasource_id": {"type": "integer", "description": "Superset dataset ID."},
+                                "viz_type": {"type": "string", "description": "Superset visualisation type."},
+                                "params": {"type": "object", "description": "Superset form_data dict."},
+                            },
+                            "required": ["slice_name", "datasource_id", "viz_type", "params"],
+                        },
+                    },
+                    "dashboard_title": {
+                        "type": "string",
+                        "description": "If set, also create a dashboard with this title containing the charts.",
+                    },
+                },
+                "required": ["charts"],
+            },
+        },
+    },
     {
         "type": "function",
         "function": {
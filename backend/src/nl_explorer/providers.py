@@ -0,0 +1,286 @@
+"""
+Hedged and fallback completion requests across several LLM providers.
+
+``NL_EXPLORER_CONFIG["providers"]`` is an ordered list of provider dicts
+(``model``, ``api_key``, ``api_base``). A request goes to the first healthy
+provider. If it has not produced its first token within the hedge delay,
+a percentile of that provider's recent first-token latencies clamped to
+``[min_delay, max_delay]``, the request is also sent to the next provider.
+The first one to respond wins. A provider that raises is replaced by the
+next one right away. Providers that fail repeatedly are moved to the end of
+the order for a cooldown period.
+
+Python threads cannot be interrupted, so a losing request is abandoned. Its
+result is discarded and a losing stream is closed as soon as it returns; its
+latency (or failure) is still recorded then, so slow providers are not
+under-represented in the percentile.
+
+Requests run on a shared thread pool sized by the caller from the admission
+limits (one thread per provider for every admitted turn). Abandoned requests
+keep their thread until they return, so when the pool is busy no hedge is
+sent and the request simply waits for the provider it is on.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from itertools import chain
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+HEDGING_DEFAULTS: dict[str, Any] = {
+    "enabled": True,
+    "percentile": 95,
+    "initial_delay": 5.0,
+    "min_delay": 1.0,
+    "max_delay": 20.0,
+    "window": 200,
+    "failure_threshold": 3,
+    "cooldown": 60.0,
+}
+
+
+def provider_name(provider: dict[str, Any]) -> str:
+    return f"{provider.get('model')}@{provider.get('api_base') or 'default'}"
+
+
+def configured_providers(cfg: dict[str, Any]) -> list[dict[str, Any]]:
+    """Return the ordered provider list, falling back to the single model/api_key/api_base keys."""
+    if cfg.get("providers"):
+        return list(cfg["providers"])
+    return [{"model": cfg.get("model", "gpt-4o"), "api_key": cfg.get("api_key"), "api_base": cfg.get("api_base")}]
+
+
+class LatencyTracker:
+    """Rolling first-token latencies and consecutive failures per provider."""
+
+    def __init__(self, window: int = HEDGING_DEFAULTS["window"]) -> None:
+        self._window = window
+        self._latencies: dict[tuple[str, bool], deque[float]] = {}
+        self._failures: dict[str, int] = {}
+        self._cooldown_until: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def record_success(self, name: str, stream: bool, latency: float) -> None:
+        with self._lock:
+            self._latencies.setdefault((name, stream), deque(maxlen=self._window)).append(latency)
+            self._failures[name] = 0
+
+    def record_failure(self, name: str, threshold: int, cooldown: float) -> None:
+        with self._lock:
+            self._failures[name] = self._failures.get(name, 0) + 1
+            if self._failures[name] >= threshold:
+                self._cooldown_until[name] = time.monotonic() + cooldown
+
+    def percentile(self, name: str, stream: bool, pct: float) -> float | None:
+        with self._lock:
+            samples = sorted(self._latencies.get((name, stream), ()))
+        if not samples:
+            return None
+        idx = min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))
+        return samples[idx]
+
+    def in_cooldown(self, name: str) -> bool:
+        with self._lock:
+            return self._cooldown_until.get(name, 0.0) > time.monotonic()
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        """Per-provider sample counts, p50/p95 latencies and failure streaks."""
+        with self._lock:
+            keys = list(self._latencies)
+            failures = dict(self._failures)
+        out: dict[str, dict[str, Any]] = {}
+        for name, stream in keys:
+            entry = out.setdefault(name, {"failures": failures.get(name, 0)})
+            kind = "stream" if stream else "sync"
+            entry[f"{kind}_p50"] = self.percentile(name, stream, 50)
+            entry[f"{kind}_p95"] = self.percentile(name, stream, 95)
+        return out
+
+
+tracker = LatencyTracker()
+
+DEFAULT_MAX_WORKERS = 16
+
+
+class _Pool:
+    """A thread pool and the number of requests submitted to it that have not returned."""
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self.busy = 0
+        self.executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="nl-explorer-llm")
+
+
+_pool = _Pool(DEFAULT_MAX_WORKERS)
+_pool_lock = threading.Lock()
+
+
+def _get_pool(max_workers: int | None) -> _Pool:
+    """Return the shared pool, replacing it if ``max_workers`` changed; running requests finish on the old one."""
+    global _pool
+    size = max(1, max_workers or DEFAULT_MAX_WORKERS)
+    with _pool_lock:
+        if size != _pool.size:
+            _pool.executor.shutdown(wait=False)
+            _pool = _Pool(size)
+        return _pool
+
+
+def _saturated(pool: _Pool) -> bool:
+    """True when every thread of ``pool`` is running a request, including abandoned ones."""
+    with _pool_lock:
+        return pool.busy >= pool.size
+
+
+def _submit(pool: _Pool, fn: Callable[..., Any], *args: Any) -> Future:
+    # Counted on the pool the request runs on, so a resize does not skew the new pool's count
+    def _done(_: Future) -> None:
+        with _pool_lock:
+            pool.busy -= 1
+
+    with _pool_lock:
+        pool.busy += 1
+    future = pool.executor.submit(fn, *args)
+    future.add_done_callback(_done)
+    return future
+
+
+def _close(response: Any) -> None:
+    close = getattr(response, "close", None)
+    if callable(close):
+        try:
+            close()
+        except Exception:  # noqa: BLE001
+            logger.debug("Failed to close abandoned LLM stream", exc_info=True)
+
+
+def _call(completion: Callable[..., Any], kwargs: dict[str, Any], stream: bool) -> Any:
+    """Run one completion; for streams, wait for the first chunk so it counts as first token."""
+    response = completion(**kwargs)
+    if not stream:
+        return response
+    iterator = iter(response)
+    try:
+        first = next(iterator)
+    except StopIteration:
+        return response, iter(())
+    return response, chain([first], iterator)
+
+
+def _discard(future: Future, stream: bool, name: str, started: float, policy: dict[str, Any]) -> None:
+    """Cancel a losing request, or record its latency and close its stream once it returns."""
+    if future.cancel():
+        return
+
+    def _cleanup(f: Future) -> None:
+        if f.exception() is not None:
+            tracker.record_failure(name, policy["failure_threshold"], policy["cooldown"])
+            return
+        tracker.record_success(name, stream, time.monotonic() - started)
+        if stream:
+            _close(f.result()[0])
+
+    future.add_done_callback(_cleanup)
+
+
+def complete(
+    completion: Callable[..., Any],
+    base_kwargs: dict[str, Any],
+    providers: list[dict[str, Any]],
+    hedging: dict[str, Any] | None = None,
+    max_workers: int | None = None,
+) -> tuple[Any, dict[str, Any]]:
+    """
+    Run ``completion`` against the providers with hedging and fallback.
+
+    Args:
+        completion: ``litellm.completion`` (or a stand-in).
+        base_kwargs: Completion kwargs without model/api_key/api_base.
+        providers: Ordered provider dicts.
+        hedging: Overrides for ``HEDGING_DEFAULTS``.
+        max_workers: Size of the shared request pool.
+
+    Returns:
+        ``(response, provider)``. For streams the response is an iterator of
+        chunks, including the first one.
+    """
+    policy = {**HEDGING_DEFAULTS, **(hedging or {})}
+    stream = bool(base_kwargs.get("stream"))
+    healthy = [p for p in providers if not tracker.in_cooldown(provider_name(p))]
+    order = healthy + [p for p in providers if p not in healthy]
+
+    def kwargs_for(provider: dict[str, Any]) -> dict[str, Any]:
+        kwargs = {**base_kwargs, "model": provider["model"]}
+        for key in ("api_key", "api_base"):
+            if provider.get(key):
+                kwargs[key] = provider[key]
+        return kwargs
+
+    def hedge_delay(provider: dict[str, Any]) -> float:
+        observed = tracker.percentile(provider_name(provider), stream, policy["percentile"])
+        delay = policy["initial_delay"] if observed is None else observed
+        return min(policy["max_delay"], max(policy["min_delay"], delay))
+
+    if len(order) == 1:
+        provider = order[0]
+        start = time.monotonic()
+        try:
+            result = _call(completion, kwargs_for(provider), stream)
+        except Exception:
+            tracker.record_failure(provider_name(provider), policy["failure_threshold"], policy["cooldown"])
+            raise
+        tracker.record_success(provider_name(provider), stream, time.monotonic() - start)
+        return (result[1] if stream else result), provider
+
+    pool = _get_pool(max_workers)
+    in_flight: dict[Future, tuple[dict[str, Any], float]] = {}
+    next_idx = 0
+    last_error: Exception | None = None
+
+    def launch() -> None:
+        nonlocal next_idx
+        provider = order[next_idx]
+        next_idx += 1
+        future = _submit(pool, _call, completion, kwargs_for(provider), stream)
+        in_flight[future] = (provider, time.monotonic())
+
+    launch()
+    while in_flight:
+        can_hedge = policy["enabled"] and next_idx < len(order)
+        newest_provider = list(in_flight.values())[-1][0]
+        timeout = hedge_delay(newest_provider) if can_hedge else None
+        done, _ = wait(list(in_flight), timeout=timeout, return_when=FIRST_COMPLETED)
+        if not done:
+            if _saturated(pool):
+                logger.info("LLM request pool is saturated, not hedging")
+                continue
+            logger.info("Hedging LLM request to %s", provider_name(order[next_idx]))
+            launch()
+            continue
+        for future in done:
+            provider, started = in_flight.pop(future)
+            name = provider_name(provider)
+            try:
+                result = future.result()
+            except Exception as exc:  # noqa: BLE001
+                logger.warning("LLM provider %s failed: %s", name, exc)
+                tracker.record_failure(name, policy["failure_threshold"], policy["cooldown"])
+                last_error = exc
+                if next_idx < len(order) and not in_flight:
+                    launch()
+                continue
+            tracker.record_success(name, stream, time.monotonic() - started)
+            for loser, (loser_provider, loser_started) in in_flight.items():
+                _discard(loser, stream, provider_name(loser_provider), loser_started, policy)
+            return (result[1] if stream else result), provider
+        if not in_flight and next_idx < len(order):
+            launch()
+
+    assert last_error is not None
+    raise last_error
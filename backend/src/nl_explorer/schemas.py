@@ -4,7 +4,7 @@ Marshmallow schemas for NL Explorer API request/response validation.
 
 from __future__ import annotations
 
-from marshmallow import fields, Schema, validate
+from marshmallow import fields, Schema, validate, validates_schema, ValidationError
 
 
 class MessageSchema(Schema):
@@ -35,12 +35,23 @@ class ChatRequestSchema(Schema):
         load_default={},
         metadata={"description": "Page context from the parent Superset frame (dashboard, datasource, org config)"},
     )
+    conversation_id = fields.Str(
+        load_default=None,
+        metadata={"description": "Optional client-generated conversation ID; groups the turns of a conversation in chat traces"},
+    )
 
 
 class ColumnInfoSchema(Schema):
     name = fields.Str()
     type = fields.Str()
     description = fields.Str(allow_none=True)
+    expression = fields.Str(metadata={"description": "SQL expression of a calculated column"})
+
+
+class MetricInfoSchema(Schema):
+    name = fields.Str()
+    expression = fields.Str()
+    description = fields.Str(allow_none=True)
 
 
 class DatasetContextSchema(Schema):
@@ -48,12 +59,22 @@ class DatasetContextSchema(Schema):
     name = fields.Str()
     description = fields.Str(allow_none=True)
     columns = fields.List(fields.Nested(ColumnInfoSchema))
+    metrics = fields.List(fields.Nested(MetricInfoSchema))
 
 
 class ContextResponseSchema(Schema):
+    version = fields.Str(metadata={"description": "Catalogue version, also sent as the ETag"})
     datasets = fields.List(fields.Nested(DatasetContextSchema))
 
 
+class ContextDeltaResponseSchema(Schema):
+    version = fields.Str(metadata={"description": "Current catalogue version"})
+    since = fields.Str(metadata={"description": "Catalogue version the delta is relative to"})
+    added = fields.List(fields.Nested(DatasetContextSchema))
+    changed = fields.List(fields.Nested(DatasetContextSchema))
+    removed = fields.List(fields.Int(), metadata={"description": "IDs of datasets no longer visible"})
+
+
 class ActionSchema(Schema):
     type = fields.Str(
         metadata={"description": "Action type: create_chart, create_dashboard, run_sql, explore_link"}
@@ -73,8 +94,27 @@ class ChatResponseSchema(Schema):
     )
 
 
+class BatchActionSchema(ActionSchema):
+    id = fields.Str(metadata={"description": "Caller-chosen ID, referenced by depends_on and $ref"})
+    depends_on = fields.List(
+        fields.Str(),
+        load_default=[],
+        metadata={"description": "IDs of actions that must finish before this one"},
+    )
+
+
 class ExecuteRequestSchema(Schema):
-    action = fields.Nested(ActionSchema, required=True)
+    action = fields.Nested(ActionSchema, metadata={"description": "A single action"})
+    actions = fields.List(
+        fields.Nested(BatchActionSchema),
+        validate=validate.Length(min=1, max=50),
+        metadata={"description": "Ordered batch of actions; read-only ones run concurrently"},
+    )
+
+    @validates_schema
+    def validate_one_of(self, data: dict, **kwargs: object) -> None:
+        if ("action" in data) == ("actions" in data):
+            raise ValidationError("Provide exactly one of 'action' or 'actions'.")
 
 
 class ExecuteResponseSchema(Schema):
@@ -83,6 +123,17 @@ class ExecuteResponseSchema(Schema):
     error = fields.Str(allow_none=True)
 
 
+class ActionResultSchema(ExecuteResponseSchema):
+    id = fields.Str()
+    type = fields.Str()
+    result = fields.Raw()
+
+
+class ExecuteBatchResponseSchema(Schema):
+    success = fields.Bool(metadata={"description": "True if every action succeeded"})
+    results = fields.List(fields.Nested(ActionResultSchema))
+
+
 class PluginConfigResponseSchema(Schema):
     model = fields.Str()
     streaming_enabled = fields.Bool()
@@ -0,0 +1,152 @@
+"""
+Fast-path serialization of API responses.
+
+``Schema.dump`` resolves every field through accessors, hooks and per-field
+``serialize`` calls, which adds up for ``/context`` and ``/chat`` payloads
+with hundreds of datasets and columns. ``FastDumper`` compiles a schema once
+into plain closures. Values our own code already produces in the right type
+are copied as they are; everything else goes through the field's own
+``serialize``, so the result always equals ``schema.dump``. Schemas with dump
+hooks are dumped by marshmallow.
+
+``encode`` then writes the dumped payload with ``orjson`` when it is
+installed. It is only used where the bytes are guaranteed to match Flask's
+``jsonify`` (sorted keys, compact separators, ASCII escapes, trailing
+newline). Payloads that could encode differently use ``jsonify`` instead:
+payloads with floats, which orjson formats differently for large and small
+exponents, payloads with free-form ``Dict``/``Raw`` values, and non-ASCII
+text.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Callable
+
+from flask import current_app
+from flask.json.provider import DefaultJSONProvider
+from marshmallow import fields, missing, Schema
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore[assignment]
+
+_ORJSON_OPTIONS = (
+    (
+        orjson.OPT_SORT_KEYS
+        | orjson.OPT_PASSTHROUGH_DATETIME
+        | orjson.OPT_PASSTHROUGH_DATACLASS
+        | orjson.OPT_PASSTHROUGH_SUBCLASS
+    )
+    if orjson is not None
+    else 0
+)
+
+# (obj, state) -> value; ``state`` collects a flag when the value may contain floats
+_FieldDumper = Callable[[Any, list], Any]
+
+_EXACT_TYPES: dict[type, type] = {fields.String: str, fields.Integer: int, fields.Boolean: bool}
+
+
+def _value_dumper(field: fields.Field, name: str) -> _FieldDumper:
+    """Return a dumper for one value of ``field``; ``name`` is passed to ``serialize``."""
+    if isinstance(field, fields.Nested):
+        nested = FastDumper(field.schema)
+        if field.many:
+            return lambda value, state: None if value is None else [nested._dump(v, state) for v in value]
+        return nested._dump
+
+    if isinstance(field, fields.List):
+        item = _value_dumper(field.inner, name)
+        return lambda value, state: None if value is None else [item(v, state) for v in value]
+
+    exact = _EXACT_TYPES.get(type(field))
+    if exact is not None:
+
+        def dump_exact(value: Any, state: list) -> Any:
+            if value is None or type(value) is exact:
+                return value
+            return field._serialize(value, name, None)
+
+        return dump_exact
+
+    if type(field) in (fields.Dict, fields.Raw) and not getattr(field, "value_field", None):
+
+        def dump_free(value: Any, state: list) -> Any:
+            if value:
+                state.append(True)
+            return field._serialize(value, name, None)
+
+        return dump_free
+
+    def dump_other(value: Any, state: list) -> Any:
+        state.append(True)
+        return field._serialize(value, name, None)
+
+    return dump_other
+
+
+class FastDumper:
+    """A schema compiled into closures; ``dump`` returns the same data as ``Schema.dump``."""
+
+    def __init__(self, schema: Schema) -> None:
+        self.schema = schema
+        hooks = schema._hooks  # noqa: SLF001
+        self._use_schema = bool(schema.many or hooks.get("pre_dump") or hooks.get("post_dump"))
+        self._fields = [
+            (name, field.data_key or name, _value_dumper(field, name))
+            for name, field in schema.dump_fields.items()
+            if field.attribute is None and field.dump_default is missing
+        ]
+        if len(self._fields) != len(schema.dump_fields):
+            self._use_schema = True
+
+    def _dump(self, obj: Any, state: list) -> Any:
+        if obj is None:
+            return None
+        if self._use_schema or not isinstance(obj, dict):
+            state.append(True)
+            return self.schema.dump(obj)
+        out = {}
+        for name, key, dump in self._fields:
+            if name in obj:
+                out[key] = dump(obj[name], state)
+        return out
+
+    def dump(self, obj: Any) -> tuple[Any, bool]:
+        """Return ``(data, exact)``; ``exact`` is False if the data may hold floats or free-form values."""
+        state: list = []
+        data = self._dump(obj, state)
+        return data, not state
+
+
+def encode(data: Any) -> bytes | None:
+    """
+    Return ``data`` as the bytes ``jsonify`` would produce, or None if that is not guaranteed.
+
+    Only call this with data from ``FastDumper.dump`` that was reported exact.
+    """
+    if orjson is None:
+        return None
+    provider = current_app.json
+    if (
+        type(provider) is not DefaultJSONProvider
+        or not provider.ensure_ascii
+        or not provider.sort_keys
+        or provider.compact is False
+        or (provider.compact is None and current_app.debug)
+    ):
+        return None
+    try:
+        body = orjson.dumps(data, default=_unsupported, option=_ORJSON_OPTIONS)
+    except TypeError:
+        return None
+    # ensure_ascii escapes non-ASCII characters and DEL; orjson writes them raw
+    if not body.isascii() or b"\x7f" in body:
+        return None
+    return body + b"\n"
+
+
+def _unsupported(value: Any) -> Any:
+    raise TypeError
+
@@ -0,0 +1,129 @@
+"""
+Rewrite exploratory ``run_sql`` queries to read a sample of each table.
+
+The query is parsed with sqlglot in the dialect of the database's engine spec
+and every base table gets the engine's native sampling clause, rendered by
+sqlglot for that dialect:
+
+    FROM orders o JOIN customers c  ->  FROM orders AS o TABLESAMPLE SYSTEM (1)
+                                        JOIN customers AS c TABLESAMPLE SYSTEM (1)
+
+Block sampling (``SYSTEM``) reads only a fraction of the storage, which is
+what makes the query fast. Table references are not wrapped in subqueries,
+so qualified column references keep resolving. Names defined by a ``WITH``
+clause, table functions and tables that already have a sample are left
+alone.
+
+``sample_sql`` returns None when the query cannot be sampled: sqlglot is not
+installed, the engine has no known dialect, the SQL does not parse as a
+single query, or the dialect has no ``TABLESAMPLE`` (sqlglot reports it as
+unsupported). Callers then run the query unsampled and label the result.
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Any, NamedTuple
+
+try:
+    import sqlglot
+    from sqlglot import exp
+    from sqlglot.errors import ErrorLevel, SqlglotError
+except ImportError:
+    sqlglot = None  # type: ignore[assignment]
+
+try:
+    from superset.sql.parse import SQLGLOT_DIALECTS
+except ImportError:
+    try:
+        from superset.sql_parse import SQLGLOT_DIALECTS
+    except ImportError:
+        # Engine names that differ from their sqlglot dialect; the rest match
+        SQLGLOT_DIALECTS = {"postgresql": "postgres", "mssql": "tsql", "clickhousedb": "clickhouse"}
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SAMPLE_PERCENT = 1.0
+
+# sqlglot dialect -> sampling method keyword; dialects not listed use SYSTEM
+SAMPLE_METHODS: dict[str, str | None] = {
+    "oracle": None,  # SAMPLE (n)
+}
+# ClickHouse's SAMPLE needs a SAMPLE BY key on the table and goes after FINAL
+UNSUPPORTED_DIALECTS = frozenset({"clickhouse"})
+# RAND() is evaluated once per query on SQL Server, so it cannot order rows randomly
+RANDOM_ORDER_OVERRIDES = {"tsql": "NEWID()"}
+
+
+class SampledQuery(NamedTuple):
+    sql: str
+    tables: int  # number of base tables read through a sample
+
+
+def dialect_for(engine: str) -> str | None:
+    """Return the sqlglot dialect name for a Superset engine name, or None if unknown."""
+    if sqlglot is None or not isinstance(engine, str) or not engine:
+        return None
+    dialect: Any = SQLGLOT_DIALECTS.get(engine, engine)
+    name = getattr(dialect, "value", dialect)
+    if not isinstance(name, str):
+        # A Dialect subclass registered by Superset itself
+        name = getattr(dialect, "__name__", "").lower()
+    try:
+        sqlglot.Dialect.get_or_raise(name)
+    except (ValueError, SqlglotError):
+        return None
+    return name
+
+
+def sample_sql(sql: str, engine: str, percent: float = DEFAULT_SAMPLE_PERCENT) -> SampledQuery | None:
+    """
+    Return ``sql`` with every base table sampled at ``percent``, or None if that is not possible.
+
+    Args:
+        sql: A single SELECT (or set operation) query.
+        engine: ``database.db_engine_spec.engine``.
+        percent: Sampling rate in percent, between 0 and 100.
+    """
+    dialect = dialect_for(engine)
+    if dialect is None or dialect in UNSUPPORTED_DIALECTS:
+        return None
+    try:
+        statements = sqlglot.parse(sql, dialect=dialect)
+    except SqlglotError:
+        return None
+    if len(statements) != 1 or not isinstance(statements[0], exp.Query):
+        return None
+    tree = statements[0]
+
+    ctes = {cte.alias_or_name for cte in tree.find_all(exp.CTE)}
+    method = SAMPLE_METHODS.get(dialect, "SYSTEM")
+    tables = 0
+    for table in tree.find_all(exp.Table):
+        if not isinstance(table.this, exp.Identifier) or table.args.get("sample"):
+            continue  # table function, or already sampled
+        if not table.db and table.name in ctes:
+            continue
+        table.set(
+            "sample",
+            exp.TableSample(
+                method=exp.var(method) if method else None,
+                percent=exp.Literal.number(f"{percent:g}"),
+            ),
+        )
+        tables += 1
+    if not tables:
+        return None
+    try:
+        return SampledQuery(tree.sql(dialect=dialect, unsupported_level=ErrorLevel.RAISE), tables)
+    except SqlglotError as exc:
+        logger.debug("Cannot sample query for %s: %s", dialect, exc)
+        return None
+
+
+def random_order(engine: str) -> str:
+    """Return an ``ORDER BY`` expression that shuffles rows on ``engine``, e.g. ``RANDOM()``."""
+    dialect = dialect_for(engine)
+    if dialect is None:
+        return "RANDOM()"
+    return RANDOM_ORDER_OVERRIDES.get(dialect) or exp.Rand().sql(dialect=dialect)
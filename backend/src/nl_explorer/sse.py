@@ -0,0 +1,102 @@
+"""
+Server-sent event framing for streamed chat output.
+
+LiteLLM yields deltas of a few characters each. Sending one ``data:`` frame
+per delta means one ``json.dumps``, one SSE frame and one WSGI flush per
+delta. ``coalesce`` buffers deltas and emits a frame when a delta arrives
+``interval_ms`` or more after the last frame, or once ``max_bytes`` of UTF-8
+text have accumulated. The check runs as each delta arrives, on the request
+thread; text buffered when the model pauses goes out with the next delta or
+at the end of the stream.
+
+``gzip_stream`` optionally compresses the whole event stream with one gzip
+member. Every frame is sync-flushed so the client can decode it right away.
+Delta, frame and byte counts (before and after gzip) are exported through
+``metrics`` when a stream ends.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import time
+import zlib
+from collections.abc import Iterable, Iterator
+
+from nl_explorer import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FRAME_INTERVAL_MS = 30
+DEFAULT_FRAME_MAX_BYTES = 512
+
+def text_event(text: str) -> str:
+    return f'data: {json.dumps({"type": "text", "content": text})}\n\n'
+
+
+def coalesce(
+    deltas: Iterable[str],
+    interval_ms: float = DEFAULT_FRAME_INTERVAL_MS,
+    max_bytes: int = DEFAULT_FRAME_MAX_BYTES,
+) -> Iterator[str]:
+    """
+    Group text deltas into SSE text frames, followed by ``data: [DONE]``.
+
+    Args:
+        deltas: Text fragments in order.
+        interval_ms: Emit a frame when a delta arrives this long after the last frame.
+        max_bytes: Emit a frame once this many UTF-8 bytes of text are buffered.
+    """
+    interval = interval_ms / 1000
+    buffer: list[str] = []
+    size = 0
+    n_deltas = n_frames = n_bytes = 0
+    last = time.monotonic()
+    try:
+        for delta in deltas:
+            n_deltas += 1
+            buffer.append(delta)
+            size += len(delta.encode("utf-8"))
+            now = time.monotonic()
+            if size >= max_bytes or now - last >= interval:
+                frame = text_event("".join(buffer))
+                buffer, size, last = [], 0, now
+                n_frames += 1
+                n_bytes += len(frame)
+                yield frame
+        if buffer:
+            frame = text_event("".join(buffer))
+            n_frames += 1
+            n_bytes += len(frame)
+            yield frame
+        yield "data: [DONE]\n\n"
+    finally:
+        logger.debug("Chat stream: %d deltas in %d frames, %d bytes", n_deltas, n_frames, n_bytes)
+        metrics.inc("nl_explorer_sse_deltas_total", n_deltas)
+        metrics.inc("nl_explorer_sse_frames_total", n_frames)
+        metrics.inc("nl_explorer_sse_bytes_total", n_bytes, encoding="identity")
+
+
+def accepts_gzip(accept_encoding: str | None) -> bool:
+    """Return True if an ``Accept-Encoding`` header allows gzip."""
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if coding.strip().lower() in ("gzip", "*"):
+            return params.replace(" ", "") not in ("q=0", "q=0.0")
+    return False
+
+
+def gzip_stream(frames: Iterable[str]) -> Iterator[bytes]:
+    """Gzip an event stream, sync-flushing after every frame."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    written = 0
+    try:
+        for frame in frames:
+            chunk = compressor.compress(frame.encode("utf-8")) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            written += len(chunk)
+            yield chunk
+        tail = compressor.flush(zlib.Z_FINISH)
+        written += len(tail)
+        yield tail
+    finally:
+        metrics.inc("nl_explorer_sse_bytes_total", written, encoding="gzip")
@@ -0,0 +1,69 @@
+"""
+Per-turn memo of idempotent tool results.
+
+Models often repeat the same ``list_datasets`` or ``get_dataset_schema``
+call with identical arguments within one tool loop. The memo keys results by
+tool name, canonical JSON arguments and schema scope, and answers repeats
+without calling Superset again.
+
+The memo lives for a single chat turn only. Dataset access is checked on
+every call that reaches Superset, so a result is never reused after the
+request that was authorized to see it, and a new turn picks up revoked
+access, edited datasets and freshly computed column profiles. Error results
+are not memoized.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+from typing import Any
+
+from nl_explorer import llm_service
+
+logger = logging.getLogger(__name__)
+
+# Tools whose result depends only on their arguments and the catalogue.
+MEMOIZED_TOOLS = frozenset({"list_datasets", "get_dataset_schema"})
+
+
+def _canonical(tool_name: str, arguments: dict[str, Any], allowed_schemas: list[str] | None) -> str:
+    scope = sorted(allowed_schemas) if allowed_schemas else None
+    return json.dumps([tool_name, arguments, scope], sort_keys=True, separators=(",", ":"), default=str)
+
+
+def _is_error(content: str) -> bool:
+    try:
+        payload = json.loads(content)
+    except ValueError:
+        return True
+    return isinstance(payload, dict) and "error" in payload
+
+
+class ToolMemo:
+    """Memo table for one chat turn, wrapping ``llm_service.dispatch_tool_call``."""
+
+    def __init__(self) -> None:
+        self._table: dict[str, str] = {}
+        self.hits = 0
+
+    def dispatch(
+        self,
+        tool_name: str,
+        arguments: dict[str, Any],
+        allowed_schemas: list[str] | None = None,
+    ) -> dict[str, Any]:
+        """Same as ``llm_service.dispatch_tool_call``, answering repeats from the memo."""
+        if tool_name not in MEMOIZED_TOOLS:
+            return llm_service.dispatch_tool_call(tool_name, arguments, allowed_schemas=allowed_schemas)
+
+        key = _canonical(tool_name, arguments, allowed_schemas)
+        content = self._table.get(key)
+        if content is not None:
+            self.hits += 1
+            logger.debug("Tool memo hit for %s", tool_name)
+            return {"role": "tool", "name": tool_name, "content": content}
+        result = llm_service.dispatch_tool_call(tool_name, arguments, allowed_schemas=allowed_schemas)
+        if not _is_error(result["content"]):
+            self._table[key] = result["content"]
+        return result
@@ -0,0 +1,114 @@
+"""
+Validation of tool arguments against the parameter schemas in ``TOOLS``.
+
+Each tool's JSON Schema is compiled once, at import, into a tree of small
+closures. Validating a call is then a handful of ``isinstance`` checks with
+no schema walking or keyword lookups. Only the keywords ``TOOLS`` uses are
+supported: ``type`` (a name or a list of names), ``properties``,
+``required``, ``items`` and ``enum``. Annotations such as ``description``
+and ``default`` are ignored.
+
+Errors use the same ``{"field", "message"}`` shape as the form_data
+validator, with paths like ``charts[0].viz_type``. They go back to the model
+so it can fix the call in the same round.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Callable
+
+from nl_explorer.prompts.tools import TOOLS
+
+# (value, path, errors) -> None; appends to errors
+Validator = Callable[[Any, str, list[dict[str, str]]], None]
+
+_TYPE_CHECKS: dict[str, Callable[[Any], bool]] = {
+    "object": lambda v: isinstance(v, dict),
+    "array": lambda v: isinstance(v, list),
+    "string": lambda v: isinstance(v, str),
+    "boolean": lambda v: isinstance(v, bool),
+    "integer": lambda v: not isinstance(v, bool) and (isinstance(v, int) or (isinstance(v, float) and v.is_integer())),
+    "number": lambda v: not isinstance(v, bool) and isinstance(v, (int, float)),
+    "null": lambda v: v is None,
+}
+
+
+def _join(path: str, key: str) -> str:
+    return f"{path}.{key}" if path else key
+
+
+def compile_schema(schema: dict[str, Any]) -> Validator:
+    """Compile a JSON Schema (subset) into a validator function."""
+    checks: list[Validator] = []
+
+    enum = schema.get("enum")
+    if enum is not None:
+        allowed = list(enum)
+        message = "Must be one of: " + ", ".join(str(v) for v in allowed) + "."
+
+        def check_enum(value: Any, path: str, errors: list[dict[str, str]]) -> None:
+            if value not in allowed:
+                errors.append({"field": path, "message": message})
+
+        checks.append(check_enum)
+
+    properties = {key: compile_schema(sub) for key, sub in schema.get("properties", {}).items()}
+    required = tuple(schema.get("required", ()))
+    if properties or required:
+
+        def check_object(value: Any, path: str, errors: list[dict[str, str]]) -> None:
+            if not isinstance(value, dict):
+                return
+            for key in required:
+                if key not in value:
+                    errors.append({"field": _join(path, key), "message": f"'{key}' is required."})
+            for key, validate in properties.items():
+                if key in value:
+                    validate(value[key], _join(path, key), errors)
+
+        checks.append(check_object)
+
+    if "items" in schema:
+        validate_item = compile_schema(schema["items"])
+
+        def check_items(value: Any, path: str, errors: list[dict[str, str]]) -> None:
+            if isinstance(value, list):
+                for idx, item in enumerate(value):
+                    validate_item(item, f"{path}[{idx}]", errors)
+
+        checks.append(check_items)
+
+    types = schema.get("type")
+    if types is None:
+        type_ok: Callable[[Any], bool] | None = None
+    else:
+        names = [types] if isinstance(types, str) else list(types)
+        type_checks = tuple(_TYPE_CHECKS[name] for name in names)
+        expected = " or ".join(names)
+
+        def type_ok(value: Any) -> bool:
+            return any(check(value) for check in type_checks)
+
+    def validate(value: Any, path: str, errors: list[dict[str, str]]) -> None:
+        if type_ok is not None and not type_ok(value):
+            errors.append({"field": path or "arguments", "message": f"Expected {expected}, got {type(value).__name__}."})
+            return
+        for check in checks:
+            check(value, path, errors)
+
+    return validate
+
+
+VALIDATORS: dict[str, Validator] = {
+    tool["function"]["name"]: compile_schema(tool["function"].get("parameters", {})) for tool in TOOLS
+}
+
+
+def validate_arguments(tool_name: str, arguments: Any) -> list[dict[str, str]]:
+    """Return the validation errors of a tool call; empty if valid or the tool has no schema."""
+    validate = VALIDATORS.get(tool_name)
+    if validate is None:
+        return []
+    errors: list[dict[str, str]] = []
+    validate(arguments, "", errors)
+    return errors
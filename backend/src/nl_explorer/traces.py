@@ -0,0 +1,180 @@
+"""
+Opt-in recording of anonymized chat traces.
+
+With ``trace_file`` set in ``NL_EXPLORER_CONFIG``, a fraction
+(``trace_sample_rate``, default all) of ``/chat`` turns that reach the LLM
+are appended to that file as one JSON line each. A line holds the request,
+the dataset context, and the ordered events of the turn: every LLM call
+(messages, response, tool calls, token usage, latency) and every tool call
+(arguments, result, latency).
+
+Strings are replaced by pseudonyms of the same length: an HMAC-SHA256 of the
+string keyed with ``trace_secret`` (default: derived from the app's
+``SECRET_KEY``), so they cannot be reversed by hashing likely values without
+the secret. The same string always maps to the same pseudonym, so column
+names in a recorded chart config still match the recorded schema. Numbers
+that are data rather than structure (``run_sql`` rows, profile values, filter
+comparators) are zeroed; other numbers, booleans, message roles and tool
+names are kept. ``benchmarks/replay.py`` feeds these traces back through the
+API.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import hmac
+import json
+import logging
+import random
+import secrets
+import threading
+import time
+import uuid
+from typing import Any
+
+from flask import current_app, g, has_app_context, has_request_context
+
+logger = logging.getLogger(__name__)
+
+# Keys whose string values describe structure rather than user data.
+KEEP_KEYS = frozenset({
+    "role", "type", "tool_call_id", "viz_type", "expressionType", "aggregate", "operator", "clause",
+    "query_mode", "time_grain_sqla", "template",
+})
+
+# Keys whose values (at any depth) are user data; numbers under them are zeroed.
+DATA_KEYS = frozenset({"rows", "top_values", "min", "max", "comparator"})
+
+_write_lock = threading.Lock()
+# Used without an app context or SECRET_KEY; pseudonyms then only match within this process
+_process_secret = secrets.token_bytes(32)
+
+
+def pseudonym_key() -> bytes:
+    """The HMAC key for pseudonyms; resolve it in the request thread and pass it to other threads."""
+    if not has_app_context():
+        return _process_secret
+    configured = current_app.config.get("NL_EXPLORER_CONFIG", {}).get("trace_secret")
+    if configured:
+        return str(configured).encode("utf-8")
+    secret_key = current_app.config.get("SECRET_KEY")
+    if not secret_key:
+        return _process_secret
+    raw = secret_key if isinstance(secret_key, bytes) else str(secret_key).encode("utf-8")
+    # Derive a separate key so trace pseudonyms never expose anything signed with SECRET_KEY
+    return hmac.new(raw, b"nl_explorer.traces", hashlib.sha256).digest()
+
+
+def pseudonym(text: str, secret: bytes | None = None) -> str:
+    """Keyed, deterministic same-length replacement for ``text``."""
+    if not text:
+        return text
+    digest = hmac.new(secret or pseudonym_key(), text.encode("utf-8"), hashlib.sha256).hexdigest()
+    return (digest * (len(text) // len(digest) + 1))[: len(text)]
+
+
+def anonymize(value: Any, key: str | None = None, secret: bytes | None = None, data: bool = False) -> Any:
+    """Replace the strings (and data numbers) in a JSON-like value, keeping keys and structure."""
+    secret = secret or pseudonym_key()
+    data = data or key in DATA_KEYS
+    if isinstance(value, dict):
+        return {k: anonymize(v, k, secret, data) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [anonymize(v, key, secret, data) for v in value]
+    if isinstance(value, str):
+        return value if key in KEEP_KEYS and not data else pseudonym(value, secret)
+    if data and isinstance(value, (int, float)) and not isinstance(value, bool):
+        return type(value)(0)
+    return value
+
+
+def begin(req: dict[str, Any], ctx: dict[str, Any]) -> dict[str, Any] | None:
+    """Start recording the current chat turn, if tracing is enabled and sampled."""
+    cfg = current_app.config.get("NL_EXPLORER_CONFIG", {})
+    if not cfg.get("trace_file") or random.random() >= float(cfg.get("trace_sample_rate", 1.0)):
+        return None
+    trace = {
+        "id": uuid.uuid4().hex,
+        "recorded_at": time.time(),
+        "path": cfg["trace_file"],
+        "request": anonymize(req),
+        "context": anonymize(ctx),
+        "events": [],
+        "sent": 0,
+    }
+    g.nl_explorer_trace = trace
+    return trace
+
+
+def current() -> dict[str, Any] | None:
+    if not has_request_context():
+        return None
+    return g.get("nl_explorer_trace")
+
+
+def record_llm(
+    messages: list[dict[str, Any]],
+    stream: bool,
+    elapsed: float,
+    result: dict[str, Any] | None = None,
+) -> dict[str, Any] | None:
+    """
+    Record an LLM call. Returns the event so a stream can fill in ``chunks``.
+
+    ``elapsed`` is the full call for a synchronous call and the time to the
+    first chunk for a stream.
+    """
+    trace = current()
+    if trace is None:
+        return None
+    # Only the messages added since the previous LLM call of the turn
+    event: dict[str, Any] = {
+        "kind": "llm",
+        "stream": stream,
+        "elapsed": elapsed,
+        "messages": anonymize(messages[trace["sent"]:]),
+    }
+    trace["sent"] = len(messages)
+    if result is not None:
+        event["message"] = anonymize(result.get("message", ""))
+        event["tool_calls"] = [
+            {"id": tc["id"], "name": tc["name"], "arguments": anonymize(tc["arguments"])}
+            for tc in result.get("tool_calls", [])
+        ]
+        event["usage"] = result.get("usage", {})
+    else:
+        event["chunks"] = []
+    trace["events"].append(event)
+    return event
+
+
+def record_tool(tool_name: str, arguments: dict[str, Any], result: Any, elapsed: float) -> None:
+    """Record a tool call and its result."""
+    trace = current()
+    if trace is None:
+        return
+    trace["events"].append({
+        "kind": "tool",
+        "name": tool_name,
+        "elapsed": elapsed,
+        "arguments": anonymize(arguments),
+        "result": anonymize(result),
+    })
+
+
+def end(trace: dict[str, Any] | None) -> None:
+    """Append a finished trace to its file."""
+    if trace is None:
+        return
+    line = json.dumps({k: v for k, v in trace.items() if k not in ("path", "sent")}, default=str)
+    try:
+        with _write_lock, open(trace["path"], "a") as fh:
+            fh.write(line + "\n")
+    except OSError:
+        logger.warning("Could not write chat trace to %s", trace["path"], exc_info=True)
+
+
+def load(path: str) -> list[dict[str, Any]]:
+    """Read the traces of a trace file."""
+    with open(path) as fh:
+        return [json.loads(line) for line in fh if line.strip()]
@@ -0,0 +1,49 @@
+"""
+Server-side overhead of recorded chat turns, replayed with the LLM and tools stubbed.
+
+Record traces in production with ``NL_EXPLORER_CONFIG["trace_file"]``, copy
+the file here, and compare ``server ms`` before and after a change. LLM and
+tool latencies are the recorded ones, for reference.
+
+Usage:
+    python benchmarks/bench_replay.py TRACE_FILE [--runs N] [--config JSON]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+
+import replay
+
+from nl_explorer import traces
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("trace_file")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--config", default="{}", help="NL_EXPLORER_CONFIG overrides as JSON")
+    args = parser.parse_args()
+
+    app = replay.make_app(json.loads(args.config))
+    recorded = traces.load(args.trace_file)
+
+    print(f"{'trace':<34} {'server ms':>10} {'llm ms':>9} {'tool ms':>9} {'llm':>4} {'tools':>6}")
+    totals = []
+    for trace in recorded:
+        runs = [replay.replay(trace, app) for _ in range(args.runs)]
+        server_ms = statistics.median(r["server_ms"] for r in runs)
+        totals.append(server_ms)
+        row = runs[-1]
+        print(
+            f"{row['id']:<34} {server_ms:>10.2f} {row['llm_ms']:>9.0f} {row['tool_ms']:>9.0f} "
+            f"{row['llm_calls']:>4} {row['tool_calls']:>6}"
+        )
+    if totals:
+        print(f"\n{len(totals)} traces, total server ms {sum(totals):.1f}, median {statistics.median(totals):.2f}")
+
+
+if __name__ == "__main__":
+    main()
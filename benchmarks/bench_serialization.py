@@ -0,0 +1,97 @@
+"""
+CPU cost of serializing /context and /chat responses: per-request marshmallow dump + jsonify vs the compiled fast path.
+
+Builds synthetic catalogues of increasing size, checks that both paths
+produce byte-identical bodies, and reports CPU time per response.
+
+Usage:
+    python benchmarks/bench_serialization.py [--datasets 50,200,500] [--columns 40] [--runs 50]
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+from flask import Flask, jsonify
+
+from nl_explorer import serialization
+from nl_explorer.schemas import ChatResponseSchema, ContextResponseSchema
+
+
+def catalogue(n_datasets: int, n_columns: int) -> dict:
+    return {
+        "version": "0123456789abcdef0123",
+        "datasets": [
+            {
+                "id": i,
+                "name": f"schema_{i % 7}.table_{i}",
+                "description": f"Dataset {i} with daily facts" if i % 3 else None,
+                "columns": [
+                    {"name": f"col_{j}", "type": "VARCHAR" if j % 2 else "BIGINT", "description": None}
+                    for j in range(n_columns)
+                ],
+                "metrics": [{"name": "count", "expression": "COUNT(*)", "description": None}],
+                "owners": ["not in the schema"],
+            }
+            for i in range(n_datasets)
+        ],
+    }
+
+
+def conversation(n_turns: int) -> dict:
+    turns = [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"Turn {i}: show revenue by region for Q{i % 4 + 1}"}
+        for i in range(n_turns)
+    ]
+    return {"message": turns[-1]["content"], "actions": [], "conversation": turns}
+
+
+def baseline(schema_cls: type, payload: dict) -> bytes:
+    return jsonify(**schema_cls().dump(payload)).get_data()
+
+
+def fast(dumper: serialization.FastDumper, payload: dict) -> bytes:
+    data, exact = dumper.dump(payload)
+    body = serialization.encode(data) if exact else None
+    return body if body is not None else jsonify(**data).get_data()
+
+
+def cpu_ms(fn, runs: int) -> float:
+    start = time.process_time()
+    for _ in range(runs):
+        fn()
+    return (time.process_time() - start) * 1000 / runs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--datasets", default="50,200,500")
+    parser.add_argument("--columns", type=int, default=40)
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    context_dumper = serialization.FastDumper(ContextResponseSchema())
+    chat_dumper = serialization.FastDumper(ChatResponseSchema())
+    cases = [
+        (f"context {n}x{args.columns}", ContextResponseSchema, context_dumper, catalogue(int(n), args.columns))
+        for n in args.datasets.split(",")
+    ] + [("chat 40 turns", ChatResponseSchema, chat_dumper, conversation(40))]
+
+    print(f"orjson: {'yes' if serialization.orjson is not None else 'no (compiled dump only)'}")
+    print(f"{'payload':<22} {'KiB':>7} {'dump+jsonify ms':>16} {'fast ms':>9} {'speedup':>8}")
+    with app.app_context():
+        for label, schema_cls, dumper, payload in cases:
+            expected = baseline(schema_cls, payload)
+            assert fast(dumper, payload) == expected, f"{label}: fast path output differs"
+            slow_ms = cpu_ms(lambda: baseline(schema_cls, payload), args.runs)
+            fast_ms = cpu_ms(lambda: fast(dumper, payload), args.runs)
+            print(
+                f"{label:<22} {len(expected) / 1024:>7.0f} {slow_ms:>16.2f} {fast_ms:>9.2f} "
+                f"{slow_ms / fast_ms:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
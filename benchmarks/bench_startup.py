@@ -0,0 +1,71 @@
+"""
+Startup cost of importing the NL Explorer REST API in a fresh interpreter.
+
+Compares the lazy default (what every Superset web/Celery worker pays when
+``entrypoint.register`` imports ``nl_explorer.api``) with the eager import of
+litellm (the previous behaviour, and what ``preload_llm`` moves into the
+gunicorn master).
+
+Usage:
+    python benchmarks/bench_startup.py [--runs N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+_PROBE = """
+import json, resource, sys, time
+t0 = time.perf_counter()
+import nl_explorer.api
+if {eager!r}:
+    from nl_explorer import llm_service
+    llm_service.preload()
+elapsed = time.perf_counter() - t0
+print(json.dumps({{
+    "import_ms": elapsed * 1000,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "litellm_loaded": "litellm" in sys.modules,
+}}))
+"""
+
+
+def _measure(eager: bool, runs: int) -> dict[str, float]:
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", _PROBE.format(eager=eager)],
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+        samples.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return {
+        "import_ms": statistics.median(s["import_ms"] for s in samples),
+        "max_rss_mb": statistics.median(s["max_rss_mb"] for s in samples),
+        "litellm_loaded": samples[-1]["litellm_loaded"],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    eager = _measure(eager=True, runs=args.runs)
+    lazy = _measure(eager=False, runs=args.runs)
+
+    print(f"{'mode':<8} {'import ms':>10} {'max RSS MB':>11} {'litellm':>8}")
+    for name, row in (("eager", eager), ("lazy", lazy)):
+        print(
+            f"{name:<8} {row['import_ms']:>10.1f} {row['max_rss_mb']:>11.1f} "
+            f"{'yes' if row['litellm_loaded'] else 'no':>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+"""
+Efficiency of chat turns: LLM rounds, tokens and tool calls per task.
+
+Each task is a user question against a seeded SQLite catalogue (orders,
+customers, web_events), run through the real chat view with the same stubs
+as ``benchmarks/replay.py``. Datasets and schemas come from the SQLite tables,
+``run_sql`` runs against SQLite, and chart tools run the real form_data
+validation but do not write anything.
+
+The model is either scripted (the default: a fixed plan per task that
+reacts to validation errors, with token usage estimated at 4 characters per
+token) or any LiteLLM model string, e.g. a local ``ollama/llama3``. Use it to
+compare changes to ``build_system_prompt``, ``TOOLS`` or the context: the
+scripted model shows prompt-size effects, and a real model also shows
+changes in rounds and failed previews.
+
+Usage:
+    python benchmarks/eval_efficiency.py [--model scripted|<litellm model>] [--api-base URL]
+        [--task NAME] [--json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import inspect
+import json
+import random
+import sqlite3
+from contextlib import ExitStack
+from types import SimpleNamespace
+from typing import Any, Callable
+from unittest.mock import patch
+
+import replay
+
+from nl_explorer import chart_creator, context_builder, llm_service
+
+ORDERS, CUSTOMERS, WEB_EVENTS = 1, 2, 3
+
+_DDL = {
+    ORDERS: (
+        "orders",
+        "Sales orders, one row per order line",
+        "CREATE TABLE orders (id INTEGER, order_date DATE, region TEXT, product TEXT, "
+        "customer_id INTEGER, amount FLOAT, quantity INTEGER)",
+    ),
+    CUSTOMERS: (
+        "customers",
+        "Customer master data",
+        "CREATE TABLE customers (id INTEGER, name TEXT, country TEXT, segment TEXT, signup_date DATE)",
+    ),
+    WEB_EVENTS: (
+        "web_events",
+        "Page views on the web shop",
+        "CREATE TABLE web_events (ts DATETIME, page TEXT, user_id INTEGER, duration_ms INTEGER, device TEXT)",
+    ),
+}
+
+
+def seed() -> sqlite3.Connection:
+    """Create and fill the SQLite catalogue deterministically."""
+    rng = random.Random(42)
+    conn = sqlite3.connect(":memory:", check_same_thread=False)
+    for _, _, ddl in _DDL.values():
+        conn.execute(ddl)
+    regions, products = ["EMEA", "AMER", "APAC"], ["widget", "gadget", "gizmo", "doohickey"]
+    conn.executemany(
+        "INSERT INTO orders VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [
+            (i, f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}", rng.choice(regions),
+             rng.choice(products), rng.randint(1, 200), round(rng.uniform(5, 500), 2), rng.randint(1, 9))
+            for i in range(2000)
+        ],
+    )
+    conn.executemany(
+        "INSERT INTO customers VALUES (?, ?, ?, ?, ?)",
+        [
+            (i, f"customer {i}", rng.choice(["DE", "US", "JP", "FR", "BR"]), rng.choice(["smb", "enterprise"]),
+             f"2023-{rng.randint(1, 12):02d}-01")
+            for i in range(1, 201)
+        ],
+    )
+    conn.executemany(
+        "INSERT INTO web_events VALUES (?, ?, ?, ?, ?)",
+        [
+            (f"2024-06-{rng.randint(1, 30):02d} {rng.randint(0, 23):02d}:00:00", rng.choice(["/", "/cart", "/pdp"]),
+             rng.randint(1, 200), rng.randint(100, 60000), rng.choice(["mobile", "desktop"]))
+            for _ in range(3000)
+        ],
+    )
+    return conn
+
+
+def catalogue(conn: sqlite3.Connection) -> list[dict[str, Any]]:
+    """Serialize the tables like ``context_builder.get_dataset_schema``."""
+    datasets = []
+    for dataset_id, (table, description, _) in _DDL.items():
+        columns = [
+            {"name": row[1], "type": row[2], "description": None}
+            for row in conn.execute(f"PRAGMA table_info({table})")
+        ]
+        datasets.append({
+            "id": dataset_id,
+            "name": table,
+            "description": description,
+            "columns": columns,
+            "metrics": [{"name": "count", "expression": "COUNT(*)", "description": None}],
+        })
+    return datasets
+
+
+# --------------------------------------------------------------------------- #
+# Tasks and scripted plans
+# --------------------------------------------------------------------------- #
+
+Step = dict[str, Any] | Callable[[list[Any]], dict[str, Any]]
+
+
+def _call(name: str, **arguments: Any) -> dict[str, Any]:
+    return {"name": name, "arguments": arguments}
+
+
+def _fix_on_error(bad: dict[str, Any], good: dict[str, Any]) -> list[Step]:
+    """Try ``bad``; if the tool reports an error, send ``good``."""
+    return [
+        {"tool_calls": [bad]},
+        lambda results: {"tool_calls": [good]} if any("error" in r for r in results) else {"message": "Here you go."},
+    ]
+
+
+TASKS: dict[str, dict[str, Any]] = {
+    "bar_revenue_by_region": {
+        "question": "Bar chart of revenue by region",
+        "script": [
+            {"tool_calls": [_call("get_dataset_schema", dataset_id=ORDERS)]},
+            {"tool_calls": [_call("chart_from_template", dataset_id=ORDERS, template="bar_by_category",
+                                  slots={"dimension": "region", "measures": ["SUM(amount)"]})]},
+            {"message": "Here is revenue by region."},
+        ],
+    },
+    "orders_over_time": {
+        "question": "How did the number of orders develop over 2024, per month?",
+        "script": [
+            {"tool_calls": [_call("chart_from_template", dataset_id=ORDERS, template="line_over_time",
+                                  slots={"time": "order_date", "measures": ["COUNT(*)"], "time_grain": "P1M"})]},
+            {"message": "Monthly orders are shown in the chart."},
+        ],
+    },
+    "customers_per_country": {
+        "question": "How many customers do we have per country?",
+        "script": [
+            {"tool_calls": [_call("run_sql", database_id=1,
+                                  sql="SELECT country, COUNT(*) AS n FROM customers GROUP BY country ORDER BY n DESC")]},
+            {"message": "Customer counts per country are listed above."},
+        ],
+    },
+    "pie_quantity_by_product": {
+        "question": "Pie chart of quantity sold by product",
+        "script": [
+            *_fix_on_error(
+                _call("preview_chart", dataset_id=ORDERS, viz_type="pie",
+                      form_data={"groupby": ["prod"], "metric": "SUM(quantity)"}),
+                _call("chart_from_template", dataset_id=ORDERS, template="pie_share",
+                      slots={"dimension": "product", "measure": "SUM(quantity)"}),
+            ),
+            {"message": "Here is the share of quantity by product."},
+        ],
+    },
+    "kpi_dashboard": {
+        "question": "Create a dashboard with three KPIs: total revenue, number of orders and number of customers",
+        "script": [
+            {"tool_calls": [_call("create_charts", dashboard_title="Sales KPIs", charts=[
+                {"slice_name": "Revenue", "datasource_id": ORDERS, "viz_type": "big_number_total",
+                 "params": {"metric": {"expressionType": "SIMPLE", "column": {"column_name": "amount"},
+                                       "aggregate": "SUM", "label": "SUM(amount)"}}},
+                {"slice_name": "Orders", "datasource_id": ORDERS, "viz_type": "big_number_total",
+                 "params": {"metric": "count"}},
+                {"slice_name": "Customers", "datasource_id": CUSTOMERS, "viz_type": "big_number_total",
+                 "params": {"metric": "count"}},
+            ])]},
+            {"message": "The Sales KPIs dashboard is ready."},
+        ],
+    },
+}
+
+
+class ScriptedModel:
+    """``litellm.completion`` stand-in that follows a task script."""
+
+    def __init__(self, script: list[Step]) -> None:
+        self._script = list(script)
+        self._step = 0
+
+    def __call__(self, **kwargs: Any) -> Any:
+        messages = kwargs["messages"]
+        results = []
+        for message in reversed(messages):
+            if message["role"] != "tool":
+                break
+            results.insert(0, json.loads(message["content"]))
+        step: Any = self._script[min(self._step, len(self._script) - 1)]
+        self._step += 1
+        if callable(step):
+            step = step(results)
+
+        tool_calls = [
+            SimpleNamespace(
+                id=f"call_{self._step}_{i}",
+                function=SimpleNamespace(name=tc["name"], arguments=json.dumps(tc["arguments"])),
+            )
+            for i, tc in enumerate(step.get("tool_calls", []))
+        ]
+        content = step.get("message")
+        prompt_chars = len(json.dumps(messages)) + len(json.dumps(kwargs.get("tools") or []))
+        completion_chars = len(content or "") + sum(len(tc.function.arguments) for tc in tool_calls)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content, tool_calls=tool_calls or None))],
+            usage=SimpleNamespace(prompt_tokens=prompt_chars // 4, completion_tokens=completion_chars // 4),
+        )
+
+
+# --------------------------------------------------------------------------- #
+# Runner
+# --------------------------------------------------------------------------- #
+
+_CHART_TOOLS = frozenset({"preview_chart", "chart_from_template", "create_chart", "create_charts"})
+
+
+def run_task(name: str, model: str, api_base: str | None, conn: sqlite3.Connection) -> dict[str, Any]:
+    """Run one task and return its efficiency counters."""
+    from nl_explorer.api import NLExplorerRestApi
+
+    task = TASKS[name]
+    datasets = catalogue(conn)
+    by_id = {ds["id"]: ds for ds in datasets}
+    stats = {"task": name, "rounds": 0, "prompt_tokens": 0, "completion_tokens": 0,
+             "tool_calls": 0, "failed_previews": 0}
+
+    completion = ScriptedModel(task["script"]) if model == "scripted" else llm_service._litellm().completion
+
+    def counting_completion(**kwargs: Any) -> Any:
+        response = completion(**kwargs)
+        stats["rounds"] += 1
+        usage = getattr(response, "usage", None)
+        stats["prompt_tokens"] += int(getattr(usage, "prompt_tokens", 0) or 0)
+        stats["completion_tokens"] += int(getattr(usage, "completion_tokens", 0) or 0)
+        stats["tool_calls"] += len(response.choices[0].message.tool_calls or [])
+        return response
+
+    real_dispatch = llm_service.dispatch_tool_call
+
+    def counting_dispatch(tool_name: str, arguments: dict[str, Any], allowed_schemas: Any = None) -> dict[str, Any]:
+        result = real_dispatch(tool_name, arguments, allowed_schemas=allowed_schemas)
+        if tool_name in _CHART_TOOLS and json.loads(result["content"]).get("error"):
+            stats["failed_previews"] += 1
+        return result
+
+    def run_sql(arguments: dict[str, Any]) -> dict[str, Any]:
+        limit = int(arguments.get("limit", 100))
+        try:
+            cursor = conn.execute(arguments["sql"])
+        except sqlite3.Error as exc:
+            return {"error": str(exc)}
+        rows = cursor.fetchmany(limit)
+        return {"columns": [d[0] for d in cursor.description], "rows": [list(r) for r in rows], "row_count": len(rows)}
+
+    def create_in_transaction(specs: list[dict[str, Any]], dashboard_title: str | None = None) -> tuple[list, Any]:
+        charts = [{"chart_id": i + 1, "chart_name": s["slice_name"]} for i, s in enumerate(specs)]
+        return charts, SimpleNamespace(id=1, dashboard_title=dashboard_title)
+
+    config = {"model": model, "api_base": api_base} if model != "scripted" else {}
+    app = replay.make_app(config)
+    with ExitStack() as stack:
+        stack.enter_context(patch.object(llm_service, "litellm", SimpleNamespace(completion=counting_completion)))
+        stack.enter_context(patch.object(llm_service, "dispatch_tool_call", counting_dispatch))
+        stack.enter_context(patch.object(llm_service, "_run_sql", run_sql))
+        stack.enter_context(patch.object(context_builder, "get_user_context", lambda *a, **kw: {"datasets": datasets}))
+        stack.enter_context(
+            patch.object(context_builder, "get_dataset_schema", lambda dataset_id, **kw: by_id.get(dataset_id))
+        )
+        stack.enter_context(patch.object(chart_creator, "_create_in_transaction", create_in_transaction))
+        stack.enter_context(patch("nl_explorer.column_profiles.attach_profiles", lambda schema: schema))
+        view = inspect.unwrap(NLExplorerRestApi.chat)
+        with app.test_request_context("/api/v1/nl_explorer/chat", method="POST", json={"message": task["question"]}):
+            resp = view(NLExplorerRestApi.__new__(NLExplorerRestApi))
+    stats["status"] = resp.status_code
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--model", default="scripted")
+    parser.add_argument("--api-base", default=None)
+    parser.add_argument("--task", action="append", choices=sorted(TASKS))
+    parser.add_argument("--json", action="store_true", help="print one JSON object per task")
+    args = parser.parse_args()
+
+    conn = seed()
+    results = [run_task(name, args.model, args.api_base, conn) for name in args.task or TASKS]
+    if args.json:
+        for row in results:
+            print(json.dumps(row))
+        return
+
+    print(f"{'task':<26} {'rounds':>6} {'prompt tok':>11} {'compl tok':>10} {'tools':>6} {'failed':>7}")
+    for row in results:
+        print(
+            f"{row['task']:<26} {row['rounds']:>6} {row['prompt_tokens']:>11} {row['completion_tokens']:>10} "
+            f"{row['tool_calls']:>6} {row['failed_previews']:>7}"
+        )
+    print(
+        f"{'total':<26} {sum(r['rounds'] for r in results):>6} {sum(r['prompt_tokens'] for r in results):>11} "
+        f"{sum(r['completion_tokens'] for r in results):>10} {sum(r['tool_calls'] for r in results):>6} "
+        f"{sum(r['failed_previews'] for r in results):>7}"
+    )
+
+
+if __name__ == "__main__":
+    main()
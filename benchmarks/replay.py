@@ -0,0 +1,143 @@
+"""
+Replay recorded chat traces through the API for offline performance tests.
+
+Each trace (see ``nl_explorer.traces``) is sent to the real
+``NLExplorerRestApi.chat`` view with its recorded request. The boundaries are
+stubbed from the recording:
+
+- the dataset context (``context_builder.get_user_context``),
+- the LLM (``litellm.completion``), which answers with the recorded
+  responses, tool calls and token usage with no delay,
+- tool execution (``llm_service.dispatch_tool_call``), which returns the
+  recorded result for the same tool and arguments.
+
+What remains, and what the replay measures, is the server-side work: request
+parsing, prompt building, the tool loop and serialization. Authentication,
+admission control and the fast-path router are bypassed. Nothing is carried
+over between replays (the tool memo is per turn), so every run of a trace
+takes the same code path.
+
+Lives in ``benchmarks/`` because it patches the package with
+``unittest.mock``; import it as ``replay`` with this directory on the path.
+"""
+
+from __future__ import annotations
+
+import inspect
+import json
+import time
+from collections import deque
+from contextlib import ExitStack
+from types import SimpleNamespace
+from typing import Any, Iterator
+from unittest.mock import patch
+
+from flask import Flask
+
+
+def _namespace_response(event: dict[str, Any]) -> Any:
+    tool_calls = [
+        SimpleNamespace(
+            id=tc["id"],
+            function=SimpleNamespace(name=tc["name"], arguments=json.dumps(tc["arguments"])),
+        )
+        for tc in event.get("tool_calls", [])
+    ]
+    message = SimpleNamespace(content=event.get("message", ""), tool_calls=tool_calls or None)
+    usage = SimpleNamespace(**event.get("usage", {}))
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+
+def _stream_chunks(event: dict[str, Any]) -> Iterator[Any]:
+    for text in event.get("chunks", []):
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+class ScriptedCompletion:
+    """Stand-in for ``litellm.completion`` answering with recorded LLM events."""
+
+    def __init__(self, events: list[dict[str, Any]]) -> None:
+        self._events = deque(e for e in events if e["kind"] == "llm")
+        self.calls = 0
+
+    def __call__(self, **kwargs: Any) -> Any:
+        self.calls += 1
+        if not self._events:
+            return _namespace_response({"message": ""})
+        event = self._events.popleft()
+        if kwargs.get("stream"):
+            return _stream_chunks(event)
+        return _namespace_response(event)
+
+
+class RecordedTools:
+    """Stand-in for ``dispatch_tool_call`` returning recorded tool results."""
+
+    def __init__(self, events: list[dict[str, Any]]) -> None:
+        self._results: dict[str, deque[Any]] = {}
+        for event in events:
+            if event["kind"] == "tool":
+                self._results.setdefault(self._key(event["name"], event["arguments"]), deque()).append(event["result"])
+        self.calls = 0
+
+    @staticmethod
+    def _key(tool_name: str, arguments: dict[str, Any]) -> str:
+        return json.dumps([tool_name, arguments], sort_keys=True)
+
+    def __call__(self, tool_name: str, arguments: dict[str, Any], allowed_schemas: list[str] | None = None) -> dict[str, Any]:
+        self.calls += 1
+        queue = self._results.get(self._key(tool_name, arguments))
+        result = (queue.popleft() if len(queue) > 1 else queue[0]) if queue else {"error": "not recorded"}
+        return {"role": "tool", "name": tool_name, "content": json.dumps(result)}
+
+
+def make_app(config: dict[str, Any] | None = None) -> Flask:
+    """Minimal Flask app for replays; ``config`` overrides ``NL_EXPLORER_CONFIG``."""
+    app = Flask("nl_explorer_replay")
+    app.config["NL_EXPLORER_CONFIG"] = {"admission": False, "fast_path_router": False, **(config or {})}
+    app.config["WEBDRIVER_BASEURL"] = "http://localhost:8088/"
+    return app
+
+
+def replay(trace: dict[str, Any], app: Flask) -> dict[str, Any]:
+    """
+    Replay one trace and return its server-side timing.
+
+    Returns:
+        Dict with the trace id, ``server_ms`` (time spent in the view, including
+        consuming a streamed body), the recorded ``llm_ms`` and ``tool_ms``,
+        the number of LLM and tool calls made, and the HTTP status.
+    """
+    from nl_explorer import context_builder, llm_service
+    from nl_explorer.api import NLExplorerRestApi
+
+    events = trace["events"]
+    completion = ScriptedCompletion(events)
+    tools = RecordedTools(events)
+    view = inspect.unwrap(NLExplorerRestApi.chat)
+    api = NLExplorerRestApi.__new__(NLExplorerRestApi)
+
+    with ExitStack() as stack:
+        stack.enter_context(patch.object(llm_service, "litellm", SimpleNamespace(completion=completion)))
+        stack.enter_context(patch.object(llm_service, "dispatch_tool_call", tools))
+        stack.enter_context(
+            patch.object(context_builder, "get_user_context", lambda *a, **kw: trace["context"])
+        )
+        with app.test_request_context("/api/v1/nl_explorer/chat", method="POST", json=trace["request"]):
+            started = time.perf_counter()
+            resp = view(api)
+            if resp.is_streamed:
+                for _ in resp.response:
+                    pass
+                resp.close()
+            server = time.perf_counter() - started
+
+    return {
+        "id": trace.get("id"),
+        "status": resp.status_code,
+        "server_ms": server * 1000,
+        "llm_ms": sum(e["elapsed"] for e in events if e["kind"] == "llm") * 1000,
+        "tool_ms": sum(e["elapsed"] for e in events if e["kind"] == "tool") * 1000,
+        "llm_calls": completion.calls,
+        "tool_calls": tools.calls,
+    }
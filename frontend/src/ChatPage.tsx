@@ -33,6 +33,8 @@ const API_BASE = "/api/v1/nl_explorer";
 
 export default function ChatPage() {
   const [conversation, setConversation] = useState<ConversationMessage[]>([]);
+  // Groups this conversation's turns in server-side chat traces
+  const [conversationId] = useState(() => crypto.randomUUID());
   const [input, setInput] = useState("");
   const [loading, setLoading] = useState(false);
   const [datasetId, setDatasetId] = useState<number | null>(null);
@@ -69,6 +71,7 @@ export default function ChatPage() {
         body: JSON.stringify({
           message: input,
           conversation: nextConversation,
+          conversation_id: conversationId,
           dataset_id: datasetId,
           page_context: pageContextRef.current,
           stream: false,
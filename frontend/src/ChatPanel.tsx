@@ -22,6 +22,8 @@ export default function ChatPanel({ datasetId, dashboardId }: ChatPanelProps) {
   const [open, setOpen] = useState(false);
   const [input, setInput] = useState("");
   const [conversation, setConversation] = useState<Message[]>([]);
+  // Groups this conversation's turns in server-side chat traces
+  const [conversationId] = useState(() => crypto.randomUUID());
   const [loading, setLoading] = useState(false);
 
   const sendMessage = async () => {
@@ -41,6 +43,7 @@ export default function ChatPanel({ datasetId, dashboardId }: ChatPanelProps) {
         body: JSON.stringify({
           message: input,
           conversation: nextConversation,
+          conversation_id: conversationId,
           dataset_id: datasetId ?? null,
           dashboard_id: dashboardId ?? null,
           stream: false,
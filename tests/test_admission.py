@@ -0,0 +1,85 @@
+"""
+Tests for nl_explorer.admission
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+
+
+def test_queue_full_and_timeout_reject_fast():
+    """Beyond the queue bound requests are rejected immediately; queued ones time out."""
+    from nl_explorer.admission import AdmissionController, AdmissionRejected
+
+    ctl = AdmissionController(max_concurrent=1, max_concurrent_per_user=1, max_queue=0, queue_timeout=0.05)
+    ctl.acquire("alice")
+
+    start = time.monotonic()
+    with pytest.raises(AdmissionRejected, match="Too many"):
+        ctl.acquire("bob")
+    assert time.monotonic() - start < 0.05
+
+    ctl.max_queue = 1
+    with pytest.raises(AdmissionRejected, match="Timed out"):
+        ctl.acquire("bob")
+    assert ctl.snapshot() == {"active": 1, "queued": 0}
+
+
+def test_slots_are_granted_round_robin_across_users():
+    """A user with many queued requests cannot starve another user."""
+    from nl_explorer.admission import AdmissionController
+
+    ctl = AdmissionController(max_concurrent=1, max_concurrent_per_user=1, max_queue=10, queue_timeout=5)
+    ctl.acquire("holder")
+    order: list[str] = []
+
+    def worker(user: str) -> None:
+        with ctl.admit(user):
+            order.append(user)
+
+    threads = []
+    for user in ("alice", "alice", "alice", "bob"):
+        t = threading.Thread(target=worker, args=(user,))
+        t.start()
+        threads.append(t)
+        time.sleep(0.02)  # deterministic arrival order
+
+    ctl.release("holder")
+    for t in threads:
+        t.join(timeout=5)
+
+    assert order == ["alice", "bob", "alice", "alice"]
+
+
+def test_token_budget_rejects_with_retry_after():
+    """Users over their tokens-per-minute budget are rejected with a Retry-After hint."""
+    from nl_explorer.admission import AdmissionController, AdmissionRejected
+
+    ctl = AdmissionController(tokens_per_minute_per_user=600)
+    with ctl.admit("alice"):
+        ctl.record_usage("alice", 1200)
+
+    with pytest.raises(AdmissionRejected) as exc_info:
+        ctl.acquire("alice")
+    assert 55 <= exc_info.value.retry_after <= 61
+    with ctl.admit("bob"):
+        pass
+
+
+def test_refilled_token_buckets_are_dropped():
+    """Buckets of users who have been idle long enough to refill are removed."""
+    from unittest.mock import patch
+
+    from nl_explorer.admission import AdmissionController
+
+    with patch("nl_explorer.admission.time.monotonic", return_value=1000.0):
+        ctl = AdmissionController(tokens_per_minute_per_user=600)
+        for user in ("alice", "bob"):
+            ctl.record_usage(user, 300)
+    with patch("nl_explorer.admission.time.monotonic", return_value=1100.0):
+        ctl.record_usage("carol", 10)
+
+    assert set(ctl._buckets) == {"carol"}
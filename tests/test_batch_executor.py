@@ -0,0 +1,104 @@
+"""
+Tests for nl_explorer.batch_executor
+"""
+
+from __future__ import annotations
+
+import threading
+from unittest.mock import patch
+
+
+@patch("nl_explorer.batch_executor.llm_service.execute_tool")
+def test_read_only_actions_run_concurrently(mock_dispatch):
+    """Independent read-only actions in one wave run at the same time."""
+    from nl_explorer.batch_executor import execute_actions
+
+    barrier = threading.Barrier(2, timeout=5)
+
+    def _dispatch(name, payload):
+        barrier.wait()  # deadlocks (and times out) if run sequentially
+        return ({"dataset_id": payload["dataset_id"]})
+
+    mock_dispatch.side_effect = _dispatch
+
+    results = execute_actions([
+        {"type": "get_dataset_schema", "payload": {"dataset_id": 1}},
+        {"type": "get_dataset_schema", "payload": {"dataset_id": 2}},
+    ])
+
+    assert [r["success"] for r in results] == [True, True]
+    assert [r["result"]["dataset_id"] for r in results] == [1, 2]
+
+
+@patch("nl_explorer.batch_executor.llm_service.execute_tool")
+def test_dependent_action_receives_referenced_ids(mock_dispatch):
+    """A dashboard action waits for its charts and gets their IDs through $ref."""
+    from nl_explorer.batch_executor import execute_actions
+
+    calls = []
+
+    def _dispatch(name, payload):
+        calls.append((name, payload))
+        if name == "create_chart":
+            return ({"chart_id": 10 + len(calls)})
+        return ({"dashboard_id": 5})
+
+    mock_dispatch.side_effect = _dispatch
+
+    results = execute_actions([
+        {"id": "c1", "type": "create_chart", "payload": {"slice_name": "A"}},
+        {"id": "c2", "type": "create_chart", "payload": {"slice_name": "B"}},
+        {
+            "id": "d",
+            "type": "create_dashboard",
+            "depends_on": ["c1", "c2"],
+            "payload": {"title": "T", "chart_ids": [{"$ref": "c1.chart_id"}, {"$ref": "c2.chart_id"}]},
+        },
+    ])
+
+    assert [name for name, _ in calls] == ["create_chart", "create_chart", "create_dashboard"]
+    assert calls[2][1]["chart_ids"] == [11, 12]
+    assert results[2]["result"] == {"dashboard_id": 5}
+
+
+@patch("nl_explorer.batch_executor.llm_service.execute_tool")
+def test_failed_dependency_skips_dependents(mock_dispatch):
+    """If a dependency fails, dependents are skipped with a per-action error."""
+    from nl_explorer.batch_executor import execute_actions
+
+    mock_dispatch.return_value = ({"error": "boom"})
+
+    results = execute_actions([
+        {"id": "c1", "type": "create_chart", "payload": {}},
+        {"id": "d", "type": "create_dashboard", "depends_on": ["c1"], "payload": {}},
+        {"id": "x", "type": "run_sql", "depends_on": ["missing"], "payload": {}},
+    ])
+
+    assert results[0]["error"] == "boom"
+    assert results[1]["error"] == "Skipped: dependency c1 failed"
+    assert results[2]["error"] == "Unknown dependencies: missing"
+    assert mock_dispatch.call_count == 1
+
+
+@patch("nl_explorer.batch_executor.llm_service.execute_tool")
+def test_writes_keep_request_order_and_default_ids_do_not_collide(mock_dispatch):
+    """A write that waits on a read still runs before later writes; "1" and the second action stay distinct."""
+    from nl_explorer.batch_executor import execute_actions
+
+    calls = []
+
+    def _dispatch(name, payload):
+        calls.append(payload["slice_name"] if name == "create_chart" else name)
+        return {"ok": True}
+
+    mock_dispatch.side_effect = _dispatch
+
+    results = execute_actions([
+        {"id": "1", "type": "get_dataset_schema", "payload": {"dataset_id": 1}},
+        {"type": "create_chart", "depends_on": ["1"], "payload": {"slice_name": "A"}},
+        {"type": "create_chart", "payload": {"slice_name": "B"}},
+    ])
+
+    assert calls == ["get_dataset_schema", "A", "B"]
+    assert [r["id"] for r in results] == ["1", "#1", "#2"]
+    assert all(r["success"] for r in results)
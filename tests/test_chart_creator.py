@@ -7,11 +7,13 @@ from __future__ import annotations
 from unittest.mock import MagicMock, patch
 
 
-def test_preview_chart_returns_explore_url(mock_flask_app):
+@patch("nl_explorer.chart_creator.validate_form_data", return_value=[])
+@patch("nl_explorer.chart_creator.context_builder")
+def test_preview_chart_returns_explore_url(_mock_ctx, _mock_validate, mock_flask_app):
     """preview_chart should return an explore URL with the correct dataset ID."""
-    from nl_explorer.chart_creator import preview_chart
+    from nl_explorer.chart_creator import preview_chart, resolve_preview_url
 
-    with mock_flask_app.app_context():
+    with mock_flask_app.app_context(), patch("nl_explorer.cache.shared", return_value=True):
         result = preview_chart(
             dataset_id=7,
             viz_type="echarts_timeseries_bar",
@@ -19,13 +21,35 @@ def test_preview_chart_returns_explore_url(mock_flask_app):
         )
 
     assert result["type"] == "explore_link"
-    assert "datasource_id=7" in result["explore_url"]
-    assert "echarts_timeseries_bar" in result["explore_url"]
+    assert result["explore_url"].endswith(f"/api/v1/nl_explorer/preview/{result['form_data_key']}")
+    assert result["viz_type"] == "echarts_timeseries_bar"
+
+    with mock_flask_app.app_context():
+        full_url = resolve_preview_url(result["form_data_key"])
+
+    assert "datasource_id=7" in full_url
+    assert "echarts_timeseries_bar" in full_url
+
+
+@patch("nl_explorer.chart_creator.validate_form_data", return_value=[])
+@patch("nl_explorer.chart_creator.context_builder")
+def test_preview_chart_inline_without_shared_cache(_mock_ctx, _mock_validate, mock_flask_app):
+    """With only the per-process cache, the form_data goes in the URL so any worker can open it."""
+    from nl_explorer.chart_creator import preview_chart
 
+    with mock_flask_app.app_context(), patch("nl_explorer.cache.shared", return_value=False):
+        result = preview_chart(dataset_id=7, viz_type="table", form_data={"groupby": ["country"]})
 
+    assert result["form_data_key"] is None
+    assert result["explore_url"].startswith("http://localhost:8088/explore/?datasource_type=table&datasource_id=7")
+    assert "form_data=" in result["explore_url"]
+
+
+@patch("nl_explorer.chart_creator.validate_form_data", return_value=[])
+@patch("nl_explorer.chart_creator.context_builder")
 @patch("nl_explorer.chart_creator.CreateChartCommand")
 @patch("nl_explorer.chart_creator.get_user")
-def test_create_chart_calls_command(mock_get_user, mock_cmd_cls, mock_flask_app):
+def test_create_chart_calls_command(mock_get_user, mock_cmd_cls, _mock_ctx, _mock_validate, mock_flask_app):
     """create_chart should invoke CreateChartCommand and return chart metadata."""
     mock_user = MagicMock()
     mock_user.id = 1
@@ -49,3 +73,153 @@ def test_create_chart_calls_command(mock_get_user, mock_cmd_cls, mock_flask_app)
     assert result["type"] == "chart_created"
     assert result["chart_id"] == 99
     assert "chart_url" in result
+
+
+@patch("nl_explorer.chart_creator.context_builder")
+def test_preview_chart_returns_validation_errors(mock_ctx, mock_flask_app):
+    """preview_chart should return precise errors instead of a link for a bad config."""
+    mock_ctx.get_dataset_schema.return_value = {
+        "id": 7,
+        "columns": [{"name": "country"}, {"name": "order_date"}],
+        "metrics": [{"name": "count"}],
+    }
+
+    from nl_explorer.chart_creator import preview_chart
+
+    with mock_flask_app.app_context():
+        result = preview_chart(
+            dataset_id=7,
+            viz_type="echarts_timeseries_bar",
+            form_data={"metrics": ["count"], "groupby": ["contry"]},
+        )
+
+    assert "explore_url" not in result
+    fields = {e["field"] for e in result["validation_errors"]}
+    assert fields == {"x_axis", "groupby[0]"}
+    assert "country" in next(e["message"] for e in result["validation_errors"] if e["field"] == "groupby[0]")
+    mock_ctx.get_dataset_schema.assert_called_once_with(7, max_columns=None)
+
+
+@patch("nl_explorer.chart_creator.validate_form_data", return_value=[])
+@patch("nl_explorer.chart_creator.context_builder")
+@patch("nl_explorer.chart_creator.DatasourceType")
+@patch("nl_explorer.chart_creator.CommandParameters")
+@patch("nl_explorer.chart_creator.CreateFormDataCommand")
+def test_preview_chart_uses_superset_form_data_key(
+    mock_cmd_cls, _mock_params, _mock_ds_type, _mock_ctx, _mock_validate, mock_flask_app
+):
+    """When Superset's explore form_data store is available, its key is used in the URL."""
+    mock_cmd_cls.return_value.run.return_value = "abc123"
+
+    from nl_explorer.chart_creator import preview_chart
+
+    with mock_flask_app.app_context():
+        result = preview_chart(dataset_id=7, viz_type="table", form_data={"groupby": ["country"]})
+
+    assert result["form_data_key"] == "abc123"
+    assert result["explore_url"] == (
+        "http://localhost:8088/explore/?form_data_key=abc123&datasource_type=table&datasource_id=7"
+    )
+
+
+@patch("nl_explorer.chart_creator.validate_form_data", return_value=[])
+@patch("nl_explorer.chart_creator.context_builder")
+@patch("nl_explorer.chart_creator.DashboardDAO")
+@patch("nl_explorer.chart_creator.CreateDashboardCommand")
+@patch("nl_explorer.chart_creator.CreateChartCommand")
+@patch("nl_explorer.chart_creator.transaction")
+@patch("nl_explorer.chart_creator.get_user")
+def test_create_dashboard_with_charts_single_transaction(
+    mock_get_user, mock_transaction, mock_chart_cmd, mock_dash_cmd, mock_dao, _mock_ctx, _mock_validate, mock_flask_app
+):
+    """Charts and the dashboard are created by Superset's commands inside one transaction."""
+    from types import SimpleNamespace
+
+    in_transaction: list[bool] = []
+
+    def _transaction():
+        def decorate(func):
+            def wrapped():
+                in_transaction.append(True)
+                return func()
+            return wrapped
+        return decorate
+
+    mock_transaction.side_effect = _transaction
+    created = iter(range(100, 110))
+
+    def _run_chart_command(actor, data):
+        assert in_transaction, "command ran outside the transaction"
+        return SimpleNamespace(id=next(created), slice_name=data["slice_name"])
+
+    mock_chart_cmd.side_effect = lambda actor, data: MagicMock(run=lambda: _run_chart_command(actor, data))
+    mock_dash_cmd.return_value.run.return_value = SimpleNamespace(id=50, dashboard_title="KPIs")
+
+    from nl_explorer.chart_creator import create_dashboard_with_charts
+
+    specs = [
+        {"slice_name": "Revenue", "datasource_id": 1, "viz_type": "big_number_total", "params": {"metric": "sum"}},
+        {"slice_name": "By region", "datasource_id": 1, "viz_type": "pie", "params": {"metric": "sum", "groupby": ["r"]}},
+    ]
+    with mock_flask_app.app_context():
+        result = create_dashboard_with_charts("KPIs", specs)
+
+    assert in_transaction == [True]
+    assert result["dashboard_id"] == 50
+    assert [c["chart_id"] for c in result["charts"]] == [100, 101]
+    assert "CHART-101" in mock_dash_cmd.call_args.kwargs["data"]["position_json"]
+    mock_dao.set_dash_to_charts.assert_called_once_with(mock_dash_cmd.return_value.run.return_value, [100, 101])
+
+
+@patch("nl_explorer.chart_creator.CreateChartCommand")
+@patch("nl_explorer.chart_creator.context_builder")
+def test_create_charts_validates_all_specs_before_writing(mock_ctx, mock_chart_cmd, mock_flask_app):
+    """An invalid spec means nothing is written and its index is reported."""
+    mock_ctx.get_dataset_schema.return_value = {"columns": [{"name": "region"}], "metrics": [{"name": "count"}]}
+
+    from nl_explorer.chart_creator import create_charts
+
+    specs = [
+        {"slice_name": "Count", "datasource_id": 1, "viz_type": "big_number_total", "params": {"metric": "count"}},
+        {"slice_name": "Bad", "datasource_id": 1, "viz_type": "pie", "params": {"metric": "count"}},
+    ]
+    with mock_flask_app.app_context():
+        result = create_charts(specs)
+
+    assert [e["index"] for e in result["chart_errors"]] == [1]
+    mock_chart_cmd.assert_not_called()
+
+
+@patch("nl_explorer.chart_creator.CreateChartCommand")
+@patch("nl_explorer.chart_creator.context_builder")
+def test_create_charts_checks_dataset_access_without_validation(mock_ctx, mock_chart_cmd, mock_flask_app):
+    """With validate_form_data off, inaccessible datasets are still rejected."""
+    mock_ctx.get_dataset_schema.return_value = {}
+    mock_flask_app.config["NL_EXPLORER_CONFIG"]["validate_form_data"] = False
+
+    from nl_explorer.chart_creator import create_charts
+
+    with mock_flask_app.app_context():
+        result = create_charts([{"slice_name": "X", "datasource_id": 999, "viz_type": "table", "params": {}}])
+
+    assert result["chart_errors"][0]["validation_errors"][0]["field"] == "dataset_id"
+    mock_chart_cmd.assert_not_called()
+
+
+@patch("nl_explorer.chart_creator.context_builder")
+def test_chart_from_template_prefers_saved_count_metric(mock_ctx, mock_flask_app):
+    """A 'count' measure uses the dataset's saved metric of that name instead of COUNT(*)."""
+    mock_ctx.get_dataset_schema.return_value = {
+        "id": 7,
+        "columns": [{"name": "region"}],
+        "metrics": [{"name": "count"}],
+    }
+
+    from nl_explorer.chart_creator import chart_from_template
+
+    with mock_flask_app.app_context(), patch("nl_explorer.chart_creator.preview_chart") as mock_preview:
+        mock_preview.return_value = {"explore_url": "http://x"}
+        result = chart_from_template(7, "pie_share", {"dimension": "region", "measure": "count"})
+
+    assert result["template"] == "pie_share"
+    assert mock_preview.call_args.kwargs["form_data"]["metric"] == "count"
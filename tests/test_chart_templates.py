@@ -0,0 +1,75 @@
+"""
+Tests for nl_explorer.chart_templates
+"""
+
+from __future__ import annotations
+
+import json
+
+import pytest
+
+
+def test_expand_measure_variants():
+    """Measures map to adhoc SIMPLE/SQL metrics or stay saved metric names."""
+    from nl_explorer.chart_templates import expand_measure
+
+    assert expand_measure("sum(amount)") == {
+        "expressionType": "SIMPLE",
+        "column": {"column_name": "amount"},
+        "aggregate": "SUM",
+        "label": "SUM(amount)",
+    }
+    assert expand_measure("COUNT(DISTINCT user_id)")["aggregate"] == "COUNT_DISTINCT"
+    assert expand_measure("COUNT(*)")["sqlExpression"] == "COUNT(*)"
+    assert expand_measure("COUNT( * )")["sqlExpression"] == "COUNT(*)"
+    assert expand_measure("total_revenue") == "total_revenue"
+    assert expand_measure("count", {"count"}) == "count"
+
+
+def test_tool_definitions_do_not_import_flask():
+    """prompts.tools reads the catalogue without pulling in chart_creator, Flask or Superset."""
+    import subprocess
+    import sys
+
+    code = (
+        "import sys, nl_explorer.prompts.tools; "
+        "assert not {'flask', 'nl_explorer.chart_creator'} & set(sys.modules)"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+def test_line_template_expands_to_valid_form_data():
+    """A filled line template produces form_data that passes local validation."""
+    from nl_explorer.chart_templates import expand_template
+    from nl_explorer.form_data_validator import validate_form_data
+
+    slots = {
+        "time": "order_date",
+        "measures": ["SUM(amount)"],
+        "dimension": "region",
+        "time_grain": "P1M",
+        "time_range": "Last year",
+        "filters": [{"column": "country", "op": "==", "value": "US"}],
+    }
+    viz_type, form_data = expand_template("line_over_time", slots)
+    schema = {"columns": [{"name": n} for n in ("order_date", "amount", "region", "country")], "metrics": []}
+
+    assert viz_type == "echarts_timeseries_line"
+    assert form_data["x_axis"] == "order_date"
+    assert form_data["groupby"] == ["region"]
+    assert [f["operator"] for f in form_data["adhoc_filters"]] == ["==", "TEMPORAL_RANGE"]
+    assert validate_form_data(viz_type, form_data, schema) == []
+    # The model only writes the slots, a fraction of the expanded form_data
+    assert len(json.dumps(slots)) * 2 < len(json.dumps(form_data))
+
+
+def test_expand_template_reports_missing_slots():
+    """Missing required slots and unknown templates raise ValueError."""
+    from nl_explorer.chart_templates import expand_template
+
+    with pytest.raises(ValueError, match="requires slots: time"):
+        expand_template("kpi_trend", {"measure": "count"})
+    with pytest.raises(ValueError, match="Unknown template"):
+        expand_template("sankey", {})
+    with pytest.raises(ValueError, match="'time_range' needs the 'time' slot"):
+        expand_template("bar_by_category", {"dimension": "region", "measure": "count", "time_range": "Last year"})
@@ -0,0 +1,134 @@
+"""
+Tests for nl_explorer.column_profiles
+"""
+
+from __future__ import annotations
+
+import datetime
+from unittest.mock import MagicMock, patch
+
+
+def test_profile_values_categorical():
+    """Low-cardinality columns get top values, distinct count and null fraction."""
+    from nl_explorer.column_profiles import profile_values
+
+    profile = profile_values(["US", "US", "FR", None, "US", "DE"], top_k=2)
+
+    assert profile["null_fraction"] == round(1 / 6, 4)
+    assert profile["approx_distinct"] == 3
+    assert profile["top_values"] == [{"value": "US", "count": 3}, {"value": "FR", "count": 1}]
+    assert "min" not in profile
+
+
+def test_profile_values_dates_have_range():
+    """Temporal columns report their min/max as ISO strings."""
+    from nl_explorer.column_profiles import profile_values
+
+    profile = profile_values([datetime.date(2024, 1, 5), datetime.date(2023, 3, 1)])
+
+    assert profile["min"] == "2023-03-01"
+    assert profile["max"] == "2024-01-05"
+    assert "top_values" not in profile
+
+
+def test_profile_dataset_runs_single_random_sample_query():
+    """profile_dataset should issue one randomly ordered, LIMITed query in the dataset's catalog and schema."""
+    from nl_explorer.column_profiles import profile_dataset
+
+    ds = MagicMock()
+    ds.sql = None
+    ds.catalog = "warehouse"
+    ds.schema = "public"
+    ds.table_name = "orders"
+    ds.database.quote_identifier = lambda s: f'"{s}"'
+    ds.database.db_engine_spec.engine = "mysql"
+    cols = []
+    for name in ("country", "amount"):
+        col = MagicMock()
+        col.column_name = name
+        col.expression = None
+        cols.append(col)
+    ds.columns = cols
+    df = MagicMock()
+    df.columns = ["country", "amount"]
+    df.values.tolist.return_value = [["US", 10], ["US", 20], ["FR", 5]]
+    ds.database.get_df.return_value = df
+
+    profiles = profile_dataset(ds, sample_rows=500)
+
+    sql = ds.database.get_df.call_args[0][0]
+    assert sql == 'SELECT "country", "amount" FROM "public"."orders" ORDER BY RAND() LIMIT 500'
+    assert ds.database.get_df.call_args.kwargs == {"catalog": "warehouse", "schema": "public"}
+    assert profiles["amount"]["min"] == 5
+    assert profiles["country"]["top_values"][0] == {"value": "US", "count": 2}
+
+
+def test_attach_profiles_schedules_when_missing(mock_flask_app):
+    """Without a cached profile, attach_profiles schedules a job and leaves the dataset as is."""
+    from nl_explorer import column_profiles
+
+    mock_flask_app.config["NL_EXPLORER_CONFIG"]["column_profiles"] = True
+    dataset = {"id": 3, "name": "orders", "columns": [{"name": "country"}]}
+
+    with mock_flask_app.app_context(), \
+            patch.object(column_profiles, "DatasetDAO"), \
+            patch.object(column_profiles, "_rls_predicates", return_value=["(org_id = 7)"]), \
+            patch.object(column_profiles, "get_profiles", return_value=None) as mock_get, \
+            patch.object(column_profiles, "schedule_profiling") as mock_schedule:
+        result = column_profiles.attach_profiles(dataset)
+
+    mock_get.assert_called_once_with(3, ["(org_id = 7)"])
+    mock_schedule.assert_called_once_with([3])
+    assert "profile" not in result["columns"][0]
+
+
+def test_profile_dataset_renders_virtual_dataset_jinja():
+    """Virtual dataset SQL goes through the dataset's template processor before it is wrapped."""
+    from nl_explorer.column_profiles import profile_dataset
+
+    ds = MagicMock()
+    ds.sql = "SELECT * FROM events WHERE ds = '{{ ds }}';"
+    ds.get_template_processor.return_value.process_template.side_effect = lambda sql: sql.replace("{{ ds }}", "2024-01-01")
+    ds.database.quote_identifier = lambda s: s
+    col = MagicMock(column_name="user_id", expression=None)
+    ds.columns = [col]
+    ds.database.get_df.return_value = MagicMock(columns=["user_id"], values=MagicMock(tolist=lambda: [[1]]))
+
+    profile_dataset(ds, sample_rows=10)
+
+    assert ds.database.get_df.call_args[0][0] == (
+        "SELECT user_id FROM (SELECT * FROM events WHERE ds = '2024-01-01') AS nl_profile_src ORDER BY RANDOM() LIMIT 10"
+    )
+
+
+def test_rls_predicates_filter_sample_and_key_cache():
+    """RLS filters are ORed within a group, ANDed into the sample query, and give a separate cache key."""
+    from nl_explorer import column_profiles
+
+    ds = MagicMock()
+    ds.sql = None
+    ds.schema = None
+    ds.table_name = "orders"
+    ds.database.quote_identifier = lambda s: s
+    ds.database.db_engine_spec.engine = "postgresql"
+    ds.get_template_processor.return_value.process_template.side_effect = lambda sql: sql
+    ds.columns = [MagicMock(column_name="amount", expression=None)]
+    ds.database.get_df.return_value = MagicMock(columns=["amount"], values=MagicMock(tolist=lambda: [[1]]))
+    security = MagicMock()
+    security.get_rls_filters.return_value = [
+        MagicMock(id=1, group_key="region", clause="region = 'EU'"),
+        MagicMock(id=2, group_key="region", clause="region = 'US'"),
+        MagicMock(id=3, group_key=None, clause="org_id = 7"),
+    ]
+
+    with patch.object(column_profiles, "security_manager", security):
+        predicates = column_profiles._rls_predicates(ds)
+    column_profiles.profile_dataset(ds, sample_rows=10, predicates=predicates)
+
+    assert predicates == ["((region = 'EU') OR (region = 'US'))", "(org_id = 7)"]
+    assert ds.database.get_df.call_args[0][0] == (
+        "SELECT amount FROM orders WHERE ((region = 'EU') OR (region = 'US')) AND (org_id = 7) "
+        "ORDER BY RANDOM() LIMIT 10"
+    )
+    assert column_profiles._cache_key(3, []) == "profile:3"
+    assert column_profiles._cache_key(3, predicates).startswith("profile:3:rls:")
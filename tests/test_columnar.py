@@ -0,0 +1,48 @@
+"""
+Tests for nl_explorer.columnar
+"""
+
+from __future__ import annotations
+
+import json
+
+import pytest
+
+
+def test_from_rows_round_trips_to_row_payload():
+    """Column-major storage yields the same row-oriented JSON as before."""
+    from nl_explorer.columnar import ColumnarResult, as_payload
+
+    result = ColumnarResult.from_rows(["region", "n"], [("EMEA", 3), ("APAC", 5)], row_count=10, meta={"sampled": True})
+
+    assert result.data == [["EMEA", "APAC"], [3, 5]]
+    assert json.loads(json.dumps(as_payload(result))) == {
+        "columns": ["region", "n"],
+        "rows": [["EMEA", 3], ["APAC", 5]],
+        "row_count": 10,
+        "sampled": True,
+    }
+    assert as_payload({"error": "x"}) == {"error": "x"}
+    assert ColumnarResult.from_rows(["a"], []).to_payload()["rows"] == []
+
+
+def test_arrow_stream_encodes_columns_and_metadata():
+    """The Arrow IPC stream carries the columns and row_count metadata."""
+    pyarrow = pytest.importorskip("pyarrow")
+    from nl_explorer.columnar import ColumnarResult
+
+    result = ColumnarResult.from_rows(["region", "n"], [("EMEA", 3), ("APAC", 5)], row_count=10)
+    table = pyarrow.ipc.open_stream(result.to_arrow_stream()).read_all()
+
+    assert table.column_names == ["region", "n"]
+    assert table.column("n").to_pylist() == [3, 5]
+    assert table.schema.metadata[b"row_count"] == b"10"
+
+
+def test_importing_llm_service_does_not_import_pyarrow():
+    """pyarrow is loaded on the first Arrow response, not at worker startup."""
+    import subprocess
+    import sys
+
+    code = "import sys, nl_explorer.llm_service; assert 'pyarrow' not in sys.modules"
+    subprocess.run([sys.executable, "-c", code], check=True)
@@ -67,3 +67,210 @@ def test_get_user_context_handles_dao_error(mock_dao):
 
     result = get_user_context()
     assert result == {"datasets": []}
+
+
+def test_catalogue_snapshot_version_is_content_addressed():
+    """The catalogue version changes only when a dataset's content changes."""
+    from nl_explorer.context_builder import catalogue_snapshot
+
+    datasets = [{"id": 1, "name": "orders", "description": None, "columns": []}]
+    v1, _ = catalogue_snapshot(datasets)
+    v2, _ = catalogue_snapshot([dict(datasets[0])])
+    v3, _ = catalogue_snapshot([{**datasets[0], "description": "All orders"}])
+
+    assert v1 == v2
+    assert v1 != v3
+
+
+def test_catalogue_snapshot_written_only_for_new_versions():
+    """An unchanged catalogue does not rewrite its cached snapshot."""
+    from nl_explorer import context_builder
+
+    datasets = [{"id": 1, "name": "orders", "columns": []}]
+    with patch.object(context_builder, "cache") as mock_cache:
+        mock_cache.get.return_value = None
+        context_builder.catalogue_snapshot(datasets)
+        mock_cache.get.return_value = {1: "fingerprint"}
+        context_builder.catalogue_snapshot(datasets)
+
+    assert mock_cache.set.call_count == 1
+
+
+def test_catalogue_delta_reports_added_changed_removed():
+    """catalogue_delta should diff against the snapshot stored for a version."""
+    from nl_explorer.context_builder import catalogue_delta, catalogue_snapshot
+
+    old = [
+        {"id": 1, "name": "orders", "columns": []},
+        {"id": 2, "name": "customers", "columns": []},
+    ]
+    since, _ = catalogue_snapshot(old)
+    new = [
+        {"id": 1, "name": "orders_v2", "columns": []},
+        {"id": 3, "name": "products", "columns": []},
+    ]
+    _, fingerprints = catalogue_snapshot(new)
+
+    delta = catalogue_delta(new, fingerprints, since)
+
+    assert [ds["id"] for ds in delta["added"]] == [3]
+    assert [ds["id"] for ds in delta["changed"]] == [1]
+    assert delta["removed"] == [2]
+    assert catalogue_delta(new, fingerprints, "unknown-version") is None
+
+
+@patch("nl_explorer.context_builder._find_dashboard_datasets")
+@patch("nl_explorer.context_builder.DatasetDAO")
+def test_get_user_context_dashboard_scope(mock_dao, mock_find_dashboard):
+    """With a dashboard_id, the dashboard's datasets (with metrics) are used."""
+    from nl_explorer.context_builder import get_user_context
+
+    ds = _make_mock_dataset(7, "sales", [{"name": "region"}])
+    metric = MagicMock()
+    metric.metric_name = "total_revenue"
+    metric.expression = "SUM(revenue)"
+    metric.description = None
+    ds.metrics = [metric]
+    mock_find_dashboard.return_value = [ds]
+
+    result = get_user_context(dashboard_id=3, max_datasets=4)
+
+    assert mock_find_dashboard.call_args[0][:2] == (3, 4)
+    mock_dao.find_all.assert_not_called()
+    assert result["datasets"][0]["metrics"] == [
+        {"name": "total_revenue", "expression": "SUM(revenue)", "description": None}
+    ]
+
+
+@patch("nl_explorer.context_builder._find_dashboard_datasets", return_value=[])
+@patch("nl_explorer.context_builder.DatasetDAO")
+def test_get_user_context_dashboard_falls_back(mock_dao, _mock_find_dashboard):
+    """An empty dashboard falls back to the generic dataset list."""
+    from nl_explorer.context_builder import get_user_context
+
+    mock_dao.find_all.return_value = [_make_mock_dataset(1, "orders", [])]
+
+    result = get_user_context(dashboard_id=3)
+
+    assert [ds["id"] for ds in result["datasets"]] == [1]
+    assert "metrics" not in result["datasets"][0]
+
+
+@patch("nl_explorer.context_builder.DashboardDAO")
+def test_find_dashboard_datasets_requires_dashboard_access(mock_dashboard_dao):
+    """A dashboard hidden by DashboardDAO's base filter yields no datasets, before any dataset query."""
+    from nl_explorer.context_builder import _find_dashboard_datasets
+
+    mock_dashboard_dao.find_by_id.return_value = None
+
+    assert _find_dashboard_datasets(3, max_datasets=5) == []
+    mock_dashboard_dao.find_by_id.assert_called_once_with(3)
+
+
+@patch("nl_explorer.context_builder._find_datasets")
+@patch("nl_explorer.context_builder.DatasetDAO")
+def test_get_user_context_pushes_schema_rules_down(mock_dao, mock_find, mock_flask_app):
+    """Schema restrictions use the filtered query instead of loading every dataset."""
+    from nl_explorer.context_builder import get_user_context
+
+    mock_flask_app.config["NL_EXPLORER_CONFIG"]["schema_denylist"] = ["staging_*"]
+    mock_find.return_value = [_make_mock_dataset(1, "orders", [])]
+
+    with mock_flask_app.app_context():
+        result = get_user_context(max_datasets=5, allowed_schemas=["public"])
+
+    mock_dao.find_all.assert_not_called()
+    mock_find.assert_called_once_with(
+        5, {"allowed": ["public"], "allow_globs": [], "deny_globs": ["staging_*"]}
+    )
+    assert [ds["id"] for ds in result["datasets"]] == [1]
+
+
+def test_schema_clause_compiles_globs_to_like():
+    """Allow lists become IN, globs become escaped LIKE patterns."""
+    from types import SimpleNamespace
+
+    from sqlalchemy import column
+
+    from nl_explorer import context_builder
+
+    rules = {"allowed": ["public"], "allow_globs": [], "deny_globs": ["tmp_*"]}
+    with patch.object(context_builder, "SqlaTable", SimpleNamespace(schema=column("schema"))):
+        sql = str(
+            context_builder._schema_clause(rules).compile(compile_kwargs={"literal_binds": True})
+        )
+
+    assert "schema IN ('public')" in sql
+    assert "schema NOT LIKE 'tmp\\_%'" in sql
+    assert context_builder._schema_allowed("tmp_x", rules) is False
+    assert context_builder._schema_allowed("public", rules) is True
+
+
+@patch("nl_explorer.context_builder._load_datasets_with_schema")
+@patch("nl_explorer.context_builder.DatasetDAO")
+def test_get_dataset_schema_includes_metrics_and_is_cached(mock_dao, mock_load, mock_flask_app):
+    """get_dataset_schema returns metrics and calculated columns, then serves from cache."""
+    import datetime
+
+    from nl_explorer.context_builder import get_dataset_schema
+
+    ds = _make_mock_dataset(11, "payments", [{"name": "amount"}, {"name": "net"}])
+    ds.schema = "public"
+    ds.changed_on = datetime.datetime(2024, 5, 1, 12, 0)
+    ds.columns[0].expression = None
+    ds.columns[1].expression = "amount - fee"
+    metric = MagicMock()
+    metric.metric_name = "total_amount"
+    metric.expression = "SUM(amount)"
+    metric.description = "Gross"
+    ds.metrics = [metric]
+    mock_dao.find_by_id.return_value = ds
+    mock_load.return_value = [ds]
+
+    with mock_flask_app.app_context():
+        first = get_dataset_schema(11)
+        second = get_dataset_schema(11)
+
+    assert first == second
+    mock_load.assert_called_once_with([11])
+    assert first["metrics"] == [{"name": "total_amount", "expression": "SUM(amount)", "description": "Gross"}]
+    assert "expression" not in first["columns"][0]
+    assert first["columns"][1]["expression"] == "amount - fee"
+
+    with mock_flask_app.app_context():
+        assert len(get_dataset_schema(11, max_columns=1)["columns"]) == 1
+        assert len(get_dataset_schema(11, max_columns=None)["columns"]) == 2
+
+
+@patch("nl_explorer.context_builder.DatasetDAO")
+def test_get_dataset_schema_respects_allowed_schemas(mock_dao, mock_flask_app):
+    """A dataset outside the allowed schemas is not returned."""
+    from nl_explorer.context_builder import get_dataset_schema
+
+    ds = _make_mock_dataset(12, "secrets", [])
+    ds.schema = "restricted"
+    mock_dao.find_by_id.return_value = ds
+
+    with mock_flask_app.app_context():
+        assert get_dataset_schema(12, allowed_schemas=["public"]) == {}
+
+
+def test_context_endpoint_304_from_cached_version(mock_flask_app):
+    """A matching If-None-Match is answered from the cached version without rebuilding the catalogue."""
+    import inspect
+
+    from flask import g
+
+    from nl_explorer.api import NLExplorerRestApi
+
+    view = inspect.unwrap(NLExplorerRestApi.get_context)
+    api = NLExplorerRestApi.__new__(NLExplorerRestApi)
+    with mock_flask_app.test_request_context("/context", headers={"If-None-Match": '"v1"'}), \
+            patch("nl_explorer.context_builder.cached_catalogue_version", return_value="v1"), \
+            patch("nl_explorer.context_builder.get_user_context") as mock_context:
+        g.user = MagicMock(id=5)
+        resp = view(api)
+
+    assert resp.status_code == 304
+    assert resp.headers["ETag"] == '"v1"'
+    mock_context.assert_not_called()
@@ -0,0 +1,67 @@
+"""
+Tests for nl_explorer.degradation
+"""
+
+from __future__ import annotations
+
+from unittest.mock import MagicMock, patch
+
+
+def test_steps_down_under_pressure_and_back_up_when_calm():
+    """Queue depth or high latency step down one level at a time; calm steps back up."""
+    from nl_explorer.degradation import DegradationController
+
+    ctl = DegradationController(
+        ladder=[{"max_datasets": 10}, {"max_datasets": 5, "model": "gpt-4o-mini"}],
+        latency_high=10.0,
+        latency_low=4.0,
+        queue_high=5,
+        queue_low=0,
+        step_interval=0,
+    )
+    assert ctl.update(queued=0) == 0
+    assert ctl.update(queued=6) == 1
+
+    ctl.record_latency(12.0)
+    assert ctl.update(queued=0) == 2
+    assert ctl.update(queued=9) == 2  # bottom of the ladder
+    assert ctl.update(queued=0) == 2  # latency still between the marks: hold
+
+    ctl._latencies.clear()
+    assert ctl.update(queued=0) == 1
+    assert ctl.update(queued=0) == 0
+
+
+def test_settings_merge_ladder_without_widening_budgets():
+    """A level applies all entries up to it and never raises a configured limit."""
+    from nl_explorer.degradation import DegradationController
+
+    ctl = DegradationController(
+        ladder=[{"max_datasets": 10, "max_columns": 12}, {"max_tool_rounds": 2, "model": "small"}],
+        step_interval=3600,
+    )
+    base = {"max_datasets": 5, "max_columns": 20, "max_tool_rounds": 5, "model": None}
+
+    assert ctl.settings(base, 0) == base
+    assert ctl.settings(base, 2) == {"max_datasets": 5, "max_columns": 12, "max_tool_rounds": 2, "model": "small"}
+
+    ctl.update(queued=100)
+    assert ctl.update(queued=100) == 1  # second step waits for step_interval
+
+
+@patch("nl_explorer.llm_service.litellm")
+def test_chat_model_override_goes_to_primary_provider(mock_litellm, mock_flask_app):
+    """The degraded model is sent to the primary provider and feeds the latency window."""
+    from nl_explorer import degradation
+    from nl_explorer.llm_service import chat
+
+    mock_litellm.completion.return_value = MagicMock(
+        choices=[MagicMock(message=MagicMock(content="ok", tool_calls=None))], usage=None
+    )
+    mock_flask_app.config["NL_EXPLORER_CONFIG"]["degradation"] = {}
+
+    with mock_flask_app.app_context():
+        chat(messages=[{"role": "user", "content": "hi"}], model="gpt-4o-mini")
+        assert degradation.get_controller().latency() is not None
+
+    assert mock_litellm.completion.call_args.kwargs["model"] == "gpt-4o-mini"
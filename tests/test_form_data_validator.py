@@ -0,0 +1,49 @@
+"""
+Tests for nl_explorer.form_data_validator
+"""
+
+from __future__ import annotations
+
+SCHEMA = {
+    "id": 1,
+    "columns": [{"name": "region"}, {"name": "amount"}, {"name": "created_at"}],
+    "metrics": [{"name": "count"}, {"name": "total_amount"}],
+}
+
+
+def test_valid_pie_chart_has_no_errors():
+    """A pie chart with a saved metric and a known groupby column is valid."""
+    from nl_explorer.form_data_validator import validate_form_data
+
+    errors = validate_form_data("pie", {"metric": "total_amount", "groupby": ["region"]}, SCHEMA)
+
+    assert errors == []
+
+
+def test_adhoc_metric_and_filter_are_checked():
+    """Adhoc SIMPLE metrics and filters must reference known columns and aggregates."""
+    from nl_explorer.form_data_validator import validate_form_data
+
+    form_data = {
+        "metrics": [{"expressionType": "SIMPLE", "column": {"column_name": "amount"}, "aggregate": "MEDIAN"}],
+        "x_axis": "created_at",
+        "adhoc_filters": [{"expressionType": "SIMPLE", "subject": "regoin", "operator": "=="}],
+    }
+
+    errors = validate_form_data("echarts_timeseries_line", form_data, SCHEMA)
+
+    assert [e["field"] for e in errors] == ["metrics[0]", "adhoc_filters[0].subject"]
+    assert "MEDIAN" in errors[0]["message"]
+    assert "region" in errors[1]["message"]
+
+
+def test_missing_required_field_for_big_number():
+    """big_number needs a metric and a temporal axis."""
+    from nl_explorer.form_data_validator import validate_form_data
+
+    errors = validate_form_data("big_number", {"metric": "count"}, SCHEMA)
+
+    assert errors == [{
+        "field": "x_axis",
+        "message": "'x_axis or granularity_sqla' is required for viz_type 'big_number'.",
+    }]
@@ -0,0 +1,64 @@
+"""
+Tests for nl_explorer.intent_router
+"""
+
+from __future__ import annotations
+
+import json
+from unittest.mock import call, patch
+
+DATASETS = [
+    {"id": 1, "name": "orders", "description": "All orders", "columns": []},
+    {"id": 2, "name": "web_sessions", "description": None, "columns": []},
+]
+
+
+@patch("nl_explorer.intent_router.context_builder.get_user_context")
+def test_route_list_datasets(mock_context, mock_flask_app):
+    """'What datasets do I have?' is answered without the LLM, capped at the turn's dataset budget."""
+    from nl_explorer.intent_router import route
+
+    mock_context.return_value = {"datasets": DATASETS}
+
+    with mock_flask_app.app_context():
+        result = route("What datasets do I have?", DATASETS, max_datasets=7)
+
+    mock_context.assert_called_once_with(max_datasets=7, allowed_schemas=None)
+    assert result["intent"] == "list_datasets"
+    assert "**orders** (ID 1) — All orders" in result["message"]
+    assert result["message"].startswith(f"Here are {len(DATASETS)} of your datasets:")
+
+
+@patch("nl_explorer.intent_router.llm_service.dispatch_tool_call")
+def test_route_columns_resolves_dataset_name(mock_dispatch, mock_flask_app):
+    """Dataset names are matched ignoring case and separators."""
+    from nl_explorer.intent_router import route
+
+    mock_dispatch.return_value = {"content": json.dumps({
+        "id": 2, "name": "web_sessions", "columns": [{"name": "session_id", "type": "INTEGER"}],
+    })}
+
+    with mock_flask_app.app_context():
+        result = route("show me the columns of Web Sessions", DATASETS)
+
+    mock_dispatch.assert_called_once_with("get_dataset_schema", {"dataset_id": 2}, allowed_schemas=None)
+    assert "`session_id` (INTEGER)" in result["message"]
+
+
+def test_route_explore_and_misses(mock_flask_app):
+    """Explore requests return a link; anything else falls through to the LLM."""
+    from nl_explorer import intent_router
+    from nl_explorer.intent_router import route, stats
+
+    before = stats()["requests"]
+    with mock_flask_app.app_context(), patch.object(intent_router, "metrics") as mock_metrics:
+        explore = route("open orders in explore", DATASETS)
+        unknown = route("open invoices in explore", DATASETS)
+        analysis = route("What were total sales by region last month?", DATASETS)
+
+    assert explore["actions"][0]["payload"]["explore_url"].endswith("datasource_id=1")
+    assert unknown is None
+    assert analysis is None
+    assert stats()["requests"] == before + 3
+    mock_metrics.inc.assert_any_call("nl_explorer_fast_path_total", intent="open_explore")
+    assert mock_metrics.inc.call_args_list.count(call("nl_explorer_fast_path_misses_total")) == 2
@@ -65,3 +65,38 @@ def test_dispatch_list_datasets(mock_dao, mock_flask_app):
     import json
     payload = json.loads(result["content"])
     assert isinstance(payload, list)
+
+
+def test_importing_api_does_not_import_litellm():
+    """litellm should only be imported on first use, not at worker startup."""
+    import subprocess
+    import sys
+
+    code = "import sys, nl_explorer.api; sys.exit('litellm' in sys.modules)"
+    assert subprocess.run([sys.executable, "-c", code]).returncode == 0
+
+
+@patch("nl_explorer.llm_service.litellm")
+def test_streamed_chat_fills_usage(mock_litellm, mock_flask_app):
+    """A streamed turn reports the provider's usage from the final chunk, or an estimate without it."""
+    from types import SimpleNamespace
+
+    from nl_explorer.llm_service import chat
+
+    def chunk(text, usage=None):
+        return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))], usage=usage)
+
+    mock_litellm.token_counter.return_value = 7
+    mock_litellm.completion.side_effect = [
+        iter([chunk("Hi"), chunk(" there", SimpleNamespace(prompt_tokens=120, completion_tokens=3))]),
+        iter([chunk("Hi")]),
+    ]
+
+    with mock_flask_app.app_context():
+        reported: dict = {}
+        list(chat(messages=[{"role": "user", "content": "hi"}], stream=True, usage=reported))
+        estimated: dict = {}
+        list(chat(messages=[{"role": "user", "content": "hi"}], stream=True, usage=estimated))
+
+    assert reported == {"prompt_tokens": 120, "completion_tokens": 3}
+    assert estimated == {"prompt_tokens": 7, "completion_tokens": 7}
@@ -0,0 +1,121 @@
+"""
+Tests for nl_explorer.metrics
+"""
+
+from __future__ import annotations
+
+import json
+import os
+
+import pytest
+
+
+@pytest.fixture()
+def fresh_metrics(tmp_path, monkeypatch):
+    from nl_explorer import metrics
+
+    monkeypatch.setattr(metrics, "_values", {})
+    monkeypatch.setattr(metrics, "_dirty", False)
+    monkeypatch.setattr(metrics, "_dir", str(tmp_path))
+    return metrics
+
+
+def test_render_counters_and_histograms(fresh_metrics):
+    """Counters and histograms render in Prometheus text format with cumulative buckets."""
+    metrics = fresh_metrics
+    metrics.inc("nl_explorer_sql_rows_total", 25)
+    metrics.observe("nl_explorer_tool_seconds", 0.2, tool="run_sql")
+    metrics.observe("nl_explorer_tool_seconds", 0.001, tool="run_sql")
+
+    text = metrics.render()
+
+    assert "# TYPE nl_explorer_sql_rows_total counter\nnl_explorer_sql_rows_total 25\n" in text
+    assert 'nl_explorer_tool_seconds_bucket{le="0.005",tool="run_sql"} 1' in text
+    assert 'nl_explorer_tool_seconds_bucket{le="0.25",tool="run_sql"} 2' in text
+    assert 'nl_explorer_tool_seconds_count{tool="run_sql"} 2' in text
+    assert "nl_explorer_chats_in_flight 0" in text
+
+
+def test_collect_sums_workers_and_drops_gauges_of_exited_workers(fresh_metrics, tmp_path):
+    """Files of other workers are summed; gauges of dead processes are ignored."""
+    metrics = fresh_metrics
+    metrics.inc("nl_explorer_sql_rows_total", 5)
+    metrics.gauge_add("nl_explorer_chats_in_flight", 2)
+    dead_pid = 2**22 + 12345
+    (tmp_path / f"nl_explorer_{dead_pid}.json").write_text(json.dumps({
+        "pid": dead_pid,
+        "values": {
+            "nl_explorer_sql_rows_total": {"nl_explorer_sql_rows_total": 7},
+            "nl_explorer_chats_in_flight": {"nl_explorer_chats_in_flight": 3},
+        },
+    }))
+
+    totals = metrics.collect()
+
+    assert (tmp_path / metrics._own_file()).exists()
+    assert totals["nl_explorer_sql_rows_total"]["nl_explorer_sql_rows_total"] == 12
+    assert totals["nl_explorer_chats_in_flight"]["nl_explorer_chats_in_flight"] == 2
+
+
+def test_retire_folds_exited_and_reused_pid_files(fresh_metrics, tmp_path):
+    """Files of exited workers, or of an older process with a reused pid, are folded into one file."""
+    metrics = fresh_metrics
+    values = {
+        "nl_explorer_sql_rows_total": {"nl_explorer_sql_rows_total": 4},
+        "nl_explorer_chats_in_flight": {"nl_explorer_chats_in_flight": 1},
+    }
+    # Same pid as this process but an earlier start time
+    stale = tmp_path / f"nl_explorer_{os.getpid()}_1.json"
+    stale.write_text(json.dumps({"pid": os.getpid(), "start": 1, "values": values}))
+    dead = tmp_path / f"nl_explorer_{2**22 + 12345}_5.json"
+    dead.write_text(json.dumps({"pid": 2**22 + 12345, "start": 5, "values": values}))
+    metrics.inc("nl_explorer_sql_rows_total", 1)
+    metrics.flush()
+
+    if metrics._process_start(os.getpid()) is None or metrics.fcntl is None:
+        pytest.skip("needs /proc and fcntl")
+    metrics.retire()
+
+    assert not stale.exists() and not dead.exists()
+    assert (tmp_path / metrics._own_file()).exists()
+    totals = metrics.collect()
+    assert totals["nl_explorer_sql_rows_total"]["nl_explorer_sql_rows_total"] == 9
+    assert "nl_explorer_chats_in_flight" not in totals
+
+    metrics.retire(exiting=True)
+    assert not (tmp_path / metrics._own_file()).exists()
+
+
+def test_metrics_endpoint_requires_admin(fresh_metrics, mock_flask_app):
+    """can_admin is granted to Alpha and Gamma by role sync, so the endpoint checks for an admin itself."""
+    import inspect
+    from unittest.mock import patch
+
+    from nl_explorer.api import NLExplorerRestApi
+
+    view = inspect.unwrap(NLExplorerRestApi.get_metrics)
+    api = NLExplorerRestApi.__new__(NLExplorerRestApi)
+    with mock_flask_app.test_request_context("/metrics"):
+        with patch("nl_explorer.profiler.is_admin", return_value=False):
+            assert view(api).status_code == 403
+        with patch("nl_explorer.profiler.is_admin", return_value=True):
+            assert view(api).status_code == 200
+
+
+def test_samples_are_flushed_off_the_request_path(fresh_metrics, tmp_path, monkeypatch):
+    """inc() only records the sample; the background flusher writes it to the shared file."""
+    import time
+
+    metrics = fresh_metrics
+    monkeypatch.setattr(metrics, "_flusher_pid", None)
+    monkeypatch.setattr(metrics, "FLUSH_INTERVAL", 0.01)
+    path = tmp_path / metrics._own_file()
+
+    metrics.inc("nl_explorer_sql_rows_total", 3)
+    for _ in range(200):
+        if path.exists():
+            break
+        time.sleep(0.01)
+
+    data = json.loads(path.read_text())
+    assert data["values"]["nl_explorer_sql_rows_total"]["nl_explorer_sql_rows_total"] == 3
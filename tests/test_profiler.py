@@ -0,0 +1,74 @@
+"""
+Tests for nl_explorer.profiler
+"""
+
+from __future__ import annotations
+
+import time
+from unittest.mock import patch
+
+
+def _busy():
+    end = time.perf_counter() + 0.05
+    while time.perf_counter() < end:
+        pass
+    return "done"
+
+
+def test_profiled_request_writes_folded_stacks(mock_flask_app, tmp_path):
+    """A sampled request produces a folded profile that can be listed and read back."""
+    from nl_explorer import profiler
+
+    mock_flask_app.config["NL_EXPLORER_CONFIG"].update(
+        profile_sample_rate=1.0, profile_dir=str(tmp_path), profile_interval_ms=1
+    )
+
+    with mock_flask_app.test_request_context("/api/v1/nl_explorer/chat"):
+        assert profiler.profiled(_busy)() == "done"
+        profiles = profiler.list_profiles()
+        folded = profiler.read_profile(profiles[0]["id"])
+
+    assert len(profiles) == 1
+    assert profiles[0]["endpoint"] == "_busy"
+    assert "_busy (test_profiler.py:" in folded
+    assert folded.strip().split("\n")[0].rsplit(" ", 1)[1].isdigit()
+
+
+def test_profile_ring_is_bounded_and_ids_are_checked(mock_flask_app, tmp_path):
+    """Only profile_max_files profiles are kept; path-like ids are rejected."""
+    from nl_explorer import profiler
+
+    mock_flask_app.config["NL_EXPLORER_CONFIG"].update(
+        profile_sample_rate=1.0, profile_dir=str(tmp_path), profile_max_files=2
+    )
+
+    with mock_flask_app.test_request_context("/"):
+        for _ in range(4):
+            profiler.profiled(lambda: None)()
+        assert len(profiler.list_profiles()) == 2
+        assert profiler.read_profile("../../etc/passwd") is None
+
+
+@patch("nl_explorer.profiler.Sampler")
+def test_header_requires_admin(mock_sampler, mock_flask_app):
+    """The profile header is ignored for non-admins when sampling is off."""
+    from nl_explorer import profiler
+
+    with mock_flask_app.test_request_context("/", headers={profiler.PROFILE_HEADER: "1"}):
+        with patch("nl_explorer.profiler.is_admin", return_value=False):
+            profiler.profiled(lambda: None)()
+
+    mock_sampler.assert_not_called()
+
+
+def test_profile_endpoints_require_admin(mock_flask_app, tmp_path):
+    """Listing and downloading profiles is refused to non-admins holding can_admin."""
+    import inspect
+
+    from nl_explorer.api import NLExplorerRestApi
+
+    mock_flask_app.config["NL_EXPLORER_CONFIG"]["profile_dir"] = str(tmp_path)
+    api = NLExplorerRestApi.__new__(NLExplorerRestApi)
+    with mock_flask_app.test_request_context("/profiles"), patch("nl_explorer.profiler.is_admin", return_value=False):
+        assert inspect.unwrap(NLExplorerRestApi.get_profiles)(api).status_code == 403
+        assert inspect.unwrap(NLExplorerRestApi.get_profile)(api, "abc").status_code == 403
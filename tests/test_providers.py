@@ -0,0 +1,154 @@
+"""
+Tests for nl_explorer.providers
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+PRIMARY = {"model": "gpt-4o", "api_key": "k1"}
+SECONDARY = {"model": "ollama/llama3", "api_base": "http://ollama:11434"}
+
+
+def test_configured_providers_falls_back_to_single_model_keys():
+    """Without a providers list the legacy model/api_key/api_base keys are used."""
+    from nl_explorer.providers import configured_providers
+
+    assert configured_providers({"model": "m", "api_key": "k"}) == [{"model": "m", "api_key": "k", "api_base": None}]
+    assert configured_providers({"providers": [PRIMARY, SECONDARY]}) == [PRIMARY, SECONDARY]
+
+
+@patch("nl_explorer.providers.tracker")
+def test_complete_falls_back_when_provider_fails(mock_tracker):
+    """An error from the first provider sends the request to the next one."""
+    from nl_explorer.providers import LatencyTracker, complete
+
+    real = LatencyTracker()
+    mock_tracker.in_cooldown.side_effect = real.in_cooldown
+    mock_tracker.percentile.side_effect = real.percentile
+
+    def completion(**kwargs):
+        if kwargs["model"] == "gpt-4o":
+            raise RuntimeError("rate limited")
+        return "answer"
+
+    result, provider = complete(completion, {"messages": []}, [PRIMARY, SECONDARY])
+
+    assert result == "answer"
+    assert provider == SECONDARY
+    mock_tracker.record_failure.assert_called_once()
+
+
+@patch("nl_explorer.providers.tracker")
+def test_complete_hedges_slow_provider(mock_tracker):
+    """A provider slower than the hedge delay is raced against the next one."""
+    from nl_explorer.providers import complete
+
+    mock_tracker.in_cooldown.return_value = False
+    mock_tracker.percentile.return_value = None
+    release = threading.Event()
+    calls = []
+
+    def completion(**kwargs):
+        calls.append(kwargs["model"])
+        if kwargs["model"] == "gpt-4o":
+            release.wait(5)
+            return "slow"
+        return "fast"
+
+    hedging = {"initial_delay": 0.05, "min_delay": 0.01}
+    try:
+        result, provider = complete(completion, {"messages": []}, [PRIMARY, SECONDARY], hedging=hedging)
+    finally:
+        release.set()
+
+    assert result == "fast"
+    assert provider == SECONDARY
+    assert calls == ["gpt-4o", "ollama/llama3"]
+
+
+@patch("nl_explorer.providers.tracker")
+def test_complete_raises_when_all_providers_fail(mock_tracker):
+    """The last error is raised when no provider answers."""
+    from nl_explorer.providers import complete
+
+    mock_tracker.in_cooldown.return_value = False
+    mock_tracker.percentile.return_value = None
+
+    def completion(**kwargs):
+        raise RuntimeError(f"{kwargs['model']} down")
+
+    with pytest.raises(RuntimeError):
+        complete(completion, {"messages": []}, [PRIMARY, SECONDARY])
+
+    # A lone provider's failures count towards its cooldown too
+    mock_tracker.record_failure.reset_mock()
+    with pytest.raises(RuntimeError):
+        complete(completion, {"messages": []}, [PRIMARY])
+    assert mock_tracker.record_failure.call_args[0][0] == "gpt-4o@default"
+
+
+def test_busy_count_follows_the_pool_across_resize():
+    """A request that finishes after the pool was resized releases the old pool, not the new one."""
+    from nl_explorer import providers
+
+    release = threading.Event()
+    old = providers._get_pool(1)
+    future = providers._submit(old, release.wait, 5)
+    assert providers._saturated(old)
+
+    new = providers._get_pool(3)
+    release.set()
+    future.result(timeout=5)
+    for _ in range(100):  # done callbacks may run just after result() returns
+        if old.busy == 0:
+            break
+        time.sleep(0.01)
+
+    assert new is not old
+    assert (old.busy, new.busy) == (0, 0)
+
+
+@patch("nl_explorer.providers.tracker")
+def test_no_hedge_when_pool_saturated_and_loser_latency_recorded(mock_tracker):
+    """A full pool suppresses hedging; an abandoned loser's latency is recorded once it returns."""
+    from nl_explorer import providers
+
+    mock_tracker.in_cooldown.return_value = False
+    mock_tracker.percentile.return_value = None
+    release = threading.Event()
+    calls = []
+
+    def completion(**kwargs):
+        calls.append(kwargs["model"])
+        if kwargs["model"] == "gpt-4o":
+            release.wait(5)
+            return "slow"
+        return "fast"
+
+    hedging = {"initial_delay": 0.02, "min_delay": 0.01}
+    timer = threading.Timer(0.2, release.set)
+    timer.start()
+    result, _ = providers.complete(completion, {"messages": []}, [PRIMARY, SECONDARY], hedging, max_workers=1)
+    assert result == "slow"
+    assert calls == ["gpt-4o"]
+
+    release.clear()
+    try:
+        result, _ = providers.complete(completion, {"messages": []}, [PRIMARY, SECONDARY], hedging, max_workers=4)
+    finally:
+        release.set()
+    assert result == "fast"
+
+    def names():
+        return [c.args[0] for c in mock_tracker.record_success.call_args_list]
+
+    for _ in range(100):
+        if names().count("gpt-4o@default") == 2:
+            break
+        time.sleep(0.01)
+    assert names().count("gpt-4o@default") == 2
@@ -0,0 +1,56 @@
+"""
+Tests for nl_explorer.serialization
+"""
+
+from __future__ import annotations
+
+from unittest.mock import patch
+
+import pytest
+
+
+def test_fast_dumper_matches_schema_dump():
+    """Compiled dumps equal marshmallow's, including coercion, unknown and missing keys."""
+    from nl_explorer.schemas import ChatResponseSchema, ContextResponseSchema
+    from nl_explorer.serialization import FastDumper
+
+    context = {
+        "version": "abc",
+        "datasets": [
+            {"id": "7", "name": "orders", "columns": [{"name": "id", "type": None, "extra": 1}, {"name": 5}]},
+            {"id": 8, "name": "customers", "description": None, "metrics": [], "owners": ["x"]},
+        ],
+    }
+    data, exact = FastDumper(ContextResponseSchema()).dump(context)
+    assert data == ContextResponseSchema().dump(context)
+    assert exact
+
+    chat = {"message": "ok", "actions": [{"type": "run_sql", "payload": {"limit": 0.5}}], "conversation": []}
+    data, exact = FastDumper(ChatResponseSchema()).dump(chat)
+    assert data == ChatResponseSchema().dump(chat)
+    assert not exact
+
+
+def test_encode_is_byte_identical_to_jsonify(mock_flask_app):
+    """orjson output is used only when it matches jsonify byte for byte."""
+    pytest.importorskip("orjson")
+    from flask import jsonify
+
+    from nl_explorer.serialization import encode
+
+    data = {"b": [1, None, True], "a": {"z": "tab\there \"quoted\" \x01 </script>", "y": -3}}
+    with mock_flask_app.app_context():
+        assert encode(data) == jsonify(**data).get_data()
+        assert encode({"name": "café"}) is None
+        assert encode({"name": "del\x7f"}) is None
+        assert encode({1: "non-string key"}) is None
+        mock_flask_app.debug = True
+        assert encode(data) is None
+
+
+def test_encode_without_orjson_falls_back(mock_flask_app):
+    """Without orjson callers use jsonify."""
+    from nl_explorer import serialization
+
+    with patch.object(serialization, "orjson", None), mock_flask_app.app_context():
+        assert serialization.encode({"a": 1}) is None
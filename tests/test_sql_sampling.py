@@ -0,0 +1,81 @@
+"""
+Tests for nl_explorer.sql_sampling
+"""
+
+from __future__ import annotations
+
+import json
+import sys
+from types import ModuleType, SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+
+def test_sample_sql_adds_dialect_tablesample_in_place():
+    """Base tables get the dialect's TABLESAMPLE in place; qualified references, CTEs and functions are kept."""
+    pytest.importorskip("sqlglot")
+    from nl_explorer.sql_sampling import sample_sql
+
+    sql = (
+        "WITH recent AS (SELECT * FROM orders) "
+        "SELECT public.customers.region, COUNT(*) FROM recent r JOIN public.customers ON r.customer_id = "
+        "public.customers.id WHERE public.customers.note <> 'from x' GROUP BY 1"
+    )
+    out = sample_sql(sql, "postgresql", 2)
+
+    assert out.tables == 2
+    assert "FROM orders TABLESAMPLE SYSTEM (2)" in out.sql
+    assert "JOIN public.customers TABLESAMPLE SYSTEM (2) ON" in out.sql
+    assert "SELECT public.customers.region" in out.sql
+    assert "FROM recent AS r JOIN" in out.sql
+    assert "'from x'" in out.sql
+    assert "TABLESAMPLE (1 PERCENT)" in sample_sql("SELECT * FROM t", "databricks", 1).sql
+
+
+def test_sample_sql_returns_none_when_unsupported():
+    """Writes, unparseable SQL, engines without TABLESAMPLE and unknown engines are not rewritten."""
+    pytest.importorskip("sqlglot")
+    from nl_explorer.sql_sampling import sample_sql
+
+    assert sample_sql("DELETE FROM events", "postgresql", 5) is None
+    assert sample_sql("SELECT * FROM events", "mysql", 5) is None
+    assert sample_sql("SELECT * FROM t FINAL", "clickhouse", 5) is None
+    assert sample_sql("SELECT * FROM events", "no-such-engine", 5) is None
+    assert sample_sql("SELECT g FROM generate_series(1, 10) g", "postgresql", 1) is None
+    assert sample_sql("SELECT * FROM t TABLESAMPLE SYSTEM (5)", "postgresql", 1) is None
+    assert sample_sql("SELECT FROM WHERE (", "postgresql", 1) is None
+
+
+def test_run_sql_labels_sampled_results(mock_flask_app):
+    """run_sql with sample=true rewrites the query, labels the rate and falls back when the database rejects it."""
+    pytest.importorskip("sqlglot")
+    from nl_explorer.llm_service import dispatch_tool_call
+
+    frame = MagicMock(columns=["n"], __len__=lambda self: 1)
+    frame.head.return_value.iloc.__getitem__.return_value.tolist.return_value = [42]
+    database = MagicMock()
+    database.db_engine_spec = SimpleNamespace(engine="trino")
+    database.get_df.return_value = frame
+    dao_module = ModuleType("superset.daos.database")
+    dao_module.DatabaseDAO = MagicMock(find_by_id=MagicMock(return_value=database))
+
+    def run(sql, sample):
+        return json.loads(dispatch_tool_call("run_sql", {"database_id": 1, "sql": sql, "sample": sample})["content"])
+
+    with patch.dict(sys.modules, {"superset.daos.database": dao_module}), mock_flask_app.app_context():
+        result = run("SELECT COUNT(*) AS n FROM big", True)
+        joined = run("SELECT COUNT(*) FROM a JOIN b ON a.id = b.id", 2)
+        database.get_df.side_effect = [RuntimeError("TABLESAMPLE is not supported for views"), frame]
+        fallback = run("SELECT COUNT(*) AS n FROM some_view", True)
+
+    assert "TABLESAMPLE SYSTEM (1)" in database.get_df.call_args_list[0][0][0]
+    assert result["sampled"] is True
+    assert result["sample_percent"] == 1.0
+    assert result["scale_factor"] == 100
+    assert result["rows"] == [[42]]
+    assert joined["sampled_tables"] == 2
+    assert joined["scale_factor"] is None
+    assert fallback["sampled"] is False
+    assert fallback["rows"] == [[42]]
+    assert database.get_df.call_args_list[-1][0][0] == "SELECT COUNT(*) AS n FROM some_view LIMIT 100"
@@ -0,0 +1,58 @@
+"""
+Tests for nl_explorer.sse
+"""
+
+from __future__ import annotations
+
+import json
+import zlib
+
+
+def _texts(frames):
+    return [json.loads(f[len("data: "):])["content"] for f in frames if f != "data: [DONE]\n\n"]
+
+
+def test_coalesce_groups_deltas_by_size():
+    """Small deltas are merged into frames bounded by max_bytes; nothing is lost."""
+    from nl_explorer.sse import coalesce
+
+    deltas = ["ab"] * 10
+    frames = list(coalesce(deltas, interval_ms=60_000, max_bytes=8))
+
+    assert frames[-1] == "data: [DONE]\n\n"
+    assert _texts(frames) == ["abababab", "abababab", "abab"]
+
+
+def test_coalesce_zero_interval_emits_every_delta():
+    """With a zero interval each delta is its own frame, like the unbuffered stream."""
+    from nl_explorer.sse import coalesce
+
+    assert _texts(coalesce(["a", "b", "c"], interval_ms=0)) == ["a", "b", "c"]
+
+
+def test_coalesce_counts_utf8_bytes_and_exports_metrics():
+    """max_bytes counts encoded bytes; delta and frame counts go to the metrics module."""
+    from unittest.mock import call, patch
+
+    from nl_explorer import sse
+
+    with patch.object(sse, "metrics") as mock_metrics:
+        assert _texts(sse.coalesce(["é"] * 4, interval_ms=60_000, max_bytes=4)) == ["éé", "éé"]
+
+    assert call("nl_explorer_sse_deltas_total", 4) in mock_metrics.inc.call_args_list
+    assert call("nl_explorer_sse_frames_total", 2) in mock_metrics.inc.call_args_list
+
+
+def test_gzip_stream_frames_decode_incrementally():
+    """Each gzip chunk decodes to its frame without waiting for the end of the stream."""
+    from nl_explorer.sse import accepts_gzip, gzip_stream
+
+    frames = ["data: one\n\n", "data: two\n\n"]
+    decoder = zlib.decompressobj(31)
+    chunks = gzip_stream(frames)
+
+    assert decoder.decompress(next(chunks)) == b"data: one\n\n"
+    assert decoder.decompress(next(chunks)) == b"data: two\n\n"
+    assert accepts_gzip("br, gzip;q=0.8")
+    assert not accepts_gzip("gzip;q=0")
+    assert not accepts_gzip(None)
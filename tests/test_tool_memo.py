@@ -0,0 +1,49 @@
+"""
+Tests for nl_explorer.tool_memo
+"""
+
+from __future__ import annotations
+
+import json
+from unittest.mock import patch
+
+
+def _result(name, payload):
+    return {"role": "tool", "name": name, "content": json.dumps(payload)}
+
+
+@patch("nl_explorer.tool_memo.llm_service.dispatch_tool_call")
+def test_repeated_schema_call_is_served_from_memo(mock_dispatch, mock_flask_app):
+    """Identical get_dataset_schema calls only reach Superset once."""
+    from nl_explorer.tool_memo import ToolMemo
+
+    mock_dispatch.return_value = _result("get_dataset_schema", {"id": 1, "columns": []})
+    memo = ToolMemo()
+
+    with mock_flask_app.app_context():
+        first = memo.dispatch("get_dataset_schema", {"dataset_id": 1})
+        second = memo.dispatch("get_dataset_schema", {"dataset_id": 1})
+
+    assert first["content"] == second["content"]
+    assert mock_dispatch.call_count == 1
+    assert memo.hits == 1
+
+
+@patch("nl_explorer.tool_memo.llm_service.dispatch_tool_call")
+def test_memo_is_scoped_to_one_turn_and_skips_errors(mock_dispatch, mock_flask_app):
+    """A new turn calls Superset again, so access is re-checked; error results are never memoized."""
+    from nl_explorer.tool_memo import ToolMemo
+
+    mock_dispatch.return_value = _result("list_datasets", [{"id": 1}])
+
+    with mock_flask_app.app_context():
+        ToolMemo().dispatch("list_datasets", {})
+        ToolMemo().dispatch("list_datasets", {})
+
+        mock_dispatch.return_value = _result("get_dataset_schema", {"error": "not found"})
+        memo = ToolMemo()
+        memo.dispatch("get_dataset_schema", {"dataset_id": 9})
+        memo.dispatch("get_dataset_schema", {"dataset_id": 9})
+
+    assert mock_dispatch.call_count == 4
+    assert memo.hits == 0
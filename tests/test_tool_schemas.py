@@ -0,0 +1,56 @@
+"""
+Tests for nl_explorer.tool_schemas
+"""
+
+from __future__ import annotations
+
+import json
+from unittest.mock import patch
+
+
+def test_compiled_validator_reports_nested_paths():
+    """Missing, mistyped and out-of-enum values are reported with their paths."""
+    from nl_explorer.tool_schemas import compile_schema
+
+    validate = compile_schema({
+        "type": "object",
+        "properties": {
+            "charts": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {"id": {"type": "integer"}, "kind": {"type": "string", "enum": ["a", "b"]}},
+                    "required": ["id"],
+                },
+            },
+            "sample": {"type": ["boolean", "number"]},
+        },
+        "required": ["charts"],
+    })
+    errors: list = []
+    validate({"charts": [{"id": True, "kind": "c"}, {}], "sample": "yes"}, "", errors)
+
+    assert {e["field"] for e in errors} == {"charts[0].id", "charts[0].kind", "charts[1].id", "sample"}
+    assert any(e["message"] == "Expected integer, got bool." for e in errors)
+
+
+def test_validate_arguments_accepts_valid_calls():
+    """Well-formed calls and unknown tools produce no errors."""
+    from nl_explorer.tool_schemas import validate_arguments
+
+    assert validate_arguments("get_dataset_schema", {"dataset_id": 3}) == []
+    assert validate_arguments("run_sql", {"sql": "SELECT 1", "database_id": 1, "sample": 0.5}) == []
+    assert validate_arguments("not_a_tool", {"x": 1}) == []
+    assert validate_arguments("get_dataset_schema", []) == [{"field": "arguments", "message": "Expected object, got list."}]
+
+
+@patch("nl_explorer.context_builder.get_dataset_schema")
+def test_dispatch_rejects_invalid_arguments_before_executing(mock_schema, mock_flask_app):
+    """An invalid call returns validation_errors to the model without touching Superset."""
+    from nl_explorer.llm_service import dispatch_tool_call
+
+    with mock_flask_app.app_context():
+        payload = json.loads(dispatch_tool_call("get_dataset_schema", {"dataset_id": "orders"})["content"])
+
+    mock_schema.assert_not_called()
+    assert payload["validation_errors"] == [{"field": "dataset_id", "message": "Expected integer, got str."}]
@@ -0,0 +1,83 @@
+"""
+Tests for nl_explorer.traces and benchmarks/replay.py
+"""
+
+from __future__ import annotations
+
+import inspect
+import json
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+
+
+def test_anonymize_keeps_structure_and_consistent_pseudonyms():
+    """Strings are replaced consistently with same-length pseudonyms; roles and numbers are kept."""
+    from nl_explorer.traces import anonymize
+
+    value = {"role": "user", "dataset_id": 3, "columns": ["revenue", "region"], "x_axis": "revenue"}
+    out = anonymize(value)
+
+    assert out["role"] == "user"
+    assert out["dataset_id"] == 3
+    assert out["columns"][0] == out["x_axis"] != "revenue"
+    assert len(out["columns"][1]) == len("region")
+
+
+def test_anonymize_is_keyed_and_drops_row_values(mock_flask_app):
+    """Pseudonyms depend on the deployment secret and run_sql row values are not kept."""
+    import hashlib
+
+    from nl_explorer.traces import anonymize, pseudonym
+
+    result = {"columns": ["salary"], "rows": [[120000, "alice"]], "row_count": 1}
+    mock_flask_app.config["NL_EXPLORER_CONFIG"]["trace_secret"] = "one"
+    with mock_flask_app.app_context():
+        out = anonymize(result)
+        first = pseudonym("salary")
+        mock_flask_app.config["NL_EXPLORER_CONFIG"]["trace_secret"] = "two"
+        assert pseudonym("salary") != first
+
+    assert out["rows"] == [[0, pseudonym("alice", b"one")]]
+    assert out["row_count"] == 1
+    assert first not in hashlib.sha1(b"salary").hexdigest() + hashlib.sha256(b"salary").hexdigest()
+
+
+def test_recorded_turn_replays_through_chat_view(mock_flask_app, tmp_path, monkeypatch):
+    """A turn with one tool round is recorded to JSONL and replays with the same calls on every run."""
+    monkeypatch.syspath_prepend(str(Path(__file__).resolve().parents[1] / "benchmarks"))
+    import replay
+
+    from nl_explorer import llm_service, traces
+    from nl_explorer.api import NLExplorerRestApi
+
+    trace_file = tmp_path / "traces.jsonl"
+    mock_flask_app.config["NL_EXPLORER_CONFIG"].update(
+        trace_file=str(trace_file), admission=False, fast_path_router=False
+    )
+    tool_call = SimpleNamespace(
+        id="call_1", function=SimpleNamespace(name="get_dataset_schema", arguments=json.dumps({"dataset_id": 1}))
+    )
+    responses = iter([
+        SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=None, tool_calls=[tool_call]))]),
+        SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="Done", tool_calls=None))]),
+    ])
+    context = {"datasets": [{"id": 1, "name": "orders", "columns": [{"name": "amount", "type": "FLOAT"}]}]}
+
+    with patch.object(llm_service, "litellm", SimpleNamespace(completion=lambda **kw: next(responses))), \
+            patch("nl_explorer.context_builder.get_user_context", return_value=context), \
+            patch("nl_explorer.context_builder.get_dataset_schema", return_value={"id": 1, "columns": []}), \
+            patch("nl_explorer.column_profiles.attach_profiles", side_effect=lambda s: s):
+        view = inspect.unwrap(NLExplorerRestApi.chat)
+        with mock_flask_app.test_request_context("/chat", method="POST", json={"message": "show orders"}):
+            assert view(NLExplorerRestApi.__new__(NLExplorerRestApi)).status_code == 200
+
+    [trace] = traces.load(str(trace_file))
+    assert [e["kind"] for e in trace["events"]] == ["llm", "tool", "llm"]
+    assert trace["events"][1]["name"] == "get_dataset_schema"
+
+    app = replay.make_app()
+    results = [replay.replay(trace, app) for _ in range(3)]
+    assert [r["status"] for r in results] == [200] * 3
+    assert [r["llm_calls"] for r in results] == [2] * 3
+    assert [r["tool_calls"] for r in results] == [1] * 3